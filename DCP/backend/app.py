@@ -4,15 +4,24 @@ import mysql.connector
 from mysql.connector import Error
 from datetime import datetime
 import os
+import threading
+import time as _time
+from collections import OrderedDict
 from functools import wraps
+import base64
+import hashlib
+import json
 from dotenv import load_dotenv
+from db_pool import ConnectionPool, PoolExhaustedError
+from profiling import init_profiling, record_query
 
 # Load environment variables from .env file (if exists)
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-CORS(app, supports_credentials=True)
+CORS(app, supports_credentials=True, expose_headers=['X-Next-Cursor', 'Idempotent-Replayed', 'ETag', 'X-DB-Queries', 'X-Profile-Id', 'Server-Timing'])
+init_profiling(app)
 
 # Database configuration
 # You can set these as environment variables or update directly here
@@ -23,12 +32,23 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'databaseAPY102611*')  # Update with your MySQL password
 }
 
+# Connection pool settings (all optional)
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    'checkout_timeout': float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '5')),
+    'max_waiters': int(os.getenv('DB_POOL_MAX_WAITERS', '50')),
+    'ping_after': float(os.getenv('DB_POOL_PING_AFTER', '30'))
+}
+
+db_pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG), on_execute=record_query, **POOL_CONFIG)
+
 def get_db_connection():
-    """Establish database connection with error handling"""
+    """Borrow a pooled database connection with error handling; close() returns it to the pool"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            return conn
+        return db_pool.get_connection()
     except Error as e:
         print(f"❌ Error connecting to MySQL: {e}")
         print(f"   Host: {DB_CONFIG['host']}")
@@ -36,6 +56,139 @@ def get_db_connection():
         print(f"   User: {DB_CONFIG['user']}")
         return None
 
+@app.errorhandler(PoolExhaustedError)
+def handle_pool_exhausted(e):
+    response = jsonify({'error': 'Server busy, please retry', 'detail': str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Keyset pagination: list endpoints return at most `limit` rows and put the
+# cursor for the next page in the X-Next-Cursor header (absent on the last page)
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    """Decode a cursor token into its list of values; raises ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except Exception:
+        raise ValueError('Invalid pagination cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid pagination cursor')
+    return values
+
+def get_page_args(cursor_size):
+    """Read limit/cursor query params; returns (limit, cursor values or None)"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor, cursor_size) if cursor else None
+
+def paged_response(rows, limit, cursor_of, columns=None):
+    """
+    jsonify the first `limit` rows (query fetched limit + 1) and attach the next cursor.
+    With columns, rows are tuples and become dicts of their leading values, so
+    trailing columns can carry what only the cursor needs.
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(cursor_of(rows[-1]))
+    if columns:
+        rows = [dict(zip(columns, row)) for row in rows]
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# MySQL formats list dates and times itself (the driver would return date and
+# timedelta objects), so rows go to the JSON encoder as they come. % is doubled
+# for the driver's parameter substitution.
+SQL_DATE = "DATE_FORMAT({}, '%%Y-%%m-%%d')"
+SQL_TIME = "TIME_FORMAT({}, '%%H:%%i')"
+SQL_TIME_KEY = "TIME_FORMAT({}, '%%H:%%i:%%s')"
+
+# Idempotency keys: a POST sent with an Idempotency-Key header stores its outcome, and
+# retries with the same key and body get that outcome back instead of running again
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))  # seconds
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '60'))  # abandoned claims
+
+def request_fingerprint(endpoint, payload):
+    raw = json.dumps([endpoint, payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def claim_idempotency_key(conn, key, fingerprint):
+    """Claim key for the current user; returns None to proceed, or a response to send instead"""
+    owner = (session['user_type'], session['user_id'])
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for _ in range(2):
+            try:
+                cursor.execute(
+                    "INSERT INTO idempotency_keys (user_type, user_id, idem_key, request_hash) VALUES (%s, %s, %s, %s)",
+                    (*owner, key, fingerprint)
+                )
+                conn.commit()
+                return None
+            except mysql.connector.IntegrityError:
+                conn.rollback()
+            # Drop the existing claim if it expired or was abandoned, then try again
+            cursor.execute(
+                """DELETE FROM idempotency_keys
+                   WHERE user_type = %s AND user_id = %s AND idem_key = %s
+                     AND ((status_code IS NULL AND created_at < NOW() - INTERVAL %s SECOND)
+                          OR created_at < NOW() - INTERVAL %s SECOND)""",
+                (*owner, key, IDEMPOTENCY_PENDING_TIMEOUT, IDEMPOTENCY_TTL)
+            )
+            conn.commit()
+            if cursor.rowcount:
+                continue
+            cursor.execute(
+                "SELECT request_hash, status_code, response_body FROM idempotency_keys "
+                "WHERE user_type = %s AND user_id = %s AND idem_key = %s",
+                (*owner, key)
+            )
+            record = cursor.fetchone()
+            if record is None:
+                continue
+            if record['request_hash'] != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+            if record['status_code'] is None:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            response = app.response_class(record['response_body'], status=record['status_code'], mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+    finally:
+        cursor.close()
+
+def complete_idempotency_key(cursor, key, body, status_code):
+    """Store the outcome; runs on the request's transaction so it commits together with the write"""
+    cursor.execute(
+        "UPDATE idempotency_keys SET status_code = %s, response_body = %s "
+        "WHERE user_type = %s AND user_id = %s AND idem_key = %s",
+        (status_code, json.dumps(body), session['user_type'], session['user_id'], key)
+    )
+
+def release_idempotency_key(conn, key):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM idempotency_keys WHERE user_type = %s AND user_id = %s AND idem_key = %s",
+            (session['user_type'], session['user_id'], key)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -96,6 +249,8 @@ def register():
             )
         
         conn.commit()
+        if user_type == 'doctor':
+            invalidate_doctor_cache()
         return jsonify({'message': 'Registration successful'}), 201
     except Error as e:
         conn.rollback()
@@ -202,80 +357,167 @@ def get_current_user():
         'user_type': session['user_type']
     }), 200
 
+# Public doctor listing cache: page bodies are kept per (limit, cursor) and dropped
+# whenever a doctor is added or removed; DOCTOR_CACHE_TTL bounds staleness from
+# writes made by other worker processes
+DOCTOR_CACHE_TTL = float(os.getenv('DOCTOR_CACHE_TTL', '60'))
+DOCTOR_CACHE_SIZE = int(os.getenv('DOCTOR_CACHE_SIZE', '256'))
+_doctor_cache = OrderedDict()
+_doctor_cache_lock = threading.Lock()
+
+def doctor_cache_get(key):
+    with _doctor_cache_lock:
+        entry = _doctor_cache.get(key)
+        if entry is None or _time.monotonic() - entry[2] >= DOCTOR_CACHE_TTL:
+            return None
+        _doctor_cache.move_to_end(key)
+        return entry
+
+def doctor_cache_set(key, body, next_cursor):
+    with _doctor_cache_lock:
+        _doctor_cache[key] = (body, next_cursor, _time.monotonic())
+        _doctor_cache.move_to_end(key)
+        while len(_doctor_cache) > DOCTOR_CACHE_SIZE:
+            _doctor_cache.popitem(last=False)
+
+def invalidate_doctor_cache():
+    with _doctor_cache_lock:
+        _doctor_cache.clear()
+
 # Doctor Routes
+def fetch_doctor_page(cursor, limit, after):
+    """One keyset page of doctors ordered by doctor_id; fetches limit + 1 rows"""
+    if after:
+        cursor.execute(
+            "SELECT doctor_id, name, specialization, email, fees, availability FROM doctor "
+            "WHERE doctor_id > %s ORDER BY doctor_id LIMIT %s",
+            (after[0], limit + 1)
+        )
+    else:
+        cursor.execute(
+            "SELECT doctor_id, name, specialization, email, fees, availability FROM doctor "
+            "ORDER BY doctor_id LIMIT %s",
+            (limit + 1,)
+        )
+    return cursor.fetchall()
+
 @app.route('/api/doctors', methods=['GET'])
 def get_doctors():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT doctor_id, name, specialization, email, fees, availability FROM doctor")
-        doctors = cursor.fetchall()
-        return jsonify(doctors), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        limit, after = get_page_args(1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    key = (limit, after[0] if after else None)
+    entry = doctor_cache_get(key)
+    if entry is None:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        try:
+            doctors = fetch_doctor_page(cursor, limit, after)
+            page = paged_response(doctors, limit, lambda d: [d['doctor_id']])
+        except Error as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            cursor.close()
+            conn.close()
+        entry = (page.get_data(), page.headers.get('X-Next-Cursor'))
+        doctor_cache_set(key, *entry)
+    
+    body, next_cursor = entry[0], entry[1]
+    response = app.response_class(body, mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    # Strong ETag over the body; clients revalidate with If-None-Match and get 304 when unchanged
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 # Appointment Routes
 @app.route('/api/appointments', methods=['GET'])
 @login_required
 def get_appointments():
+    try:
+        limit, after = get_page_args(3)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     user_id = session['user_id']
     user_type = session['user_type']
     
+    # Server-side filters
+    conditions = []
+    params = []
+    status = request.args.get('status')
+    if status:
+        conditions.append("a.status = %s")
+        params.append(status)
+    if request.args.get('date_from'):
+        conditions.append("a.date >= %s")
+        params.append(request.args['date_from'])
+    if request.args.get('date_to'):
+        conditions.append("a.date <= %s")
+        params.append(request.args['date_to'])
+    if after:
+        # Keyset on (date, time, app_id) descending
+        conditions.append(
+            "(a.date < %s OR (a.date = %s AND (a.time < %s OR (a.time = %s AND a.app_id < %s))))"
+        )
+        params.extend([after[0], after[0], after[1], after[1], after[2]])
+    
+    # Output columns, then the full time for the keyset cursor
+    head = f"a.app_id, {SQL_DATE.format('a.date')} AS date, {SQL_TIME.format('a.time')} AS time, a.status"
+    time_key = f"{SQL_TIME_KEY.format('a.time')} AS time_key"
     try:
         if user_type == 'patient':
-            cursor.execute("""
-                SELECT a.app_id, a.date, a.time, a.status, 
-                       d.name as doctor_name, d.specialization, d.fees
+            select = f"""
+                SELECT {head},
+                       d.name as doctor_name, d.specialization, d.fees, {time_key}
                 FROM appointments a
                 JOIN doctor d ON a.doctor_id = d.doctor_id
                 WHERE a.patient_id = %s
-                ORDER BY a.date DESC, a.time DESC
-            """, (user_id,))
+            """
+            params.insert(0, user_id)
         elif user_type == 'doctor':
-            cursor.execute("""
-                SELECT a.app_id, a.date, a.time, a.status,
-                       p.name as patient_name, p.email, p.phone
+            select = f"""
+                SELECT {head},
+                       p.name as patient_name, p.email, p.phone, {time_key}
                 FROM appointments a
                 JOIN patient p ON a.patient_id = p.patient_id
                 WHERE a.doctor_id = %s
-                ORDER BY a.date DESC, a.time DESC
-            """, (user_id,))
+            """
+            params.insert(0, user_id)
         else:  # admin
-            cursor.execute("""
-                SELECT a.app_id, a.date, a.time, a.status,
-                       d.name as doctor_name, p.name as patient_name
+            select = f"""
+                SELECT {head},
+                       d.name as doctor_name, p.name as patient_name, {time_key}
                 FROM appointments a
                 JOIN doctor d ON a.doctor_id = d.doctor_id
                 JOIN patient p ON a.patient_id = p.patient_id
-                ORDER BY a.date DESC, a.time DESC
-            """)
+                WHERE 1 = 1
+            """
+        
+        where = "".join(f" AND {condition}" for condition in conditions)
+        cursor.execute(
+            select + where + " ORDER BY a.date DESC, a.time DESC, a.app_id DESC LIMIT %s",
+            (*params, limit + 1)
+        )
         
         appointments = cursor.fetchall()
-        # Convert datetime objects to strings for JSON serialization
-        for appointment in appointments:
-            if 'date' in appointment and appointment['date']:
-                appointment['date'] = appointment['date'].isoformat()
-            if 'time' in appointment and appointment['time']:
-                # Convert timedelta to HH:MM format
-                if isinstance(appointment['time'], str):
-                    pass  # Already a string
-                else:
-                    total_seconds = int(appointment['time'].total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    appointment['time'] = f"{hours:02d}:{minutes:02d}"
-        return jsonify(appointments), 200
+        response = paged_response(
+            appointments, limit,
+            lambda a: [a[1], a[-1], a[0]],
+            columns=cursor.column_names[:-1]
+        )
+        return response, 200
     except Error as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -300,19 +542,59 @@ def create_appointment():
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
-    cursor = conn.cursor()
+    key = request.headers.get('Idempotency-Key')
+    claimed = False
+    cursor = None
     try:
-        cursor.execute(
-            "INSERT INTO appointments (doctor_id, patient_id, date, time, status) VALUES (%s, %s, %s, %s, %s)",
-            (doctor_id, session['user_id'], date, time, 'Booked')
-        )
-        conn.commit()
-        return jsonify({'message': 'Appointment booked successfully'}), 201
+        if key:
+            replay = claim_idempotency_key(conn, key, request_fingerprint('POST /api/appointments', data))
+            if replay is not None:
+                return replay
+            claimed = True
+        
+        cursor = conn.cursor()
+        try:
+            # Lock the doctor row so bookings for one doctor are checked and inserted one at a time
+            cursor.execute("SELECT doctor_id FROM doctor WHERE doctor_id = %s FOR UPDATE", (doctor_id,))
+            if cursor.fetchone() is None:
+                body, status_code = {'error': 'Doctor not found'}, 404
+            else:
+                cursor.execute(
+                    "SELECT app_id FROM appointments WHERE doctor_id = %s AND date = %s AND time = %s "
+                    "AND status IN ('Booked', 'approved')",
+                    (doctor_id, date, time)
+                )
+                if cursor.fetchone() is not None:
+                    body, status_code = {'error': 'Time slot already booked'}, 409
+                else:
+                    cursor.execute(
+                        "INSERT INTO appointments (doctor_id, patient_id, date, time, status) VALUES (%s, %s, %s, %s, %s)",
+                        (doctor_id, session['user_id'], date, time, 'Booked')
+                    )
+                    body, status_code = {'message': 'Appointment booked successfully', 'app_id': cursor.lastrowid}, 201
+            if key:
+                complete_idempotency_key(cursor, key, body, status_code)
+            conn.commit()
+        except mysql.connector.IntegrityError:
+            # The unique active-slot key caught a booking that raced past the check
+            conn.rollback()
+            body, status_code = {'error': 'Time slot already booked'}, 409
+            if key:
+                complete_idempotency_key(cursor, key, body, status_code)
+                conn.commit()
+        return jsonify(body), status_code
     except Error as e:
-        conn.rollback()
+        try:
+            conn.rollback()
+            if claimed:
+                release_idempotency_key(conn, key)
+        except Error:
+            # The connection itself failed; an unreleased claim expires after IDEMPOTENCY_PENDING_TIMEOUT
+            conn.invalidate()
         return jsonify({'error': str(e)}), 500
     finally:
-        cursor.close()
+        if cursor is not None:
+            cursor.close()
         conn.close()
 
 @app.route('/api/appointments/<int:app_id>/status', methods=['PUT'])
@@ -339,6 +621,10 @@ def update_appointment_status(app_id):
         )
         conn.commit()
         return jsonify({'message': 'Appointment status updated'}), 200
+    except mysql.connector.IntegrityError:
+        # Approving an appointment whose slot has been booked again since
+        conn.rollback()
+        return jsonify({'error': 'Time slot already booked'}), 409
     except Error as e:
         conn.rollback()
         return jsonify({'error': str(e)}), 500
@@ -375,15 +661,19 @@ def get_all_doctors():
     if session['user_type'] != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        limit, after = get_page_args(1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
     
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT doctor_id, name, specialization, email, fees, availability FROM doctor")
-        doctors = cursor.fetchall()
-        return jsonify(doctors), 200
+        doctors = fetch_doctor_page(cursor, limit, after)
+        return paged_response(doctors, limit, lambda d: [d['doctor_id']]), 200
     except Error as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -404,6 +694,7 @@ def delete_doctor(doctor_id):
     try:
         cursor.execute("DELETE FROM doctor WHERE doctor_id = %s", (doctor_id,))
         conn.commit()
+        invalidate_doctor_cache()
         return jsonify({'message': 'Doctor removed'}), 200
     except Error as e:
         conn.rollback()
@@ -416,21 +707,45 @@ def delete_doctor(doctor_id):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Check if backend and database are accessible"""
+    # Checkout alone skips the ping for recently used connections, so run a query
     conn = get_db_connection()
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        except Error as e:
+            print(f"❌ Health check query failed: {e}")
+            conn.invalidate()
+            conn = None
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    pass
     if conn:
         conn.close()
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
-            'message': 'Backend and database are working'
+            'message': 'Backend and database are working',
+            'pool': db_pool.stats()
         }), 200
     else:
         return jsonify({
             'status': 'unhealthy',
             'database': 'disconnected',
-            'message': 'Database connection failed'
+            'message': 'Database connection failed',
+            'pool': db_pool.stats()
         }), 503
 
+@app.route('/api/pool-stats', methods=['GET'])
+def pool_stats():
+    """Connection pool usage: in-use, idle, waiters and checkout latency"""
+    return jsonify(db_pool.stats()), 200
+
 @app.route('/api/test-db', methods=['GET'])
 def test_database():
     """Test database connection and show status"""
@@ -443,14 +758,15 @@ def test_database():
                 'error': 'Check database configuration in app.py'
             }), 500
         
-        cursor = conn.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
+        with conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SHOW TABLES")
+                tables = cursor.fetchall()
+            finally:
+                cursor.close()
         table_names = [table[0] for table in tables]
         
-        cursor.close()
-        conn.close()
-        
         required_tables = ['admin', 'doctor', 'patient', 'appointments']
         missing_tables = [t for t in required_tables if t not in table_names]
         
@@ -479,11 +795,13 @@ if __name__ == '__main__':
     print(f"User: {DB_CONFIG['user']}")
     print("-" * 50)
     
-    # Test connection on startup
+    # Test connection on startup and pre-open the pool's minimum connections
     conn = get_db_connection()
     if conn:
         print("✅ Database connection successful!")
         conn.close()
+        db_pool.warm_up()
+        print(f"Connection pool: {POOL_CONFIG['min_size']}-{POOL_CONFIG['max_size']} connections")
     else:
         print("❌ Database connection failed!")
         print("   Please check your database configuration in app.py")
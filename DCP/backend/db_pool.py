@@ -0,0 +1,327 @@
+"""
+MySQL Connection Pool
+Keeps a bounded set of open connections so requests skip the TCP + auth handshake
+"""
+import threading
+import time
+import weakref
+from collections import deque
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection can be checked out within the wait budget"""
+
+
+class _PoolEntry:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class _TimedCursor:
+    """Cursor proxy that reports every execute and its duration to the pool's on_execute hook"""
+
+    def __init__(self, raw, on_execute):
+        self._raw = raw
+        self._on_execute = on_execute
+
+    def _timed(self, method, operation, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(operation, *args, **kwargs)
+        finally:
+            self._on_execute(operation, time.perf_counter() - start)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._raw.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._raw.executemany, operation, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class PooledConnection:
+    """
+    Proxy around a raw connection; close() hands it back to the pool
+    A proxy dropped without close() (e.g. on an exception path) gives its slot
+    back when it is garbage-collected, closing the connection it held.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self._finalizer = weakref.finalize(self, pool._release_lost, entry)
+
+    def cursor(self, *args, **kwargs):
+        if self._entry is None:
+            raise AttributeError("Connection already returned to pool: cursor")
+        raw = self._entry.raw.cursor(*args, **kwargs)
+        if self._pool.on_execute is None:
+            return raw
+        return _TimedCursor(raw, self._pool.on_execute)
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._finalizer.detach()
+            self._pool._release(entry)
+
+    def invalidate(self):
+        """Close the underlying connection instead of returning it, e.g. after it failed a query"""
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._finalizer.detach()
+            self._pool._release(entry, discard=True)
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise AttributeError(f"Connection already returned to pool: {name}")
+        return getattr(self._entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool
+
+    - min_size:          connections kept open even when idle
+    - max_size:          hard cap on open connections
+    - idle_timeout:      seconds an idle connection above min_size is kept
+    - max_lifetime:      seconds before a connection is recycled regardless of use
+    - checkout_timeout:  seconds a caller waits for a free connection
+    - max_waiters:       callers allowed to queue; beyond that checkout fails fast
+    - ping_after:        idle seconds after which a connection is pinged on checkout
+    - on_execute:        optional callable(statement, seconds) run after every cursor execute
+    """
+
+    def __init__(self, connect, min_size=2, max_size=10, idle_timeout=300,
+                 max_lifetime=3600, checkout_timeout=5.0, max_waiters=50, ping_after=30,
+                 on_execute=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.max_waiters = max_waiters
+        self.ping_after = ping_after
+        self.on_execute = on_execute
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._failed_health_checks = 0
+        self._leaked = 0
+        self._timeouts = 0
+        self._rejected = 0
+
+    # ---------- checkout / release ----------
+
+    def get_connection(self):
+        """Borrow a connection, waiting up to checkout_timeout for one to free up"""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        stale = []
+        with self._cond:
+            while True:
+                stale.extend(self._reap_idle_locked(time.monotonic()))
+                if self._idle:
+                    # LIFO keeps the most recently used connections warm
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                if self._waiters >= self.max_waiters:
+                    self._rejected += 1
+                    raise PoolExhaustedError("Too many requests waiting for a database connection")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"No database connection available within {self.checkout_timeout}s"
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+
+        self._close_quietly(stale)
+        try:
+            if entry is None:
+                entry = self._open()
+            elif not self._is_usable(entry):
+                self._close_quietly([entry])
+                entry = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return PooledConnection(self, entry)
+
+    def _release(self, entry, discard=False):
+        try:
+            if not discard and entry.raw.in_transaction:
+                entry.raw.rollback()
+        except Exception:
+            discard = True
+
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._recycled += 1
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly([entry])
+
+    def _release_lost(self, entry):
+        # Finalizer of a PooledConnection that was never closed; its state is unknown, so discard it
+        with self._cond:
+            self._leaked += 1
+        self._release(entry, discard=True)
+
+    # ---------- maintenance ----------
+
+    def warm_up(self):
+        """Open connections up to min_size so the first requests don't pay the handshake"""
+        opened = []
+        try:
+            while True:
+                with self._cond:
+                    if self._size >= self.min_size:
+                        break
+                    self._size += 1
+                try:
+                    opened.append(self._open())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                    raise
+        finally:
+            now = time.monotonic()
+            with self._cond:
+                for entry in opened:
+                    entry.last_used = now
+                    self._idle.append(entry)
+                self._cond.notify_all()
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones are closed when released"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        self._close_quietly(idle)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': checkouts,
+                'avg_checkout_ms': round(self._checkout_time_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'max_checkout_ms': round(self._checkout_time_max * 1000, 3),
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'failed_health_checks': self._failed_health_checks,
+                'connections_leaked': self._leaked,
+                'checkout_timeouts': self._timeouts,
+                'checkout_rejections': self._rejected,
+            }
+
+    # ---------- internals ----------
+
+    def _open(self):
+        entry = _PoolEntry(self._connect())
+        with self._cond:
+            self._created += 1
+        return entry
+
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            with self._cond:
+                self._recycled += 1
+            return False
+        # Checkout trusts recently used connections; a health check must run a query of its own
+        if now - entry.last_used < self.ping_after:
+            return True
+        try:
+            if entry.raw.is_connected():
+                return True
+        except Exception:
+            pass
+        with self._cond:
+            self._failed_health_checks += 1
+        return False
+
+    def _reap_idle_locked(self, now):
+        """Drop idle connections past idle_timeout, keeping at least min_size open"""
+        stale = []
+        # The oldest idle connections sit at the left end of the deque
+        while self._idle and self._size > self.min_size:
+            entry = self._idle[0]
+            if now - entry.last_used <= self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._recycled += 1
+            stale.append(entry)
+        return stale
+
+    @staticmethod
+    def _close_quietly(entries):
+        for entry in entries:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
@@ -0,0 +1,293 @@
+"""
+Per-request profiling and query instrumentation
+Records each request's wall time, SQL statement count and SQL time (from the
+connection pool's cursor hook), and time spent serializing JSON, aggregated
+per route. init_profiling(app) adds:
+
+- GET /metrics                    Prometheus text format
+- GET /api/admin/slow-queries     slowest distinct statements
+- GET /api/admin/profiles[/<id>]  request profiles (admin session)
+
+With PROFILE_REQUESTS=true, a request sent with an X-Profile header runs
+under cProfile (PROFILE_SAMPLE_RATE profiles that fraction of all requests).
+The response carries X-Profile-Id and a Server-Timing breakdown. Only one
+request is profiled at a time.
+"""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import Response, g, has_request_context, jsonify, request, session
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+PROFILE_SLOW_STATEMENTS = int(os.getenv('PROFILE_SLOW_STATEMENTS', '20'))
+# With DB_QUERY_HEADER=true every response reports its statement count in X-DB-Queries
+DB_QUERY_HEADER = os.getenv('DB_QUERY_HEADER', 'false').lower() == 'true'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_LINES = 60
+
+_PLACEHOLDER_RUN = re.compile(r"(%s|%\(\w+\)s)(\s*,\s*(%s|%\(\w+\)s))+")
+
+
+class SlowStatements:
+    """The slowest distinct statements seen, by worst single execution"""
+
+    def __init__(self, size=PROFILE_SLOW_STATEMENTS):
+        self.size = size
+        self._entries = {}
+        self._floor = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, statement, seconds, path):
+        if seconds <= self._floor:
+            return
+        key = _PLACEHOLDER_RUN.sub(r"\1, ...", " ".join(str(statement).split()))[:500]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['seconds'] >= seconds:
+                return
+            self._entries[key] = {'seconds': seconds, 'path': path, 'at': datetime.utcnow().isoformat(timespec='seconds')}
+            if len(self._entries) > self.size:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k]['seconds'])]
+            if len(self._entries) >= self.size:
+                self._floor = min(e['seconds'] for e in self._entries.values())
+
+    def top(self):
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        return [{'statement': statement, **entry, 'seconds': round(entry['seconds'], 6)} for statement, entry in entries]
+
+
+class RouteMetrics:
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, status, seconds, queries, sql_seconds, serialize_seconds):
+        with self._lock:
+            series = self._series.get((method, route))
+            if series is None:
+                series = self._series[(method, route)] = {
+                    'count': 0, 'seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS), 'statuses': {},
+                    'queries': 0, 'sql_seconds': 0.0, 'serialize_seconds': 0.0
+                }
+            series['count'] += 1
+            series['seconds'] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['statuses'][status] = series['statuses'].get(status, 0) + 1
+            series['queries'] += queries
+            series['sql_seconds'] += sql_seconds
+            series['serialize_seconds'] += serialize_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(
+                ((key, {**s, 'buckets': list(s['buckets']), 'statuses': dict(s['statuses'])}) for key, s in self._series.items())
+            )
+
+
+class ProfileStore:
+    def __init__(self, keep=PROFILE_KEEP):
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add(self, profile_id, summary, dump):
+        with self._lock:
+            self._profiles[profile_id] = (summary, dump)
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            return [summary for summary, _ in reversed(self._profiles.values())]
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+slow_statements = SlowStatements()
+route_metrics = RouteMetrics()
+profile_store = ProfileStore()
+_profile_lock = threading.Lock()
+
+
+def record_query(statement, seconds):
+    """Connection pool on_execute hook"""
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_seconds = g.get('db_seconds', 0.0) + seconds
+        path = request.path
+    else:
+        path = ''
+    slow_statements.record(statement, seconds, path)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, counting dumps time as response serialization.
+    Compact responses are encoded with orjson when it is installed. Dates and
+    other types it would write differently still go through Flask's default().
+    """
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            if orjson is not None and not kwargs:
+                option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+                if self.sort_keys:
+                    option |= orjson.OPT_SORT_KEYS
+                return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context():
+                g.serialize_seconds = g.get('serialize_seconds', 0.0) + time.perf_counter() - started
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """Prometheus text exposition (version 0.0.4) of the route metrics and slowest statements"""
+    snapshot = route_metrics.snapshot()
+    lines = ['# HELP http_request_duration_seconds Request wall time by route.',
+             '# TYPE http_request_duration_seconds histogram']
+    for (method, route), s in snapshot:
+        labels = f'method="{_label(method)}",route="{_label(route)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, s['buckets']):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {s["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {s["count"]}')
+
+    lines += ['# HELP http_requests_total Requests by route and status.', '# TYPE http_requests_total counter']
+    for (method, route), s in snapshot:
+        for code, n in sorted(s['statuses'].items()):
+            lines.append(f'http_requests_total{{method="{_label(method)}",route="{_label(route)}",status="{code}"}} {n}')
+
+    for name, help_text, field, fmt in (
+        ('http_request_db_queries_total', 'SQL statements executed by route.', 'queries', '{}'),
+        ('http_request_db_seconds_total', 'Time spent in SQL statements by route.', 'sql_seconds', '{:.6f}'),
+        ('http_request_serialization_seconds_total', 'Time spent serializing responses by route.', 'serialize_seconds', '{:.6f}'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (method, route), s in snapshot:
+            lines.append(f'{name}{{method="{_label(method)}",route="{_label(route)}"}} ' + fmt.format(s[field]))
+
+    lines += ['# HELP db_slow_statement_seconds Worst execution time of the slowest statements.',
+              '# TYPE db_slow_statement_seconds gauge']
+    for entry in slow_statements.top():
+        lines.append(f'db_slow_statement_seconds{{statement="{_label(entry["statement"][:200])}"}} {entry["seconds"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _wants_profile():
+    if not PROFILE_REQUESTS:
+        return False
+    return 'X-Profile' in request.headers or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def init_profiling(app):
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_profile():
+        g.request_started = time.perf_counter()
+        if _wants_profile() and _profile_lock.acquire(blocking=False):
+            g.profile_id = profile_store.next_id()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        queries, sql_seconds = g.get('db_queries', 0), g.get('db_seconds', 0.0)
+        serialize_seconds = g.get('serialize_seconds', 0.0)
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        route_metrics.observe(request.method, route, response.status_code, elapsed, queries, sql_seconds, serialize_seconds)
+        if DB_QUERY_HEADER:
+            response.headers['X-DB-Queries'] = str(queries)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            profile_store.add(g.profile_id, {
+                'id': g.profile_id, 'method': request.method, 'path': request.path, 'route': route,
+                'status': response.status_code, 'profiler': 'cprofile',
+                'at': datetime.utcnow().isoformat(timespec='seconds'),
+                'wall_ms': round(elapsed * 1000, 2), 'db_queries': queries,
+                'db_ms': round(sql_seconds * 1000, 2), 'serialize_ms': round(serialize_seconds * 1000, 2)
+            }, out.getvalue())
+            response.headers['X-Profile-Id'] = str(g.profile_id)
+            response.headers['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, db;dur={sql_seconds * 1000:.1f};desc="{queries} queries", '
+                f'serialize;dur={serialize_seconds * 1000:.1f}'
+            )
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # after_request is skipped when a view raises; don't leave the profiler running
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+
+    def admin_only():
+        if session.get('user_type') != 'admin':
+            return jsonify({'error': 'Unauthorized'}), 403
+        return None
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/api/admin/slow-queries', methods=['GET'])
+    def slow_queries():
+        return admin_only() or (jsonify(slow_statements.top()), 200)
+
+    @app.route('/api/admin/profiles', methods=['GET'])
+    def profiles():
+        return admin_only() or (jsonify(profile_store.list()), 200)
+
+    @app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+    def profile(profile_id):
+        denied = admin_only()
+        if denied:
+            return denied
+        entry = profile_store.get(profile_id)
+        if entry is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return Response(entry[1], mimetype='text/plain')
@@ -38,8 +38,28 @@ CREATE TABLE IF NOT EXISTS appointments (
     date DATE NOT NULL,
     time TIME NOT NULL,
     status VARCHAR(20) DEFAULT 'pending',
+    -- 1 while the booking holds its slot, NULL once declined/cancelled/completed
+    active_slot TINYINT AS (IF(status IN ('Booked', 'approved'), 1, NULL)) STORED,
     FOREIGN KEY (doctor_id) REFERENCES doctor(doctor_id) ON DELETE CASCADE,
-    FOREIGN KEY (patient_id) REFERENCES patient(patient_id) ON DELETE CASCADE
+    FOREIGN KEY (patient_id) REFERENCES patient(patient_id) ON DELETE CASCADE,
+    -- Keyset pagination of appointment lists (newest first)
+    INDEX idx_appointments_patient_date (patient_id, date, time, app_id),
+    INDEX idx_appointments_doctor_date (doctor_id, date, time, app_id),
+    INDEX idx_appointments_date (date, time, app_id),
+    -- One active booking per doctor and slot (NULLs don't collide)
+    UNIQUE KEY uq_appointments_active_slot (doctor_id, date, time, active_slot)
+);
+
+-- Outcomes of requests sent with an Idempotency-Key header, replayed on client retries
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_type VARCHAR(20) NOT NULL,
+    user_id INT NOT NULL,
+    idem_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code INT NULL,
+    response_body TEXT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_type, user_id, idem_key)
 );
 
 -- Feedback Table (Optional)
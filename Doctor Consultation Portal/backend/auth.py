@@ -1,12 +1,17 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+import threading
+import time
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, UserRole
+from database import get_async_db
+from models import User, Doctor, UserRole
+from hashing import hasher
 import os
 from dotenv import load_dotenv
 
@@ -18,14 +23,28 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Principal cache settings
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # seconds
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
+# bcrypt runs in the hashing process pool; both raise HashingBusyError when it is saturated
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hasher.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.verify_async(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hasher.hash_async(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return hasher.needs_rehash(hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -37,37 +56,136 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user's identity, detached from any session"""
+    id: int
+    username: str
+    email: str
+    phone: str
+    role: UserRole
+    is_active: bool
+    created_at: datetime
+    doctor_id: Optional[int] = None
+
+class PrincipalCache:
+    """Bounded LRU of principals by user id; entries expire after ttl seconds"""
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache()
+
+def invalidate_principal(user_id: int):
+    """Call after changing a user's role, active flag or doctor profile"""
+    principal_cache.invalidate(user_id)
+
+def load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    row = (
+        db.query(User, Doctor.id)
+        .outerjoin(Doctor, Doctor.user_id == User.id)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    user, doctor_id = row
+    return Principal(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        phone=user.phone,
+        role=user.role,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        doctor_id=doctor_id
+    )
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    principal = await authenticate_token(token, db)
+    # Read by replicas.ReadYourWritesMiddleware
+    request.state.user_id = principal.id
+    return principal
+
+async def get_stream_user(
+    access_token: Optional[str] = None,
+    header_token: Optional[str] = Depends(oauth2_scheme_optional),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Browsers' EventSource can't set headers, so streams also accept ?access_token=
+    try:
+        return await authenticate_token(header_token or access_token, db)
+    finally:
+        # A stream outlives its request; don't keep a pooled connection checked out for it
+        await db.close()
+
+async def authenticate_token(token: Optional[str], db: AsyncSession) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
+    user = principal_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = await db.run_sync(load_principal, user_id)
+        if user is None:
+            raise credentials_exception
+        principal_cache.put(user)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
-async def get_current_patient(current_user: User = Depends(get_current_user)):
+async def get_current_patient(current_user: Principal = Depends(get_current_user)):
     if current_user.role != UserRole.PATIENT:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
 
-async def get_current_doctor(current_user: User = Depends(get_current_user)):
+async def get_current_doctor(current_user: Principal = Depends(get_current_user)):
     if current_user.role != UserRole.DOCTOR:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
 
-async def get_current_admin(current_user: User = Depends(get_current_user)):
+async def get_current_admin(current_user: Principal = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
@@ -0,0 +1,452 @@
+"""
+Doctor availability calendar
+A doctor's working hours come from their weekly hours (doctor_weekly_hours),
+or from available_from/available_to on every day if they have none, adjusted
+by availability exceptions: leave and blocked hours remove time, extra
+hours add it, over a range of dates.
+
+Each cached day holds, for every doctor, the open intervals in minutes and
+the starts of active appointments, materialized as bitmaps over the
+SLOT_MINUTES grid (bit i = slot starting at i * SLOT_MINUTES). A slot is
+free when it lies inside working hours and no appointment overlaps it. For
+each slot the day also keeps a column bitmap with one bit per doctor, so
+"which Cardiology doctors in Delhi are free 10:00-11:00" is an AND of two
+columns and two filter masks, whatever the number of doctors. Loading a day
+takes two queries for all doctors.
+
+Bookings, cancellations and availability edits update the cached days in
+place through book/release/refresh_doctor. After AVAILABILITY_CACHE_TTL
+seconds a day reloads from the database, which bounds staleness from writes
+made by other workers. Booking still checks for overlaps with slots.slot_taken,
+under the doctor row lock.
+"""
+import os
+import threading
+import time as _time
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy.orm import Session
+from models import User, Doctor, Appointment, WeeklyHours, AvailabilityException, AvailabilityKind
+from slots import SLOT_MINUTES, ACTIVE_STATUSES, _naive, _minutes
+
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "60"))  # seconds
+AVAILABILITY_CACHE_MAX_DAYS = int(os.getenv("AVAILABILITY_CACHE_MAX_DAYS", "400"))
+
+DAY_MINUTES = 24 * 60
+
+def _key(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+def _bits(n: int):
+    """Positions of the set bits in n, lowest first"""
+    while n:
+        low = n & -n
+        yield low.bit_length() - 1
+        n ^= low
+
+def _union(intervals: list) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+def _subtract(intervals: list, start: int, end: int) -> list:
+    result = []
+    for s, e in intervals:
+        if e <= start or s >= end:
+            result.append((s, e))
+            continue
+        if s < start:
+            result.append((s, start))
+        if e > end:
+            result.append((end, e))
+    return result
+
+@dataclass
+class DoctorEntry:
+    id: int
+    user_id: int
+    position: int
+    specialization: str
+    location: str
+    available_from: time
+    available_to: time
+    is_available: bool
+    user_active: bool
+    weekly: dict  # weekday -> [(start, end)] in minutes; empty = available_from/to every day
+
+    @property
+    def listed(self) -> bool:
+        return self.is_available and self.user_active
+
+    def template(self, day: date) -> list:
+        if self.weekly:
+            return self.weekly.get(day.weekday(), [])
+        return [(_minutes(self.available_from), _minutes(self.available_to))]
+
+def working_hours(entry: DoctorEntry, day: date, exceptions=()) -> list:
+    """Open [start, end) intervals in minutes: the weekly template with the day's exceptions applied"""
+    intervals = entry.template(day)
+    for exc in sorted(exceptions, key=lambda e: (e.created_at or datetime.min, e.id or 0)):
+        start = _minutes(exc.start_time) if exc.start_time else 0
+        end = _minutes(exc.end_time) if exc.end_time else DAY_MINUTES
+        if exc.kind == AvailabilityKind.UNAVAILABLE:
+            intervals = _subtract(intervals, start, end)
+        else:
+            intervals = intervals + [(start, end)]
+    return _union(intervals)
+
+class DayAvailability:
+    """All doctors' open and booked slots on one day, by doctor and by slot"""
+    __slots__ = ("day", "slot_minutes", "hours", "starts", "free", "columns", "loaded_at")
+
+    def __init__(self, day: date, slot_minutes: int):
+        self.day = day
+        self.slot_minutes = slot_minutes
+        self.hours = {}    # doctor position -> open intervals
+        self.starts = {}   # doctor position -> sorted appointment starts (minutes)
+        self.free = {}     # doctor position -> bitmap of free slots
+        self.columns = [0] * (DAY_MINUTES // slot_minutes)  # slot -> bitmap of doctor positions
+        self.loaded_at = _time.monotonic()
+
+    def _open_bits(self, position: int) -> int:
+        bits = 0
+        for start, end in self.hours.get(position, ()):
+            first = -(-start // self.slot_minutes)
+            last = end // self.slot_minutes
+            if last > first:
+                bits |= ((1 << (last - first)) - 1) << first
+        return bits
+
+    def _booked_bits(self, position: int) -> int:
+        bits = 0
+        for start in self.starts.get(position, ()):
+            # Every grid slot the appointment overlaps
+            first = start // self.slot_minutes
+            last = -(-(start + self.slot_minutes) // self.slot_minutes)
+            bits |= ((1 << (last - first)) - 1) << first
+        return bits
+
+    def update(self, position: int):
+        """Recompute one doctor's free slots and patch the slot columns that changed"""
+        free = self._open_bits(position) & ~self._booked_bits(position) & ((1 << len(self.columns)) - 1)
+        changed = self.free.get(position, 0) ^ free
+        self.free[position] = free
+        bit = 1 << position
+        for slot in _bits(changed):
+            self.columns[slot] ^= bit
+
+    def is_open(self, position: int, start: int) -> bool:
+        return any(s <= start and start + self.slot_minutes <= e for s, e in self.hours.get(position, ()))
+
+    def is_free(self, position: int, start: int) -> bool:
+        end = start + self.slot_minutes
+        return self.is_open(position, start) and not any(
+            s < end and s + self.slot_minutes > start for s in self.starts.get(position, ())
+        )
+
+class AvailabilityCalendar:
+    def __init__(self, slot_minutes: int = SLOT_MINUTES, ttl: float = AVAILABILITY_CACHE_TTL,
+                 max_days: int = AVAILABILITY_CACHE_MAX_DAYS):
+        self.slot_minutes = slot_minutes
+        self.ttl = ttl
+        self.max_days = max_days
+        self._doctors = None     # doctor id -> DoctorEntry
+        self._by_position = []   # position -> doctor id (None once removed)
+        self._by_user = {}
+        self._masks = {}         # ("specialization" | "location", key) -> bitmap of positions
+        self._listed = 0
+        self._loaded_at = 0.0
+        self._days = {}
+        self._lock = threading.Lock()
+
+    # ---------- doctors ----------
+
+    def _entry(self, doctor, user_active: bool, weekly: dict, position: int) -> DoctorEntry:
+        return DoctorEntry(
+            id=doctor.id, user_id=doctor.user_id, position=position,
+            specialization=doctor.specialization, location=doctor.location,
+            available_from=doctor.available_from, available_to=doctor.available_to,
+            is_available=doctor.is_available, user_active=user_active, weekly=weekly
+        )
+
+    def _weekly(self, rows) -> dict:
+        weekly = {}
+        for doctor_id, weekday, start, end in rows:
+            weekly.setdefault(doctor_id, {}).setdefault(weekday, []).append((_minutes(start), _minutes(end)))
+        return {d: {w: _union(i) for w, i in days.items()} for d, days in weekly.items()}
+
+    def _doctor_weekly(self, db: Session, doctor_id: int) -> dict:
+        return self._weekly(db.query(
+            WeeklyHours.doctor_id, WeeklyHours.weekday, WeeklyHours.start_time, WeeklyHours.end_time
+        ).filter(WeeklyHours.doctor_id == doctor_id).all()).get(doctor_id, {})
+
+    def _load_doctors(self, db: Session):
+        # Queries run without the lock: under db.run_sync they yield to the event
+        # loop, and another request on that thread would block on the lock for good
+        rows = db.query(Doctor, User.is_active).join(User, Doctor.user_id == User.id).order_by(Doctor.id).all()
+        weekly = self._weekly(db.query(
+            WeeklyHours.doctor_id, WeeklyHours.weekday, WeeklyHours.start_time, WeeklyHours.end_time
+        ).all())
+        entries = [self._entry(doctor, active, weekly.get(doctor.id, {}), position)
+                   for position, (doctor, active) in enumerate(rows)]
+        with self._lock:
+            self._doctors, self._by_position, self._by_user = {}, [], {}
+            self._masks, self._listed = {}, 0
+            for entry in entries:
+                self._add(entry)
+            self._days.clear()
+            self._loaded_at = _time.monotonic()
+
+    def _add(self, entry: DoctorEntry):
+        if entry.position == len(self._by_position):
+            self._by_position.append(entry.id)
+        self._doctors[entry.id] = entry
+        self._by_user[entry.user_id] = entry.id
+        bit = 1 << entry.position
+        for field in ("specialization", "location"):
+            key = (field, _key(getattr(entry, field)))
+            self._masks[key] = self._masks.get(key, 0) | bit
+        if entry.listed:
+            self._listed |= bit
+
+    def _drop(self, entry: DoctorEntry):
+        bit = 1 << entry.position
+        for field in ("specialization", "location"):
+            key = (field, _key(getattr(entry, field)))
+            self._masks[key] = self._masks.get(key, 0) & ~bit
+        self._listed &= ~bit
+        del self._doctors[entry.id]
+        self._by_user.pop(entry.user_id, None)
+
+    def _ensure_doctors(self, db: Session):
+        with self._lock:
+            if self._doctors is not None and _time.monotonic() - self._loaded_at < self.ttl:
+                return
+        self._load_doctors(db)
+
+    # ---------- days ----------
+
+    def _exceptions(self, db: Session, first: date, last: date, doctor_id: int = None) -> list:
+        query = db.query(AvailabilityException).filter(
+            AvailabilityException.end_date >= first,
+            AvailabilityException.start_date <= last
+        )
+        if doctor_id is not None:
+            query = query.filter(AvailabilityException.doctor_id == doctor_id)
+        return query.all()
+
+    def _load_day(self, db: Session, day: date) -> DayAvailability:
+        exceptions = {}
+        for exc in self._exceptions(db, day, day):
+            exceptions.setdefault(exc.doctor_id, []).append(exc)
+        day_start = datetime.combine(day, time.min)
+        # Served by ix_appointments_status_date
+        rows = db.query(Appointment.doctor_id, Appointment.appointment_date).filter(
+            Appointment.status.in_(ACTIVE_STATUSES),
+            Appointment.appointment_date >= day_start,
+            Appointment.appointment_date < day_start + timedelta(days=1)
+        ).all()
+
+        # Positions are read under the lock, so a doctor reload in between can't mix them up
+        with self._lock:
+            if self._doctors is None:
+                return None
+            cal = DayAvailability(day, self.slot_minutes)
+            for doctor_id, when in rows:
+                entry = self._doctors.get(doctor_id)
+                if entry is not None:
+                    cal.starts.setdefault(entry.position, []).append(_minutes(_naive(when).time()))
+            for entry in self._doctors.values():
+                cal.hours[entry.position] = working_hours(entry, day, exceptions.get(entry.id, ()))
+                cal.starts.get(entry.position, []).sort()
+                cal.update(entry.position)
+            if len(self._days) >= self.max_days:
+                self._evict_expired()
+            self._days[day] = cal
+            return cal
+
+    def day(self, db: Session, day: date) -> DayAvailability:
+        while True:
+            self._ensure_doctors(db)
+            with self._lock:
+                cal = self._days.get(day)
+                if cal is not None and _time.monotonic() - cal.loaded_at < self.ttl:
+                    return cal
+            cal = self._load_day(db, day)
+            if cal is not None:
+                return cal
+            # invalidate() ran during the load; reload the doctors and try again
+
+    # ---------- queries ----------
+
+    def _slot_range(self, start: datetime, end: Optional[datetime]) -> range:
+        start = _naive(start)
+        end = _naive(end) if end else start + timedelta(minutes=self.slot_minutes)
+        if end <= start or end > datetime.combine(start.date(), time.min) + timedelta(days=1):
+            raise ValueError("The time range must end after it starts, on the same day")
+        first = _minutes(start.time()) // self.slot_minutes
+        stop = -(-int((end - datetime.combine(start.date(), time.min)).total_seconds() // 60) // self.slot_minutes)
+        return range(first, stop)
+
+    def free_doctors(self, db: Session, start: datetime, end: datetime = None,
+                     specialization: str = None, location: str = None, any_slot: bool = False) -> list:
+        """
+        Ids of listed doctors free for the whole of [start, end) (default one
+        slot), or with any_slot, free in at least one slot of it. Filters
+        match the whole value, case-insensitively.
+        """
+        slots = self._slot_range(start, end)
+        cal = self.day(db, _naive(start).date())
+        with self._lock:
+            mask = self._listed
+            if specialization:
+                mask &= self._masks.get(("specialization", _key(specialization)), 0)
+            if location:
+                mask &= self._masks.get(("location", _key(location)), 0)
+            if any_slot:
+                found = 0
+                for slot in slots:
+                    found |= cal.columns[slot]
+                mask &= found
+            else:
+                for slot in slots:
+                    if not mask:
+                        break
+                    mask &= cal.columns[slot]
+            return sorted(self._by_position[p] for p in _bits(mask))
+
+    def is_open(self, db: Session, doctor, when: datetime) -> bool:
+        """
+        Whether a slot starting at `when` lies within the doctor's working
+        hours, read from the database rather than the cache, for booking
+        """
+        when = _naive(when)
+        entry = self._entry(doctor, True, self._doctor_weekly(db, doctor.id), -1)
+        start = _minutes(when.time())
+        return any(
+            s <= start and start + self.slot_minutes <= e
+            for s, e in working_hours(entry, when.date(), self._exceptions(db, when.date(), when.date(), doctor.id))
+        )
+
+    def day_slots(self, db: Session, doctor_id: int, day: date) -> list:
+        """The doctor's slots within working hours as (start, end, is_free) tuples"""
+        cal = self.day(db, day)
+        day_start = datetime.combine(day, time.min)
+        slots = []
+        with self._lock:
+            entry = self._doctors.get(doctor_id)
+            if entry is None:
+                return slots
+            for open_start, open_end in cal.hours.get(entry.position, ()):
+                for start in range(open_start, open_end - self.slot_minutes + 1, self.slot_minutes):
+                    slots.append((
+                        day_start + timedelta(minutes=start),
+                        day_start + timedelta(minutes=start + self.slot_minutes),
+                        cal.is_free(entry.position, start)
+                    ))
+        return slots
+
+    # ---------- incremental updates ----------
+
+    def book(self, doctor_id: int, when: datetime):
+        self._update(doctor_id, when, add=True)
+
+    def release(self, doctor_id: int, when: datetime):
+        self._update(doctor_id, when, add=False)
+
+    def _update(self, doctor_id: int, when: datetime, add: bool):
+        # Only days already cached need patching; others load fresh on next access
+        when = _naive(when)
+        with self._lock:
+            cal = self._days.get(when.date())
+            entry = self._doctors.get(doctor_id) if self._doctors is not None else None
+            if cal is None or entry is None:
+                return
+            starts = cal.starts.setdefault(entry.position, [])
+            start = _minutes(when.time())
+            if add:
+                starts.append(start)
+                starts.sort()
+            elif start in starts:
+                starts.remove(start)
+            cal.update(entry.position)
+
+    def refresh_doctor(self, db: Session, doctor_id: int):
+        """Reload one doctor's profile, weekly hours and exceptions into the cached days"""
+        with self._lock:
+            if self._doctors is None:
+                return
+            days = list(self._days)
+        row = db.query(Doctor, User.is_active).join(User, Doctor.user_id == User.id).filter(
+            Doctor.id == doctor_id
+        ).first()
+        weekly = self._doctor_weekly(db, doctor_id) if row is not None else {}
+        exceptions = self._exceptions(db, min(days), max(days), doctor_id) if row is not None and days else []
+
+        with self._lock:
+            if self._doctors is None:
+                return
+            old = self._doctors.get(doctor_id)
+            if old is not None:
+                self._drop(old)
+            if row is None:
+                # Deleted: clear its bits; the position is not reused until the next reload
+                if old is not None:
+                    for cal in self._days.values():
+                        cal.hours.pop(old.position, None)
+                        cal.starts.pop(old.position, None)
+                        cal.update(old.position)
+                return
+            doctor, active = row
+            entry = self._entry(doctor, active, weekly, old.position if old else len(self._by_position))
+            self._add(entry)
+            for day, cal in self._days.items():
+                if not days or not min(days) <= day <= max(days):
+                    # Loaded after the reads above, so already current
+                    continue
+                cal.hours[entry.position] = working_hours(
+                    entry, day, [e for e in exceptions if e.start_date <= day <= e.end_date]
+                )
+                cal.update(entry.position)
+
+    def set_user_active(self, user_id: int, active: bool):
+        with self._lock:
+            doctor_id = self._by_user.get(user_id)
+            if doctor_id is None:
+                return
+            entry = self._doctors[doctor_id]
+            entry.user_active = active
+            bit = 1 << entry.position
+            self._listed = self._listed | bit if entry.listed else self._listed & ~bit
+
+    def invalidate(self):
+        """Drop everything, e.g. after doctors or appointments were written in bulk"""
+        with self._lock:
+            self._doctors = None
+            self._days.clear()
+
+    def _evict_expired(self):
+        now = _time.monotonic()
+        expired = [d for d, c in self._days.items() if now - c.loaded_at >= self.ttl]
+        for day in expired:
+            del self._days[day]
+        if len(self._days) >= self.max_days:
+            self._days.clear()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "doctors": len(self._doctors or {}),
+                "listed": bin(self._listed).count("1"),
+                "cached_days": len(self._days),
+                "slot_minutes": self.slot_minutes,
+            }
+
+availability_calendar = AvailabilityCalendar()
@@ -0,0 +1,59 @@
+"""
+Login hashing benchmark
+Measures bcrypt verifications per second through the hashing executor for
+1..N worker processes, i.e. the ceiling on login throughput per core count.
+
+    python benchmarks/bench_hashing.py --rounds 12 --logins 64
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import HashingExecutor, hash_password
+
+def run(workers: int, rounds: int, logins: int, hashed: str) -> dict:
+    executor = HashingExecutor(workers=workers, max_pending=logins, rounds=rounds)
+    # Start the worker processes before timing
+    executor.verify("warmup", hashed)
+
+    # Simulate concurrent request threads each handling one login
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1) * 4) as clients:
+        results = list(clients.map(lambda _: executor.verify("password", hashed), range(logins)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    assert all(results)
+    return {
+        "workers": workers,
+        "logins": logins,
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(logins / elapsed, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--logins", type=int, default=64, help="verifications per run")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    hashed = hash_password("password", args.rounds)
+    results = []
+    for workers in range(1, args.max_workers + 1):
+        result = run(workers, args.rounds, args.logins, hashed)
+        results.append(result)
+        print(f"{result['workers']:>3} workers: {result['logins_per_sec']:>8} logins/sec")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "hashing", "rounds": args.rounds, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Notification stream capacity
+Opens N concurrent SSE streams against a running single-worker server and
+holds them idle. It reports how many connected, how long that took, and the
+server's resident memory per stream when --pid is given. Then it books and
+cancels one appointment (when --doctor-id/--at are given) and measures how
+long the event takes to reach every stream.
+
+    uvicorn main:app --workers 1 &
+    python benchmarks/bench_notifications.py --streams 10000 --token <patient JWT> --pid $!
+
+Needs a file-descriptor limit above N (ulimit -n) on both sides. Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+async def main_async(args):
+    connected = asyncio.Event()
+    connected_count = 0
+    received = []
+    limits = httpx.Limits(max_connections=args.streams, max_keepalive_connections=0)
+    url = f"{args.base_url}/api/notifications/stream"
+
+    async def hold(client: httpx.AsyncClient, event_wait: asyncio.Event):
+        nonlocal connected_count
+        async with client.stream("GET", url, params={"access_token": args.token}) as response:
+            if response.status_code != 200:
+                return
+            async for line in response.aiter_lines():
+                if line == "event: connected":
+                    connected_count += 1
+                    if connected_count == args.streams:
+                        connected.set()
+                elif line.startswith("event: appointment."):
+                    received.append(time.perf_counter())
+                    if len(received) == connected_count:
+                        event_wait.set()
+
+    baseline = rss_kb(args.pid) if args.pid else None
+    event_wait = asyncio.Event()
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(hold(client, event_wait)) for _ in range(args.streams)]
+        try:
+            await asyncio.wait_for(connected.wait(), args.connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+        result = {
+            "streams": args.streams,
+            "connected": connected_count,
+            "connect_seconds": round(time.perf_counter() - started, 2),
+        }
+        if args.pid:
+            await asyncio.sleep(args.hold)
+            result["server_rss_kb_per_stream"] = round((rss_kb(args.pid) - baseline) / max(connected_count, 1), 1)
+
+        if args.doctor_id and args.at and connected_count:
+            headers = {"Authorization": f"Bearer {args.token}"}
+            # Separate client: every connection of the streaming one is busy
+            async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=30) as control:
+                published = time.perf_counter()
+                r = await control.post("/api/appointments", json={"doctor_id": args.doctor_id, "appointment_date": args.at})
+                if r.status_code == 201:
+                    try:
+                        await asyncio.wait_for(event_wait.wait(), 30)
+                    except asyncio.TimeoutError:
+                        pass
+                    result["delivered"] = len(received)
+                    if received:
+                        result["fanout_ms_last"] = round((max(received) - published) * 1000, 1)
+                    await control.delete(f"/api/appointments/{r.json()['id']}")
+                else:
+                    result["booking_error"] = f"{r.status_code} {r.text[:200]}"
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="JWT of the user whose streams are opened")
+    parser.add_argument("--streams", type=int, default=10000)
+    parser.add_argument("--connect-timeout", type=float, default=120)
+    parser.add_argument("--hold", type=float, default=5, help="seconds idle before sampling memory")
+    parser.add_argument("--pid", type=int, help="server process id, for memory per stream")
+    parser.add_argument("--doctor-id", type=int, help="book a slot to measure fan-out (token must be a patient)")
+    parser.add_argument("--at", help="slot start for the fan-out booking")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "notifications", "results": result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
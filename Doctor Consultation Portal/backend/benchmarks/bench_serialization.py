@@ -0,0 +1,162 @@
+"""
+List serialization benchmark
+Times how list endpoints turn rows into a JSON body, before and after the
+fast JSON path, and reports milliseconds per 10k rows:
+
+- fastapi orm:  ORM objects validated into AppointmentResponse and dumped, as
+                response_model did for GET /api/appointments;
+- fastapi rows: the column select, RowShape dicts and fastjson.dumps, as the
+                endpoint does now;
+- flask legacy: rows from a dictionary cursor reformatted in Python (date and
+                timedelta to strings) and dumped with the json module;
+- flask rows:   SQL-formatted tuples zipped into dicts and dumped by the
+                orjson JSON provider.
+
+The FastAPI figures read --rows appointments from the configured database, so
+seed it first; "fetch" is the query plus building objects/rows, "serialize"
+the rest. The Flask figures use synthetic rows shaped like the MySQL driver's
+output, because that part needs no database.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed_data.py fastapi --appointments 20000
+    DATABASE_URL=sqlite:///bench.db python benchmarks/bench_serialization.py --rows 10000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLASK_DIR = os.path.join(os.path.dirname(os.path.dirname(BACKEND_DIR)), "DCP", "backend")
+PER = 10000
+
+def timed(fn, repeat: int) -> list:
+    """Median seconds of each phase; fn returns the perf_counter marks between phases"""
+    runs = [fn() for _ in range(repeat)]
+    return [statistics.median(r[i + 1] - r[i] for r in runs) for i in range(len(runs[0]) - 1)]
+
+def fastapi_paths(rows: int, repeat: int) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from typing import List
+    from pydantic import TypeAdapter
+    from database import SessionLocal
+    from models import Appointment
+    from schemas import AppointmentResponse
+    from queries import appointment_query, appointment_rows_select, APPOINTMENT_ROWS
+    import fastjson
+
+    order = (Appointment.appointment_date.desc(), Appointment.id.desc())
+    adapter = TypeAdapter(List[AppointmentResponse])
+
+    def orm():
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            objects = appointment_query(db).order_by(*order).limit(rows).all()
+            t1 = time.perf_counter()
+            adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+            return t0, t1, time.perf_counter(), len(objects)
+
+    def columns():
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            result = db.execute(appointment_rows_select().order_by(*order).limit(rows)).all()
+            t1 = time.perf_counter()
+            fastjson.dumps(APPOINTMENT_ROWS.dicts(result))
+            return t0, t1, time.perf_counter(), len(result)
+
+    found = orm()[-1]
+    if not found:
+        raise SystemExit("No appointments in the database; run seed_data.py first")
+    return {"fastapi orm": (timed(lambda: orm()[:3], repeat), found),
+            "fastapi rows": (timed(lambda: columns()[:3], repeat), found),
+            "encoder": "orjson" if fastjson.orjson is not None else "pydantic-core"}
+
+def _legacy_format(row):
+    # get_appointments before the change: MySQL TIME comes back as timedelta
+    row["date"] = row["date"].isoformat()
+    minutes = int(row["time"].total_seconds()) // 60
+    row["time"] = f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def flask_paths(rows: int, repeat: int) -> dict:
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    # Loaded under another name: the FastAPI backend has a profiling module too
+    spec = importlib.util.spec_from_file_location("dcp_profiling", os.path.join(FLASK_DIR, "profiling.py"))
+    dcp_profiling = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dcp_profiling)
+    app = Flask(__name__)
+    stock, fast = DefaultJSONProvider(app), dcp_profiling.TimedJSONProvider(app)
+
+    start = date(2026, 1, 1)
+    columns = ("app_id", "date", "time", "status", "doctor_name", "specialization", "fees")
+
+    def driver_dicts():
+        return [{"app_id": i, "date": start + timedelta(days=i % 365), "time": timedelta(minutes=540 + 30 * (i % 16)),
+                 "status": "Booked", "doctor_name": f"Doctor {i % 200}", "specialization": "Cardiology",
+                 "fees": Decimal("500.00")} for i in range(rows)]
+
+    def sql_tuples():
+        return [(i, (start + timedelta(days=i % 365)).isoformat(), f"{9 + (i % 16) // 2:02d}:{30 * (i % 2):02d}",
+                 "Booked", f"Doctor {i % 200}", "Cardiology", Decimal("500.00"),
+                 f"{9 + (i % 16) // 2:02d}:{30 * (i % 2):02d}:00") for i in range(rows)]
+
+    def legacy():
+        data = driver_dicts()
+        t0 = time.perf_counter()
+        for row in data:
+            _legacy_format(row)
+        t1 = time.perf_counter()
+        stock.dumps(data)
+        return t0, t1, time.perf_counter()
+
+    def tuples():
+        data = sql_tuples()
+        t0 = time.perf_counter()
+        data = [dict(zip(columns, row)) for row in data]
+        t1 = time.perf_counter()
+        fast.dumps(data)
+        return t0, t1, time.perf_counter()
+
+    with app.app_context():
+        return {"flask legacy": (timed(legacy, repeat), rows), "flask rows": (timed(tuples, repeat), rows),
+                "encoder": "orjson" if dcp_profiling.orjson is not None else "json"}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=PER)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-fastapi", action="store_true", help="only the Flask paths (no database needed)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    measured = flask_paths(args.rows, args.repeat)
+    encoders = {"flask": measured.pop("encoder")}
+    if not args.skip_fastapi:
+        fastapi = fastapi_paths(args.rows, args.repeat)
+        encoders["fastapi"] = fastapi.pop("encoder")
+        measured = {**fastapi, **measured}
+
+    results = {}
+    print(f"{'path':<14} {'rows':>7} {'fetch/format ms':>16} {'serialize ms':>13} {'total ms':>9}   (per {PER} rows)")
+    for name, ((first, second), n) in measured.items():
+        scale = 1000 * PER / n
+        results[name] = {"rows": n, "fetch_ms": round(first * scale, 2), "serialize_ms": round(second * scale, 2),
+                         "total_ms": round((first + second) * scale, 2)}
+        r = results[name]
+        print(f"{name:<14} {n:>7} {r['fetch_ms']:>16} {r['serialize_ms']:>13} {r['total_ms']:>9}")
+    for before, after in (("fastapi orm", "fastapi rows"), ("flask legacy", "flask rows")):
+        if before in results:
+            print(f"{after}: {results[before]['total_ms'] / results[after]['total_ms']:.1f}x faster than {before}")
+    print(f"encoders: {encoders}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "serialization", "params": vars(args), "encoders": encoders, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
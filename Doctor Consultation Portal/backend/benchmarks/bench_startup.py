@@ -0,0 +1,105 @@
+"""
+Worker cold-start benchmark
+Starts the API in a fresh process several times and measures:
+- how long `import main` takes;
+- how long until the worker answers /health/live (serving);
+- how long until /health/ready reports the database reachable and the
+  connection warm-up finished.
+
+Exits with status 1 when the median time to serving exceeds --budget-ms, so it
+can run in CI next to the other benchmarks:
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 3000
+    DATABASE_URL=sqlite:///bench.db python benchmarks/bench_startup.py --output startup.json
+
+Requires httpx and uvicorn.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_PROBE = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+def import_seconds() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def wait_for(client, path: str, deadline: float, accept) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            r = client.get(path)
+            if accept(r):
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+def cold_start(port: int, timeout: float) -> dict:
+    env = {**os.environ, "JOB_WORKER_ENABLED": os.getenv("JOB_WORKER_ENABLED", "false")}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        deadline = started + timeout
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            live = wait_for(client, "/health/live", deadline, lambda r: r.status_code == 200)
+            ready = live and wait_for(
+                client, "/health/ready", deadline,
+                lambda r: r.status_code == 200 and r.json()["warmup"]["state"] in ("done", "disabled")
+            )
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    def ms(t):
+        return round((t - started) * 1000, 1) if t else None
+    return {"serving_ms": ms(live), "ready_ms": ms(ready)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each start")
+    parser.add_argument("--budget-ms", type=float, default=3000, help="allowed median time to serving")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    imports = [import_seconds() * 1000 for _ in range(args.runs)]
+    runs = []
+    for n in range(args.runs):
+        run = cold_start(args.port, args.timeout)
+        runs.append(run)
+        print(f"run {n + 1}: serving {run['serving_ms']} ms, ready {run['ready_ms']} ms")
+
+    serving = [r["serving_ms"] for r in runs if r["serving_ms"] is not None]
+    ready = [r["ready_ms"] for r in runs if r["ready_ms"] is not None]
+    result = {
+        "import_ms_median": round(statistics.median(imports), 1),
+        "serving_ms_median": round(statistics.median(serving), 1) if serving else None,
+        "serving_ms_max": max(serving) if serving else None,
+        "ready_ms_median": round(statistics.median(ready), 1) if ready else None,
+        "failed_starts": len(runs) - len(serving),
+        "budget_ms": args.budget_ms,
+    }
+    print(f"import {result['import_ms_median']} ms  serving {result['serving_ms_median']} ms (max {result['serving_ms_max']})  "
+          f"ready {result['ready_ms_median']} ms  budget {args.budget_ms} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "startup", "params": vars(args), "results": result, "runs": runs}, f, indent=2)
+    if result["failed_starts"] or result["serving_ms_median"] > args.budget_ms:
+        print("Cold start is over budget" if serving else "Worker never started serving")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
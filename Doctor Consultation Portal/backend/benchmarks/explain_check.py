@@ -0,0 +1,120 @@
+"""
+Query plan check
+Runs EXPLAIN on the hot-path queries and exits with status 1 when any of them
+reads a whole table instead of using an index: type=ALL on MySQL, a plain
+"SCAN <table>" on SQLite. Run it in CI after migrating and seeding, since
+optimizers happily scan tables that hold a handful of rows:
+
+    DATABASE_URL=sqlite:///bench.db python migrate.py
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed_data.py fastapi --appointments 20000
+    DATABASE_URL=sqlite:///bench.db python benchmarks/explain_check.py
+
+The statements are built from the same query builders and filters the
+endpoints use, so a change there that loses its index shows up here.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def hot_queries() -> dict:
+    from sqlalchemy import select
+    from models import (
+        User, Doctor, Appointment, MedicalRecord, IdempotencyKey, Job, WeeklyHours, AvailabilityException,
+        AppointmentStatus, JobStatus
+    )
+    from queries import appointment_rows_select, active_doctor_rows_select
+    from slots import ACTIVE_STATUSES, overlap_select
+    from medical_history import TIMELINE_ROWS
+
+    now = datetime(2030, 1, 1, 9, 0)
+    by_date = (Appointment.appointment_date.desc(), Appointment.id.desc())
+    return {
+        "register: email taken": select(User.id).where(User.email == "someone@example.com"),
+        "login: user by name": select(User).where(User.username == "someone"),
+        "auth: principal": (
+            select(User, Doctor.id).outerjoin(Doctor, Doctor.user_id == User.id).where(User.id == 1)
+        ),
+        "doctors: active list": active_doctor_rows_select().order_by(Doctor.id).limit(51),
+        "doctors: by specialization and location": (
+            select(Doctor.id).where(Doctor.specialization == "Cardiology", Doctor.location == "Delhi")
+        ),
+        "appointments: patient list": appointment_rows_select().where(Appointment.patient_id == 1).order_by(*by_date).limit(51),
+        "appointments: doctor list": appointment_rows_select().where(Appointment.doctor_id == 1).order_by(*by_date).limit(51),
+        "appointments: admin list by status": (
+            appointment_rows_select().where(Appointment.status == AppointmentStatus.PENDING).order_by(*by_date).limit(51)
+        ),
+        "booking: overlapping appointment": overlap_select(1, now).limit(1),
+        "availability: appointments on a day": select(Appointment.doctor_id, Appointment.appointment_date).where(
+            Appointment.status.in_(ACTIVE_STATUSES),
+            Appointment.appointment_date >= now,
+            Appointment.appointment_date < now + timedelta(days=1)
+        ),
+        "availability: exceptions on a day": select(AvailabilityException).where(
+            AvailabilityException.end_date >= now.date(), AvailabilityException.start_date <= now.date()
+        ),
+        "availability: doctor's weekly hours": select(WeeklyHours).where(WeeklyHours.doctor_id == 1),
+        "medical records: patient history": (
+            select(MedicalRecord).where(MedicalRecord.patient_id == 1)
+            .order_by(MedicalRecord.record_date.desc(), MedicalRecord.id.desc()).limit(51)
+        ),
+        "medical records: timeline page": (
+            select(*TIMELINE_ROWS.columns).where(MedicalRecord.patient_id == 1)
+            .order_by(MedicalRecord.record_date.desc(), MedicalRecord.id.desc()).limit(51)
+        ),
+        "idempotency: key lookup": select(IdempotencyKey).where(IdempotencyKey.user_id == 1, IdempotencyKey.key == "k"),
+        "jobs: worker poll": (
+            select(Job).where(Job.status == JobStatus.QUEUED, Job.run_at <= now).order_by(Job.run_at, Job.id).limit(4)
+        ),
+        "jobs: cancel by dedupe key": select(Job.id).where(Job.dedupe_key == "appointment.reminder:1"),
+    }
+
+def explain(conn, statement) -> tuple:
+    """Plan rows as dicts, plus the full-scan tables in them"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "mysql":
+        rows = [dict(r) for r in conn.exec_driver_sql("EXPLAIN " + sql.replace("%", "%%")).mappings()]
+        scans = [r["table"] for r in rows if r.get("type") == "ALL"]
+    elif conn.dialect.name == "sqlite":
+        rows = [dict(r) for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).mappings()]
+        # "SCAN t USING [COVERING] INDEX ..." walks an index in order; a bare "SCAN t" reads the table
+        scans = [r["detail"].split()[1] for r in rows if r["detail"].startswith("SCAN ") and " USING " not in r["detail"]]
+    else:
+        raise SystemExit(f"No EXPLAIN support for {conn.dialect.name}")
+    return rows, scans
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not just the failures")
+    parser.add_argument("--output", help="write the plans as JSON to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from database import get_engine
+    engine = get_engine()
+
+    report, failures = {}, []
+    with engine.connect() as conn:
+        for name, statement in hot_queries().items():
+            rows, scans = explain(conn, statement)
+            report[name] = {"full_scans": scans, "plan": rows}
+            print(f"{'FULL SCAN' if scans else 'ok':<10} {name}" + (f"  ({', '.join(scans)})" if scans else ""))
+            if scans:
+                failures.append(name)
+            if scans or args.verbose:
+                for row in rows:
+                    print(f"{'':<10}   {row}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "explain_check", "dialect": engine.dialect.name, "results": report}, f, indent=2, default=str)
+    if failures:
+        print(f"\n{len(failures)} hot-path queries scan a whole table")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
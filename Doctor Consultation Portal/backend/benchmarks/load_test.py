@@ -0,0 +1,87 @@
+"""
+HTTP load test
+Runs N concurrent clients against a running server for a fixed duration and
+reports requests/sec and latency percentiles per path, e.g. to compare the
+async endpoints with sync ones (or the same endpoint across commits):
+
+    uvicorn main:app --workers 1 &
+    python benchmarks/load_test.py --concurrency 1000 --duration 30 \\
+        --path /api/doctors --path /api/admin/stats --token <admin JWT>
+
+Requires httpx (pip install -r benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_path(base_url: str, path: str, concurrency: int, duration: float, headers: dict) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+async def main_async(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    results = []
+    for path in args.path:
+        result = await run_path(args.base_url, path, args.concurrency, args.duration, headers)
+        results.append(result)
+        print(f"{path:<40} {result['requests_per_sec']:>9} req/s  "
+              f"p50 {result['p50_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  errors {result['errors']}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", required=True, help="GET path to load (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30, help="seconds per path")
+    parser.add_argument("--token", help="bearer token for authenticated paths")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "load_test", "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Synthetic benchmark data
+Generates N doctors, M patients and K appointments, always the same ones for
+the same --seed, so runs on different commits measure the same data. All
+accounts share the password "bench-pass":
+
+- bench_admin is the admin;
+- bench_doctor_<i> are the doctors;
+- bench_patient_<i> are the patients, with e-mail <username>@example.com.
+
+    # FastAPI backend, MySQL from .env or a SQLite stand-in
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed_data.py fastapi --doctors 200 --patients 5000 --appointments 50000
+    # Flask backend (DCP), MySQL from its DB_* settings
+    python benchmarks/seed_data.py flask --doctors 200 --patients 5000 --appointments 50000
+
+FastAPI rows go through bulk_import.py with a pre-computed bcrypt hash, so
+seeding costs one hash. Run it against an empty database.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLASK_DIR = os.path.join(os.path.dirname(os.path.dirname(BACKEND_DIR)), "DCP", "backend")
+
+PASSWORD = "bench-pass"
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Orthopedics", "Pediatrics",
+                   "Psychiatry", "General Medicine", "Gynecology", "ENT", "Ophthalmology"]
+LOCATIONS = ["Delhi", "Mumbai", "Bangalore", "Chennai", "Kolkata", "Hyderabad", "Pune", "Jaipur"]
+# (status, weight): history is mostly completed, the future mostly pending/confirmed
+PAST_STATUSES = [("completed", 80), ("cancelled", 20)]
+FUTURE_STATUSES = [("pending", 60), ("confirmed", 30), ("cancelled", 10)]
+DAYS_BACK = 180
+DAYS_AHEAD = 60
+SLOT_MINUTES = 30
+OPEN_HOUR, CLOSE_HOUR = 9, 17
+
+def doctor_rows(count: int, rng: random.Random):
+    for i in range(count):
+        yield {
+            "username": f"bench_doctor_{i}",
+            "email": f"bench_doctor_{i}@example.com",
+            "phone": f"98{i:08d}",
+            "specialization": SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+            "experience_years": rng.randint(1, 35),
+            "qualification": "MBBS, MD",
+            "consultation_fee": float(rng.choice([300, 500, 800, 1000, 1500])),
+            "location": LOCATIONS[rng.randrange(len(LOCATIONS))],
+            "available_from": f"{OPEN_HOUR:02d}:00:00",
+            "available_to": f"{CLOSE_HOUR:02d}:00:00",
+        }
+
+def patient_rows(count: int):
+    for i in range(count):
+        yield {"username": f"bench_patient_{i}", "email": f"bench_patient_{i}@example.com", "phone": f"97{i:08d}"}
+
+def appointment_rows(count: int, doctors: int, patients: int, rng: random.Random, today: datetime):
+    """Appointments on distinct (doctor, slot) pairs, so none clash with the active-slot constraint"""
+    slots_per_day = (CLOSE_HOUR - OPEN_HOUR) * 60 // SLOT_MINUTES
+    capacity = doctors * (DAYS_BACK + DAYS_AHEAD) * slots_per_day
+    if count > capacity:
+        raise SystemExit(f"{count} appointments don't fit in {capacity} doctor slots; add doctors")
+    taken = set()
+    while len(taken) < count:
+        slot = (rng.randrange(doctors), rng.randrange(-DAYS_BACK, DAYS_AHEAD), rng.randrange(slots_per_day))
+        if slot in taken:
+            continue
+        taken.add(slot)
+        doctor, day, index = slot
+        when = today + timedelta(days=day, hours=OPEN_HOUR, minutes=index * SLOT_MINUTES)
+        statuses = PAST_STATUSES if day < 0 else FUTURE_STATUSES
+        status = rng.choices([s for s, _ in statuses], weights=[w for _, w in statuses])[0]
+        yield {
+            "doctor": doctor,
+            "patient": rng.randrange(patients),
+            "when": when,
+            "status": status,
+        }
+
+# ---------- FastAPI ----------
+
+def seed_fastapi(args, rng: random.Random, today: datetime) -> dict:
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from database import SessionLocal, get_engine
+    from bulk_import import BulkImporter
+    from hashing import BCRYPT_ROUNDS, hash_password
+    from models import User, UserRole
+    import migrate
+
+    migrate.upgrade(get_engine())
+    password_hash = hash_password(PASSWORD, BCRYPT_ROUNDS)
+    with SessionLocal() as db:
+        if db.query(User).filter(User.username == "bench_admin").first() is None:
+            db.add(User(username="bench_admin", email="bench_admin@example.com", phone="9900000000",
+                        password_hash=password_hash, role=UserRole.ADMIN, is_active=True))
+            db.commit()
+
+    reports = {}
+    def run(dataset, rows):
+        report = BulkImporter(dataset, hash_workers=0).run(rows).as_dict()
+        report.pop("errors")
+        reports[dataset] = report
+        print(f"{dataset:<13} {report['inserted']:>8} inserted  {report['failed']:>6} failed  {report['elapsed_seconds']}s")
+
+    run("doctors", ({**row, "password_hash": password_hash} for row in doctor_rows(args.doctors, rng)))
+    run("patients", ({**row, "password_hash": password_hash} for row in patient_rows(args.patients)))
+    run("appointments", ({
+        "doctor_username": f"bench_doctor_{a['doctor']}",
+        "patient_username": f"bench_patient_{a['patient']}",
+        "appointment_date": a["when"].isoformat(),
+        "status": a["status"],
+        "reason": "benchmark",
+    } for a in appointment_rows(args.appointments, args.doctors, args.patients, rng, today)))
+    return reports
+
+# ---------- Flask ----------
+
+# The Flask schema has its own status vocabulary
+FLASK_STATUS = {"pending": "Booked", "confirmed": "approved", "completed": "completed", "cancelled": "cancelled"}
+
+def seed_flask(args, rng: random.Random, today: datetime) -> dict:
+    import mysql.connector
+    sys.path.insert(0, FLASK_DIR)
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(FLASK_DIR, ".env"))
+    conn = mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"), database=os.getenv("DB_NAME", "dr_portal"),
+        user=os.getenv("DB_USER", "root"), password=os.getenv("DB_PASSWORD", "")
+    )
+    cursor = conn.cursor()
+    counts = {}
+
+    def insert_many(table, sql, rows):
+        started = time.perf_counter()
+        rows = list(rows)
+        for start in range(0, len(rows), args.batch_size):
+            cursor.executemany(sql, rows[start:start + args.batch_size])
+            conn.commit()
+        counts[table] = {"inserted": len(rows), "elapsed_seconds": round(time.perf_counter() - started, 2)}
+        print(f"{table:<13} {len(rows):>8} inserted  {counts[table]['elapsed_seconds']}s")
+
+    cursor.execute("INSERT IGNORE INTO admin (username, password) VALUES (%s, %s)", ("bench_admin", PASSWORD))
+    conn.commit()
+    insert_many("doctor", "INSERT INTO doctor (name, specialization, email, password, fees) VALUES (%s, %s, %s, %s, %s)", (
+        (row["username"], row["specialization"], row["email"], PASSWORD, row["consultation_fee"])
+        for row in doctor_rows(args.doctors, rng)
+    ))
+    insert_many("patient", "INSERT INTO patient (name, email, password, phone) VALUES (%s, %s, %s, %s)", (
+        (row["username"], row["email"], PASSWORD, row["phone"]) for row in patient_rows(args.patients)
+    ))
+    # Generated rows are numbered from 0; map them onto the ids MySQL assigned
+    cursor.execute("SELECT doctor_id FROM doctor WHERE email LIKE 'bench\\_doctor\\_%' ORDER BY doctor_id")
+    doctor_ids = [r[0] for r in cursor.fetchall()]
+    cursor.execute("SELECT patient_id FROM patient WHERE email LIKE 'bench\\_patient\\_%' ORDER BY patient_id")
+    patient_ids = [r[0] for r in cursor.fetchall()]
+    insert_many("appointments", "INSERT INTO appointments (doctor_id, patient_id, date, time, status) VALUES (%s, %s, %s, %s, %s)", (
+        (doctor_ids[a["doctor"]], patient_ids[a["patient"]], a["when"].date(), a["when"].time(), FLASK_STATUS[a["status"]])
+        for a in appointment_rows(args.appointments, len(doctor_ids), len(patient_ids), rng, today)
+    ))
+    cursor.close()
+    conn.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backend", choices=["fastapi", "flask"])
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=2000, help="rows per INSERT batch (flask)")
+    parser.add_argument("--output", help="write the row counts as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Dates are relative to today so the future part of the calendar stays in the future
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    seed = seed_fastapi if args.backend == "fastapi" else seed_flask
+    result = seed(args, rng, today)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "seed_data", "backend": args.backend, "params": vars(args), "results": result}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
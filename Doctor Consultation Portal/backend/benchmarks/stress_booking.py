@@ -0,0 +1,93 @@
+"""
+Booking race stress test
+Hundreds of threads release at once to book the same doctor and slot on a
+running server. Exactly one booking may succeed; every other request must get
+409. A retry of the winning request with its Idempotency-Key must replay the
+same appointment and not create a second one. Exits 1 on any violation.
+
+    uvicorn main:app --workers 4 &
+    python benchmarks/stress_booking.py --doctor-id 1 --at 2026-11-02T10:00:00 --threads 300
+
+Patients are registered on the fly (stress_patient_<run>_<n>). Requires httpx.
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+def make_patients(client: httpx.Client, count: int, run_id: str) -> list:
+    def register_and_login(n):
+        username = f"stress_patient_{run_id}_{n}"
+        client.post("/api/auth/register", json={
+            "username": username, "password": "stress-pass", "email": f"{username}@example.com",
+            "phone": "9000000000", "role": "patient"
+        }).raise_for_status()
+        r = client.post("/api/auth/login", data={"username": username, "password": "stress-pass"})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(register_and_login, range(count)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--doctor-id", type=int, required=True)
+    parser.add_argument("--at", required=True, help="slot start, e.g. 2026-11-02T10:00:00 (must be free)")
+    parser.add_argument("--threads", type=int, default=300)
+    parser.add_argument("--patients", type=int, default=20, help="distinct patients sharing the threads")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.threads, max_keepalive_connections=args.threads)
+    with httpx.Client(base_url=args.base_url, limits=limits, timeout=60) as client:
+        patients = make_patients(client, args.patients, run_id)
+        body = {"doctor_id": args.doctor_id, "appointment_date": args.at, "reason": "stress test"}
+        start_gate = threading.Barrier(args.threads)
+
+        def book(n):
+            headers = {**patients[n % len(patients)], "Idempotency-Key": f"{run_id}-{n}"}
+            start_gate.wait()
+            r = client.post("/api/appointments", json=body, headers=headers)
+            return n, headers, r
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(book, range(args.threads)))
+        elapsed = time.perf_counter() - started
+
+        codes = Counter(r.status_code for _, _, r in results)
+        print(f"{args.threads} concurrent bookings in {elapsed:.2f}s: {dict(codes)}")
+        failures = []
+        winners = [(headers, r) for _, headers, r in results if r.status_code == 201]
+        if len(winners) != 1:
+            failures.append(f"expected exactly 1 booking, got {len(winners)}")
+        if codes[409] != args.threads - len(winners):
+            failures.append(f"expected every other request to get 409, got {dict(codes)}")
+
+        if winners:
+            headers, first = winners[0]
+            retry = client.post("/api/appointments", json=body, headers=headers)
+            if retry.status_code != 201 or retry.json()["id"] != first.json()["id"] \
+                    or retry.headers.get("Idempotent-Replayed") != "true":
+                failures.append(f"idempotent retry did not replay appointment {first.json()['id']}: "
+                                f"{retry.status_code} {retry.text[:200]}")
+            loser = next((headers for _, headers, r in results if r.status_code == 409), None)
+            if loser:
+                again = client.post("/api/appointments", json=body, headers=loser)
+                if again.status_code != 409 or again.headers.get("Idempotent-Replayed") != "true":
+                    failures.append(f"conflict retry was not replayed: {again.status_code}")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        sys.exit(1)
+    print("OK: exactly one booking, conflicts and retries are deterministic")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark suite
+Runs scripted scenarios against a running FastAPI (main.py) or Flask (DCP
+app.py) server seeded with benchmarks/seed_data.py. For each scenario it
+reports throughput, p50/p95/p99 latency, status codes and DB queries per
+request. The query count is read from the X-DB-Queries header, so start the
+server with DB_QUERY_HEADER=true.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed_data.py fastapi
+    DATABASE_URL=sqlite:///bench.db DB_QUERY_HEADER=true uvicorn main:app --workers 1 &
+    python benchmarks/suite.py fastapi --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py fastapi --baseline benchmarks/results/<older commit>.json
+
+Scenarios:
+    login         login storm over the seeded patients
+    search        doctor search by specialization and location
+    booking       many patients booking the same few slots; 409s are expected
+    dashboard     a patient's appointment list
+    admin_stats   the admin statistics page
+
+The Flask app has no search filters and no stats endpoint. There, search
+lists /api/doctors and admin_stats lists /api/admin/doctors.
+With --baseline, scenarios whose p95 grew or throughput fell by more than
+--threshold are flagged, and --fail-on-regression turns that into exit code 1.
+Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httpx
+
+from load_test import percentile
+from seed_data import PASSWORD, SPECIALIZATIONS, LOCATIONS, DAYS_AHEAD, OPEN_HOUR, SLOT_MINUTES
+
+SCENARIOS = ("login", "search", "booking", "dashboard", "admin_stats")
+QUERY_COUNT_HEADER = "X-DB-Queries"
+
+class FastAPITarget:
+    name = "fastapi"
+    default_url = "http://localhost:8000"
+
+    async def login(self, client, username: str, admin: bool = False) -> httpx.Response:
+        return await client.post("/api/auth/login", data={"username": username, "password": PASSWORD})
+
+    def auth(self, response: httpx.Response) -> dict:
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def doctor_ids(self, client) -> list:
+        r = await client.get("/api/doctors", params={"limit": 200})
+        return [d["id"] for d in r.json()]
+
+    async def search(self, client, rng: random.Random, headers: dict) -> httpx.Response:
+        params = {"specialization": rng.choice(SPECIALIZATIONS), "location": rng.choice(LOCATIONS), "limit": 20}
+        return await client.get("/api/doctors/search", params=params)
+
+    async def book(self, client, doctor_id: int, when: datetime, headers: dict) -> httpx.Response:
+        body = {"doctor_id": doctor_id, "appointment_date": when.isoformat(), "reason": "benchmark"}
+        return await client.post("/api/appointments", json=body, headers=headers)
+
+    async def dashboard(self, client, headers: dict) -> httpx.Response:
+        return await client.get("/api/appointments", params={"limit": 20}, headers=headers)
+
+    async def admin_stats(self, client, headers: dict) -> httpx.Response:
+        return await client.get("/api/admin/stats", headers=headers)
+
+class FlaskTarget:
+    name = "flask"
+    default_url = "http://localhost:5000"
+
+    async def login(self, client, username: str, admin: bool = False) -> httpx.Response:
+        body = {"user_type": "admin" if admin else "patient", "password": PASSWORD,
+                "email": username if admin else f"{username}@example.com"}
+        return await client.post("/api/login", json=body)
+
+    def auth(self, response: httpx.Response) -> dict:
+        # Session cookie sent by hand, so one client can act as many users
+        return {"Cookie": f"session={response.cookies['session']}"}
+
+    async def doctor_ids(self, client) -> list:
+        r = await client.get("/api/doctors", params={"limit": 200})
+        return [d["doctor_id"] for d in r.json()]
+
+    async def search(self, client, rng: random.Random, headers: dict) -> httpx.Response:
+        return await client.get("/api/doctors", params={"limit": 20})
+
+    async def book(self, client, doctor_id: int, when: datetime, headers: dict) -> httpx.Response:
+        body = {"doctor_id": doctor_id, "date": when.date().isoformat(), "time": when.strftime("%H:%M:%S")}
+        return await client.post("/api/appointments", json=body, headers=headers)
+
+    async def dashboard(self, client, headers: dict) -> httpx.Response:
+        return await client.get("/api/appointments", params={"limit": 20}, headers=headers)
+
+    async def admin_stats(self, client, headers: dict) -> httpx.Response:
+        return await client.get("/api/admin/doctors", params={"limit": 50}, headers=headers)
+
+TARGETS = {"fastapi": FastAPITarget, "flask": FlaskTarget}
+
+# ---------- running ----------
+
+async def drive(client, request, concurrency: int, duration: float) -> dict:
+    """Call request(rng) from `concurrency` workers for `duration` seconds and summarize"""
+    latencies, codes, queries = [], Counter(), []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n):
+        nonlocal errors
+        rng = random.Random(n)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await request(rng)
+            except httpx.HTTPError:
+                errors += 1
+                codes["error"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            codes[str(response.status_code)] += 1
+            count = response.headers.get(QUERY_COUNT_HEADER)
+            if count is not None:
+                queries.append(int(count))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "transport_errors": errors,
+        "status_codes": dict(codes),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "db_queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+async def sign_in(target, client, usernames: list, admin: bool = False) -> list:
+    sessions = []
+    for username in usernames:
+        r = await target.login(client, username, admin=admin)
+        if r.status_code != 200:
+            raise SystemExit(f"Login as {username} failed ({r.status_code}); is the database seeded? {r.text[:200]}")
+        sessions.append(target.auth(r))
+    return sessions
+
+async def run_suite(args) -> dict:
+    target = TARGETS[args.backend]()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url or target.default_url, limits=limits, timeout=60) as client:
+        patients = await sign_in(target, client, [f"bench_patient_{i}" for i in range(args.sessions)])
+        admin = (await sign_in(target, client, ["bench_admin"], admin=True))[0]
+        doctors = (await target.doctor_ids(client))[:args.booking_doctors]
+        # A day past the seeded calendar, so the contended slots start out free on a fresh database
+        day = datetime.now().replace(hour=OPEN_HOUR, minute=0, second=0, microsecond=0) + timedelta(days=DAYS_AHEAD + 7)
+        slots = [day + timedelta(minutes=SLOT_MINUTES * k) for k in range(args.booking_slots)]
+
+        requests = {
+            "login": lambda rng: target.login(client, f"bench_patient_{rng.randrange(args.patients)}"),
+            "search": lambda rng: target.search(client, rng, {}),
+            "booking": lambda rng: target.book(client, rng.choice(doctors), rng.choice(slots), rng.choice(patients)),
+            "dashboard": lambda rng: target.dashboard(client, rng.choice(patients)),
+            "admin_stats": lambda rng: target.admin_stats(client, admin),
+        }
+        for name in args.scenario or SCENARIOS:
+            result = await drive(client, requests[name], args.concurrency, args.duration)
+            results[name] = result
+            queries = result["db_queries_per_request"]
+            print(f"{name:<12} {result['requests_per_sec']:>9} req/s  p50 {result['p50_ms']:>7} ms  "
+                  f"p95 {result['p95_ms']:>7} ms  p99 {result['p99_ms']:>7} ms  "
+                  f"queries/req {queries if queries is not None else '-':>5}  {result['status_codes']}")
+    return results
+
+# ---------- comparison ----------
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print the change against a previous run; return the scenarios that regressed"""
+    regressions = []
+    print(f"\nvs {baseline.get('commit') or 'baseline'}:")
+    for name, now in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        p95 = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        rps = (now["requests_per_sec"] - before["requests_per_sec"]) / before["requests_per_sec"] if before["requests_per_sec"] else 0.0
+        worse = p95 > threshold or rps < -threshold
+        queries = ""
+        if now["db_queries_per_request"] is not None and before.get("db_queries_per_request") is not None:
+            queries = f"  queries/req {before['db_queries_per_request']} -> {now['db_queries_per_request']}"
+            worse = worse or now["db_queries_per_request"] > before["db_queries_per_request"]
+        print(f"{name:<12} p95 {p95:+.1%}  req/s {rps:+.1%}{queries}{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backend", choices=sorted(TARGETS))
+    parser.add_argument("--base-url", help="default: http://localhost:8000 (fastapi) or :5000 (flask)")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--patients", type=int, default=1000, help="seeded patients the login storm picks from")
+    parser.add_argument("--sessions", type=int, default=50, help="patients signed in for booking and dashboard")
+    parser.add_argument("--booking-doctors", type=int, default=1, help="doctors the booking scenario contends on")
+    parser.add_argument("--booking-slots", type=int, default=4, help="slots the booking scenario contends on")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change flagged as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(args))
+    report = {
+        "benchmark": "suite",
+        "backend": args.backend,
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "fail_on_regression")},
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Bulk import of patients, doctors and appointment history
+Rows stream in from CSV or NDJSON. Each batch is validated with the schemas.py
+models, checked against in-memory username/email sets and inserted with one
+executemany per table in its own transaction. Plaintext passwords are hashed
+in a process pool; rows that already carry a bcrypt password_hash skip hashing
+altogether, which is what makes migrations from another system fast. Invalid
+rows are reported by row number and never stop the import.
+
+    python bulk_import.py doctors doctors.csv
+    python bulk_import.py appointments history.ndjson --errors errors.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time as _time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice, repeat
+from typing import Callable, Iterable, Iterator, Optional
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, get_engine
+from models import User, Doctor, Appointment, UserRole, AppointmentStatus
+from schemas import UserCreate, DoctorBase, AppointmentBase
+from hashing import BCRYPT_ROUNDS, HASH_MP_CONTEXT, hash_password
+import migrate
+from replicas import recent_writes, DOCTOR_LISTINGS
+from response_cache import doctor_cache
+from search_index import doctor_index
+from slots import ACTIVE_STATUSES
+from availability import availability_calendar
+from stats import stats_cache
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 1)))  # 0 hashes inline
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))  # errors kept in the report
+IMPORT_DATASETS = ("patients", "doctors", "appointments")
+IMPORT_FORMATS = ("csv", "ndjson")
+
+class RowError(ValueError):
+    """A row that can't be imported; the message goes into the report"""
+
+@dataclass
+class ImportReport:
+    dataset: str
+    rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def add_error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        minutes = self.elapsed_seconds / 60
+        return {
+            "dataset": self.dataset,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "rows_per_minute": round(self.rows / minutes) if minutes else None,
+        }
+
+# ---------- input ----------
+
+def read_rows(stream: io.TextIOBase, fmt: str) -> Iterator[dict]:
+    """Yield one dict per input row; empty CSV cells become None"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {k.strip(): (v if v != "" else None) for k, v in row.items() if k}
+    elif fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"__error__": f"Invalid JSON: {e.msg}"}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[list]:
+    numbered = enumerate(rows, start=1)
+    while True:
+        batch = list(islice(numbered, size))
+        if not batch:
+            return
+        yield batch
+
+# ---------- importer ----------
+
+class BulkImporter:
+    def __init__(self, dataset: str, batch_size: int = IMPORT_BATCH_SIZE,
+                 hash_workers: int = IMPORT_HASH_WORKERS, dry_run: bool = False,
+                 on_error: Optional[Callable[[int, str], None]] = None):
+        if dataset not in IMPORT_DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
+        self.dry_run = dry_run
+        self.on_error = on_error
+        self._pool = None
+        self._usernames = set()
+        self._emails = set()
+        self._active_slots = set()
+
+    def run(self, rows: Iterable[dict]) -> ImportReport:
+        report = ImportReport(self.dataset)
+        started = _time.perf_counter()
+        db = SessionLocal()
+        try:
+            if self.dataset in ("patients", "doctors"):
+                # Seed the dedupe sets once instead of two SELECTs per row
+                for username, email in db.execute(select(User.username, User.email)):
+                    self._usernames.add(username)
+                    self._emails.add(email)
+            for batch in _batches(rows, self.batch_size):
+                report.rows += len(batch)
+                prepared = self._prepare(db, batch, report)
+                if prepared and not self.dry_run:
+                    report.inserted += self._insert(db, prepared, report)
+                elif prepared:
+                    report.inserted += len(prepared)
+        finally:
+            db.close()
+            if self._pool is not None:
+                self._pool.shutdown()
+            if report.inserted and not self.dry_run:
+                # Derived caches were built from the old rows
+                stats_cache.invalidate()
+                if self.dataset == "doctors":
+                    doctor_index.invalidate()
+                    doctor_cache.invalidate()
+                    recent_writes.mark(DOCTOR_LISTINGS)
+                    availability_calendar.invalidate()
+                elif self.dataset == "appointments":
+                    availability_calendar.invalidate()
+        report.elapsed_seconds = _time.perf_counter() - started
+        return report
+
+    def _error(self, report: ImportReport, row: int, message: str):
+        report.add_error(row, message)
+        if self.on_error:
+            self.on_error(row, message)
+
+    # ---------- validation ----------
+
+    def _prepare(self, db, batch: list, report: ImportReport) -> list:
+        """Validate a batch and return (row number, values) pairs ready to insert"""
+        if self.dataset == "appointments":
+            return self._prepare_appointments(db, batch, report)
+
+        role = UserRole.DOCTOR if self.dataset == "doctors" else UserRole.PATIENT
+        prepared, to_hash = [], []
+        for number, row in batch:
+            try:
+                values = self._validate_user(row, role)
+                if self.dataset == "doctors":
+                    values["doctor"] = self._validate_doctor(row)
+            except RowError as e:
+                self._error(report, number, str(e))
+                continue
+            self._usernames.add(values["username"])
+            self._emails.add(values["email"])
+            if values["password_hash"] is None:
+                to_hash.append(len(prepared))
+            prepared.append((number, values))
+
+        if to_hash:
+            hashes = self._hash_all([prepared[i][1].pop("password") for i in to_hash])
+            for i, hashed in zip(to_hash, hashes):
+                prepared[i][1]["password_hash"] = hashed
+        for _, values in prepared:
+            values.pop("password", None)
+        return prepared
+
+    def _validate_user(self, row: dict, role: UserRole) -> dict:
+        if "__error__" in row:
+            raise RowError(row["__error__"])
+        password_hash = row.get("password_hash")
+        try:
+            user = UserCreate(
+                username=row.get("username"), email=row.get("email"), phone=row.get("phone"),
+                password=row.get("password") or "", role=role
+            )
+        except ValidationError as e:
+            raise RowError(_validation_message(e))
+        if password_hash:
+            if not password_hash.startswith("$2"):
+                raise RowError("password_hash must be a bcrypt hash")
+        elif not user.password.strip():
+            raise RowError("password or password_hash is required")
+        if user.username in self._usernames:
+            raise RowError("Username already registered")
+        if user.email in self._emails:
+            raise RowError("Email already registered")
+        return {
+            "username": user.username,
+            "email": user.email,
+            "phone": user.phone,
+            "role": role,
+            "is_active": True,
+            "password": user.password,
+            "password_hash": password_hash or None,
+        }
+
+    def _validate_doctor(self, row: dict) -> dict:
+        try:
+            doctor = DoctorBase(**{k: row.get(k) for k in DoctorBase.model_fields if row.get(k) is not None})
+        except ValidationError as e:
+            raise RowError(_validation_message(e))
+        values = doctor.model_dump()
+        values["is_available"] = str(row.get("is_available", True)).lower() not in ("0", "false", "no")
+        return values
+
+    def _hash_all(self, passwords: list) -> list:
+        if self.hash_workers <= 0:
+            return [hash_password(p, BCRYPT_ROUNDS) for p in passwords]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.hash_workers, mp_context=HASH_MP_CONTEXT)
+        chunksize = max(1, len(passwords) // (self.hash_workers * 4))
+        return list(self._pool.map(hash_password, passwords, repeat(BCRYPT_ROUNDS), chunksize=chunksize))
+
+    def _prepare_appointments(self, db, batch: list, report: ImportReport) -> list:
+        patients, doctors = self._resolve_users(db, batch)
+        prepared = []
+        for number, row in batch:
+            try:
+                if "__error__" in row:
+                    raise RowError(row["__error__"])
+                try:
+                    appointment = AppointmentBase(appointment_date=row.get("appointment_date"), reason=row.get("reason"))
+                    status = AppointmentStatus(row.get("status") or AppointmentStatus.PENDING.value)
+                except ValidationError as e:
+                    raise RowError(_validation_message(e))
+                except ValueError:
+                    raise RowError(f"status: must be one of {', '.join(s.value for s in AppointmentStatus)}")
+                patient_id = patients.get(row.get("patient_username"))
+                if patient_id is None:
+                    raise RowError("patient_username: no such patient")
+                doctor_id = doctors.get(row.get("doctor_username"))
+                if doctor_id is None:
+                    raise RowError("doctor_username: no such doctor")
+                when = appointment.appointment_date.replace(tzinfo=None)
+                if status in ACTIVE_STATUSES:
+                    if (doctor_id, when) in self._active_slots:
+                        raise RowError("Time slot already booked")
+                    self._active_slots.add((doctor_id, when))
+            except RowError as e:
+                self._error(report, number, str(e))
+                continue
+            prepared.append((number, {
+                "patient_id": patient_id,
+                "doctor_id": doctor_id,
+                "appointment_date": when,
+                "status": status,
+                "reason": appointment.reason,
+                "notes": row.get("notes"),
+            }))
+        return prepared
+
+    def _resolve_users(self, db, batch: list):
+        """username -> patient user id and doctor username -> doctor id for one batch"""
+        patient_names = {row.get("patient_username") for _, row in batch} - {None}
+        doctor_names = {row.get("doctor_username") for _, row in batch} - {None}
+        patients = dict(db.execute(
+            select(User.username, User.id).where(User.username.in_(patient_names), User.role == UserRole.PATIENT)
+        ).all()) if patient_names else {}
+        doctors = dict(db.execute(
+            select(User.username, Doctor.id).join(Doctor, Doctor.user_id == User.id)
+            .where(User.username.in_(doctor_names))
+        ).all()) if doctor_names else {}
+        return patients, doctors
+
+    # ---------- insertion ----------
+
+    def _insert(self, db, prepared: list, report: ImportReport) -> int:
+        """Insert a batch in one transaction; on a constraint clash retry row by row to find the culprits"""
+        try:
+            self._write(db, [values for _, values in prepared])
+            db.commit()
+            return len(prepared)
+        except IntegrityError:
+            db.rollback()
+        inserted = 0
+        for number, values in prepared:
+            try:
+                self._write(db, [values])
+                db.commit()
+                inserted += 1
+            except IntegrityError as e:
+                db.rollback()
+                self._error(report, number, f"Rejected by the database: {e.orig}")
+        return inserted
+
+    def _write(self, db, rows: list):
+        if self.dataset == "appointments":
+            db.execute(insert(Appointment), rows)
+            return
+        profiles = [values.pop("doctor", None) for values in rows]
+        try:
+            db.execute(insert(User), rows)
+            if self.dataset == "doctors":
+                # MySQL has no INSERT ... RETURNING, so look the new ids up by username
+                ids = dict(db.execute(
+                    select(User.username, User.id).where(User.username.in_([r["username"] for r in rows]))
+                ).all())
+                db.execute(insert(Doctor), [
+                    {**profile, "user_id": ids[values["username"]]} for values, profile in zip(rows, profiles)
+                ])
+        finally:
+            # Put the profiles back so a row-by-row retry sees complete rows
+            for values, profile in zip(rows, profiles):
+                if profile is not None:
+                    values["doctor"] = profile
+
+def import_stream(dataset: str, stream: io.TextIOBase, fmt: str, **options) -> ImportReport:
+    return BulkImporter(dataset, **options).run(read_rows(stream, fmt))
+
+# ---------- CLI ----------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=IMPORT_DATASETS)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--hash-workers", type=int, default=IMPORT_HASH_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="validate only, insert nothing")
+    parser.add_argument("--errors", help="write every row error as NDJSON to this file")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    migrate.upgrade(get_engine())
+
+    errors_out = open(args.errors, "w") if args.errors else None
+    on_error = (lambda row, message: errors_out.write(json.dumps({"row": row, "error": message}) + "\n")) \
+        if errors_out else None
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    try:
+        report = import_stream(
+            args.dataset, stream, fmt, batch_size=args.batch_size,
+            hash_workers=args.hash_workers, dry_run=args.dry_run, on_error=on_error
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if errors_out:
+            errors_out.close()
+
+    summary = report.as_dict()
+    summary.pop("errors")
+    print(json.dumps(summary, indent=2))
+    for error in report.errors[:20]:
+        print(f"row {error['row']}: {error['error']}")
+    sys.exit(1 if report.failed else 0)
+
+if __name__ == "__main__":
+    main()
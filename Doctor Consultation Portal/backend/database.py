@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from pool_metrics import engine_options, instrument
+from profiling import instrument_queries
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,13 +17,56 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "doctor_portal")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL overrides the DB_* settings, e.g. sqlite:///bench.db as a local stand-in
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _async_url(url: str) -> str:
+    return url.replace("mysql+pymysql://", "mysql+aiomysql://").replace("sqlite://", "sqlite+aiosqlite://")
+
+def _connect_args(url: str) -> dict:
+    # SQLite connections are shared across the threadpool
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+CONNECT_ARGS = _connect_args(DATABASE_URL)
+# Optional read replica for GET endpoints (see replicas.py); unset = everything on the primary
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+REPLICA_ASYNC_DATABASE_URL = os.getenv("REPLICA_ASYNC_DATABASE_URL") or (
+    _async_url(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+)
 
 Base = declarative_base()
 
+# Engines are created on first use rather than at import, so importing the app
+# (every worker, every script) neither loads the driver nor needs the database
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL, echo=False, connect_args=CONNECT_ARGS, **engine_options())
+        instrument(_engine, "sync")
+        instrument_queries(_engine)
+    return _engine
+
+class _LazySessionmaker(sessionmaker):
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and local_kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+SessionLocal = _LazySessionmaker(get_engine, autocommit=False, autoflush=False)
+
+def __getattr__(name):
+    # `from database import engine` keeps working; it creates the engine at that point
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -28,3 +74,70 @@ def get_db():
     finally:
         db.close()
 
+# Async engine for async endpoints; created on first use so the sync-only
+# code paths (init_db.py, scripts) don't need the async driver
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, echo=False, connect_args=CONNECT_ARGS, **engine_options(async_engine=True)
+        )
+        instrument(_async_engine.sync_engine, "async")
+        instrument_queries(_async_engine.sync_engine)
+        # Objects stay usable after commit without a lazy refresh (which async can't do implicitly)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+# Replica engines, same lazy pattern; None when no replica is configured
+_replica_engine = None
+_async_replica_engine = None
+_AsyncReplicaSessionLocal = None
+
+def get_replica_engine():
+    global _replica_engine
+    if _replica_engine is None and REPLICA_DATABASE_URL:
+        _replica_engine = create_engine(
+            REPLICA_DATABASE_URL, echo=False, connect_args=_connect_args(REPLICA_DATABASE_URL), **engine_options()
+        )
+        instrument(_replica_engine, "replica")
+        instrument_queries(_replica_engine)
+    return _replica_engine
+
+def get_async_replica_engine():
+    global _async_replica_engine, _AsyncReplicaSessionLocal
+    if _async_replica_engine is None and REPLICA_ASYNC_DATABASE_URL:
+        _async_replica_engine = create_async_engine(
+            REPLICA_ASYNC_DATABASE_URL, echo=False, connect_args=_connect_args(REPLICA_ASYNC_DATABASE_URL),
+            **engine_options(async_engine=True)
+        )
+        instrument(_async_replica_engine.sync_engine, "async-replica")
+        instrument_queries(_async_replica_engine.sync_engine)
+        _AsyncReplicaSessionLocal = async_sessionmaker(_async_replica_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_replica_engine
+
+ReplicaSessionLocal = _LazySessionmaker(get_replica_engine, autocommit=False, autoflush=False)
+
+def async_session(replica: bool = False) -> AsyncSession:
+    """A new AsyncSession on the primary, or on the replica"""
+    if replica:
+        get_async_replica_engine()
+        return _AsyncReplicaSessionLocal()
+    get_async_engine()
+    return _AsyncSessionLocal()
+
+async def dispose_engines():
+    """Close pooled connections on shutdown"""
+    for engine in (_async_engine, _async_replica_engine):
+        if engine is not None:
+            await engine.dispose()
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            engine.dispose()
@@ -0,0 +1,84 @@
+"""
+Streaming exports
+Rows are read through a server-side cursor and written out one batch at a
+time, so memory stays flat no matter how many rows a table holds
+"""
+import csv
+import enum
+import io
+import json
+import os
+from datetime import date, datetime, time
+from sqlalchemy import select
+from database import SessionLocal
+from models import Appointment, MedicalRecord
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# dataset name -> (columns, ordering column)
+EXPORT_DATASETS = {
+    "appointments": (
+        [
+            Appointment.id, Appointment.patient_id, Appointment.doctor_id,
+            Appointment.appointment_date, Appointment.status, Appointment.reason,
+            Appointment.notes, Appointment.created_at, Appointment.updated_at
+        ],
+        Appointment.id
+    ),
+    "medical-records": (
+        [
+            MedicalRecord.id, MedicalRecord.patient_id, MedicalRecord.doctor_id,
+            MedicalRecord.appointment_id, MedicalRecord.diagnosis, MedicalRecord.prescription,
+            MedicalRecord.test_results, MedicalRecord.notes, MedicalRecord.record_date,
+            MedicalRecord.created_at
+        ],
+        MedicalRecord.id
+    ),
+}
+
+def _value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def stream_batches(columns, order_by, batch_size: int = EXPORT_BATCH_SIZE, sessions=SessionLocal):
+    # The session lives as long as the generator, not the request dependency,
+    # because the response body is produced after the endpoint returns
+    db = sessions()
+    try:
+        result = db.execute(
+            select(*columns)
+            .order_by(order_by)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+def ndjson_lines(columns, batches):
+    keys = [c.key for c in columns]
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(keys, map(_value, row))), separators=(",", ":")) + "\n"
+            for row in batch
+        )
+
+def csv_lines(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c.key for c in columns])
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+
+# format -> (media type, line generator)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+    "csv": ("text/csv", csv_lines),
+}
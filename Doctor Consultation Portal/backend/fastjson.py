@@ -0,0 +1,32 @@
+"""
+Fast JSON encoding for large responses
+Large lists skip ORM objects and response_model validation: the endpoint
+selects plain columns (queries.RowShape), builds dicts and encodes them here
+with orjson. Without orjson, pydantic-core's encoder is used; both write
+datetimes, times and enums the way response_model serialization does, so
+the body is the same either way.
+"""
+from decimal import Decimal
+from fastapi import Response
+import pydantic_core
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return pydantic_core.to_json(content)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
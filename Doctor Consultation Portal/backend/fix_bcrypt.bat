@@ -10,9 +10,6 @@ echo.
 echo Step 3: Installing compatible bcrypt version...
 pip install bcrypt==4.1.2
 echo.
-echo Step 4: Reinstalling passlib with bcrypt support...
-pip install --force-reinstall passlib[bcrypt]==1.7.4
-echo.
 echo Done! Now try running: python init_db.py
 pause
 
@@ -0,0 +1,127 @@
+"""
+Password hashing executor
+bcrypt is deliberately slow (~250 ms at cost 12), so hashing and verification
+run in a process pool sized to the machine's cores instead of on the request
+workers. The number of outstanding jobs is bounded; when the queue is full the
+caller gets HashingBusyError straight away so the API can answer 503 instead
+of stalling every request behind a login storm. A job that outlasts
+HASH_TIMEOUT is answered the same way, with a 503 and Retry-After.
+
+Workers are spawned rather than forked: by the time the first password is
+hashed the server has threads and open database pools, and a forked copy of
+those is unsafe.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from fastapi import HTTPException
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))  # 0 hashes inline
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(max(HASH_WORKERS, 1) * 8)))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10"))  # seconds
+HASH_RETRY_AFTER = 1  # seconds suggested to clients on overload
+HASH_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full"""
+
+def _timed_out() -> HTTPException:
+    return HTTPException(status_code=503, detail="Password check timed out, please retry",
+                         headers={"Retry-After": str(HASH_RETRY_AFTER)})
+
+# ---------- worker functions (run in the pool) ----------
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """bcrypt hash of password, computed in the calling process"""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        # Malformed or non-bcrypt hash
+        return False
+
+# ---------- executor ----------
+
+class HashingExecutor:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING,
+                 rounds: int = BCRYPT_ROUNDS, timeout: float = HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=HASH_MP_CONTEXT)
+        return self._pool
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on the pool and return its Future"""
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError("Too many password operations in progress")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise _timed_out()
+
+    async def _run_async(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # Drops the job if it is still queued; one already running finishes and frees its slot then
+            future.cancel()
+            raise _timed_out()
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(_verify, password, hashed)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(hash_password, password, self.rounds)
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await self._run_async(_verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when the stored hash was made with a different cost than configured"""
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+hasher = HashingExecutor()
@@ -0,0 +1,96 @@
+"""
+Idempotency keys for retry-safe writes
+A client sends Idempotency-Key with a POST. The first request claims the key.
+Its outcome is stored: the created resource id, or the error it returned.
+Retries with the same key and body replay that outcome and do not run the
+request again. If the same key arrives with a different body, or while the
+first request is still running, the retry is rejected.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))  # seconds a key is remembered
+# An unfinished claim older than this is assumed abandoned (worker crashed) and can be retaken
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "60"))
+
+def request_fingerprint(endpoint: str, payload: dict) -> str:
+    raw = json.dumps([endpoint, payload], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _stale(record: IdempotencyKey, now: datetime) -> bool:
+    age = now - record.created_at
+    if record.status_code is None:
+        return age > timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT)
+    return age > timedelta(seconds=IDEMPOTENCY_TTL)
+
+async def claim(db: AsyncSession, user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """
+    Claim key for this request (committed straight away so concurrent retries see it).
+    Returns None when the caller should process the request, or the finished record
+    to replay.
+    """
+    for _ in range(2):
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(user_id=user_id, key=key, request_hash=fingerprint, created_at=now))
+        try:
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+
+        record = (await db.execute(
+            select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        )).scalar_one_or_none()
+        if record is None:
+            continue  # released in the meantime
+        if _stale(record, now):
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record.id))
+            await db.commit()
+            continue
+        if record.request_hash != fingerprint:
+            raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used with a different request")
+        if record.status_code is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return record
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+async def complete(db: AsyncSession, user_id: int, key: str, status_code: int,
+                   resource_id: Optional[int] = None, detail=None):
+    """
+    Record the outcome. Not committed here: call it before the commit that persists the
+    result, so the resource and the key's outcome are saved in the same transaction.
+    """
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(
+            status_code=status_code,
+            resource_id=resource_id,
+            response_body=json.dumps({"detail": detail}) if detail is not None else None
+        )
+    )
+
+async def release(db: AsyncSession, user_id: int, key: str):
+    """Forget the claim after an unexpected failure so the client's retry runs again"""
+    await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    await db.commit()
+
+def replay_error(record: IdempotencyKey) -> HTTPException:
+    body = json.loads(record.response_body) if record.response_body else {}
+    return HTTPException(
+        status_code=record.status_code,
+        detail=body.get("detail"),
+        headers={REPLAYED_HEADER: "true"}
+    )
@@ -4,9 +4,11 @@ Creates database if it doesn't exist and creates admin user
 """
 from sqlalchemy import create_engine
 from sqlalchemy.sql import text
-from database import Base, engine, SessionLocal
+from database import get_engine, SessionLocal
 from models import User, UserRole
+from hashing import BCRYPT_ROUNDS
 import bcrypt
+import migrate
 import os
 from dotenv import load_dotenv
 
@@ -16,7 +18,7 @@ load_dotenv()
 # Simple password hashing using bcrypt directly (no passlib needed)
 def get_password_hash(password: str) -> str:
     # Generate salt and hash password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -37,9 +39,9 @@ try:
 except Exception as e:
     print(f"Error creating database: {e}")
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-print("Tables created successfully")
+# Create tables and indexes
+migrate.upgrade(get_engine())
+print("Schema is up to date")
 
 # Create default admin user
 db = SessionLocal()
@@ -0,0 +1,261 @@
+"""
+Background job queue
+Slow or failure-prone side effects (reminders, outgoing messages, audit
+writes) run as jobs instead of inside the request. A handler only adds a row
+to the jobs table in its own transaction. The job therefore exists exactly
+when the change it belongs to was committed, and the request pays one INSERT
+however many side effects pile up.
+
+A worker task in each API process polls for due jobs. It claims them with
+SELECT ... FOR UPDATE SKIP LOCKED, so several processes can share the table.
+It runs at most JOB_CONCURRENCY at a time. A failed job is retried after an
+exponential backoff (JOB_BACKOFF_BASE * 2^(attempt-1), capped at
+JOB_BACKOFF_MAX, with jitter). After max_attempts it is parked as "dead" for
+an admin to inspect and retry. A job left "running" by a crashed process is
+picked up again once its JOB_LEASE expires, so handlers must be safe to run
+twice.
+
+Job times (run_at and so on) are naive server-local datetimes, the same frame
+as appointment_date.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import func, select, update
+from database import SessionLocal
+from models import Job, JobStatus
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))  # jobs running at once per process
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))  # seconds between polls when idle
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "10"))  # seconds before the first retry
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "3600"))  # seconds
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "60"))  # seconds per attempt
+JOB_LEASE = float(os.getenv("JOB_LEASE", "300"))  # seconds before a running job counts as abandoned
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER_ENABLED", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+def job_handler(kind: str):
+    """Register a handler for a job kind. Handlers take the payload dict and may be sync or async."""
+    def register(func: Callable):
+        _handlers[kind] = func
+        return func
+    return register
+
+def _now() -> datetime:
+    return datetime.now().replace(microsecond=0)
+
+def enqueue(db, kind: str, payload: dict, run_at: Optional[datetime] = None,
+            max_attempts: int = JOB_MAX_ATTEMPTS, dedupe_key: Optional[str] = None) -> Job:
+    """
+    Add a job to db's current transaction (a Session or an AsyncSession). It becomes
+    visible to workers when the caller commits and disappears if the caller rolls back.
+    """
+    now = _now()
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload, separators=(",", ":"), default=str),
+        status=JobStatus.QUEUED,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=run_at or now,
+        dedupe_key=dedupe_key,
+        created_at=now,
+    )
+    db.add(job)
+    return job
+
+def cancel_pending(*dedupe_keys: str):
+    """UPDATE that cancels jobs with these dedupe keys that haven't started; execute it in the caller's transaction"""
+    return (
+        update(Job)
+        .where(Job.dedupe_key.in_(dedupe_keys), Job.status == JobStatus.QUEUED)
+        .values(status=JobStatus.CANCELLED, finished_at=_now())
+    )
+
+def backoff(attempt: int) -> float:
+    """Seconds to wait before retrying after failed attempt number `attempt` (1-based)"""
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * (2 ** (attempt - 1)))
+    # Jitter keeps jobs that failed together (e.g. a provider outage) from retrying in lockstep
+    return delay * random.uniform(0.5, 1.0)
+
+def retry_job(db, job_id: int) -> Optional[Job]:
+    """Put a dead or cancelled job back on the queue with fresh attempts"""
+    job = db.get(Job, job_id)
+    if job is None or job.status not in (JobStatus.DEAD, JobStatus.CANCELLED):
+        return job
+    job.status = JobStatus.QUEUED
+    job.attempts = 0
+    job.run_at = _now()
+    job.locked_at = None
+    job.locked_by = None
+    job.finished_at = None
+    db.commit()
+    return job
+
+def job_counts(db) -> dict:
+    rows = db.execute(select(Job.status, func.count()).group_by(Job.status)).all()
+    counts = {s.value: 0 for s in JobStatus}
+    counts.update({s.value: n for s, n in rows})
+    due = db.execute(
+        select(func.count()).select_from(Job).where(Job.status == JobStatus.QUEUED, Job.run_at <= _now())
+    ).scalar()
+    return {"by_status": counts, "due": due}
+
+class JobWorker:
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._task = None
+        self._wake = None
+        self._running = set()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+
+    # ---------- database steps (run in a thread) ----------
+
+    def _claim(self, limit: int) -> list:
+        now = _now()
+        with SessionLocal() as db:
+            # Jobs whose worker died mid-run
+            db.execute(
+                update(Job)
+                .where(Job.status == JobStatus.RUNNING, Job.locked_at < now - timedelta(seconds=JOB_LEASE))
+                .values(status=JobStatus.QUEUED, locked_at=None, locked_by=None)
+            )
+            jobs = db.execute(
+                select(Job)
+                .where(Job.status == JobStatus.QUEUED, Job.run_at <= now)
+                .order_by(Job.run_at, Job.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            claimed = []
+            for job in jobs:
+                job.status = JobStatus.RUNNING
+                job.attempts += 1
+                job.locked_at = now
+                job.locked_by = self.name
+                claimed.append((job.id, job.kind, job.payload, job.attempts, job.max_attempts))
+            db.commit()
+            return claimed
+
+    def _finish(self, job_id: int, attempts: int, max_attempts: int, error: Optional[str]):
+        now = _now()
+        with SessionLocal() as db:
+            values = {"locked_at": None, "locked_by": None}
+            if error is None:
+                values.update(status=JobStatus.SUCCEEDED, finished_at=now, last_error=None)
+            elif attempts >= max_attempts:
+                values.update(status=JobStatus.DEAD, finished_at=now, last_error=error)
+            else:
+                values.update(status=JobStatus.QUEUED, run_at=now + timedelta(seconds=backoff(attempts)), last_error=error)
+            # Only if we still own it: an expired lease may have handed it to another worker
+            db.execute(
+                update(Job).where(Job.id == job_id, Job.locked_by == self.name, Job.attempts == attempts).values(**values)
+            )
+            db.commit()
+        with self._lock:
+            if error is None:
+                self.succeeded += 1
+            elif attempts >= max_attempts:
+                self.dead += 1
+            else:
+                self.retried += 1
+
+    # ---------- loop ----------
+
+    async def _execute(self, job_id: int, kind: str, payload: str, attempts: int, max_attempts: int):
+        error = None
+        try:
+            handler = _handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{kind}'")
+            data = json.loads(payload)
+            if inspect.iscoroutinefunction(handler):
+                await asyncio.wait_for(handler(data), JOB_TIMEOUT)
+            else:
+                await asyncio.wait_for(asyncio.to_thread(handler, data), JOB_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning("Job %s (%s) attempt %s/%s failed: %s", job_id, kind, attempts, max_attempts, error)
+        try:
+            await asyncio.to_thread(self._finish, job_id, attempts, max_attempts, error)
+        except Exception:
+            # The lease will requeue it
+            logger.exception("Could not record result of job %s", job_id)
+
+    def _done(self, task: asyncio.Task):
+        self._running.discard(task)
+        self._wake.set()
+
+    async def run(self):
+        while not self._stopping:
+            free = self.concurrency - len(self._running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await asyncio.to_thread(self._claim, free)
+                except Exception:
+                    logger.exception("Job poll failed")
+                for job in claimed:
+                    task = asyncio.create_task(self._execute(*job))
+                    self._running.add(task)
+                    task.add_done_callback(self._done)
+                # A full batch means more jobs are probably due: poll again straight away
+                if claimed and len(claimed) == free:
+                    continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = 10):
+        """Stop polling and give running jobs `timeout` seconds to finish; the rest are requeued by lease"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._running:
+            _, pending = await asyncio.wait(set(self._running), timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "worker": self.name,
+                "enabled": self._task is not None,
+                "concurrency": self.concurrency,
+                "running": len(self._running),
+                "succeeded": self.succeeded,
+                "retried": self.retried,
+                "dead": self.dead,
+            }
+
+job_worker = JobWorker()
@@ -1,40 +1,98 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import TypeAdapter
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, time
+import asyncio
+import io
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, time
 from typing import List, Optional
-from database import get_db, engine, Base
-from models import User, Doctor, Appointment, Consultation, MedicalRecord, UserRole, AppointmentStatus, ConsultationType
+from database import get_db, get_async_db, get_engine, get_async_engine, get_replica_engine, get_async_replica_engine, dispose_engines
+from models import (
+    User, Doctor, Appointment, Consultation, MedicalRecord, Job, WeeklyHours, AvailabilityException,
+    UserRole, AppointmentStatus, ConsultationType, JobStatus
+)
 from schemas import (
     UserCreate, UserResponse, UserLogin, Token,
-    DoctorCreate, DoctorResponse,
-    AppointmentCreate, AppointmentResponse,
+    DoctorCreate, DoctorResponse, DoctorSearchResponse,
+    AppointmentCreate, AppointmentResponse, AppointmentBulkStatus, AppointmentBulkStatusResponse,
+    DoctorSlotsResponse, WeeklyHoursBase, AvailabilityExceptionCreate, AvailabilityExceptionResponse, DoctorAvailabilityResponse,
     ConsultationCreate, ConsultationResponse,
-    MedicalRecordCreate, MedicalRecordResponse,
+    MedicalRecordCreate, MedicalRecordResponse, MedicalRecordSummary,
+    JobResponse,
     DoctorSearch
 )
 from auth import (
-    get_current_user, get_current_patient, get_current_doctor, get_current_admin,
-    create_access_token, verify_password, get_password_hash
+    Principal, get_current_user, get_stream_user, get_current_patient, get_current_doctor, get_current_admin, invalidate_principal,
+    create_access_token, get_password_hash, get_password_hash_async, verify_password_async, password_needs_rehash
+)
+from hashing import HashingBusyError, HASH_RETRY_AFTER
+from slots import slot_taken, ACTIVE_STATUSES
+from availability import availability_calendar
+from medical_history import TIMELINE_ROWS, TIMELINE_ORDER, summarize, timeline_patient, can_read
+from queries import (
+    doctor_query, doctor_select, appointment_select,
+    doctor_rows_select, active_doctor_rows_select, appointment_rows_select,
+    USER_ROWS, DOCTOR_ROWS, APPOINTMENT_ROWS, MEDICAL_RECORD_ROWS
+)
+from pagination import PageParams, page_params, paginate, paginate_list, keyset_page, page_rows, NEXT_CURSOR_HEADER
+from search_index import doctor_index, SORT_KEYS
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, stream_batches
+import fastjson
+from fastjson import FastJSONResponse
+from stats import stats_cache
+from bulk_import import IMPORT_DATASETS, import_stream
+from response_cache import doctor_cache
+from notifications import bus, channels_for, event_stream, appointment_event, publish_appointment, TooManySubscribers
+from pool_metrics import pool_stats
+from profiling import (
+    ProfilingMiddleware, install_serialization_timer, render_prometheus, serialization,
+    profile_store, slow_statements, QUERY_COUNT_HEADER, PROFILE_ID_HEADER
+)
+from jobs import job_worker, job_counts, retry_job, JOB_WORKER_ENABLED
+from tasks import schedule_reminder, cancel_reminder
+import idempotency
+from idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+import migrate
+from warmup import warmup
+from replicas import (
+    ReadYourWritesMiddleware, get_read_db, get_async_read_db, get_async_listing_db, read_sessions,
+    recent_writes, replica_monitor, user_key, DOCTOR_LISTINGS
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits on the database unless MIGRATE_ON_STARTUP is set, so a
+    # worker starts serving at once, and stays up while MySQL is briefly down
+    if migrate.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.upgrade, get_engine())
+    warmup.start()
+    replica_monitor.start()
+    if JOB_WORKER_ENABLED:
+        job_worker.start()
+    yield
+    await job_worker.stop()
+    await replica_monitor.stop()
+    await warmup.stop()
+    await dispose_engines()
 
-app = FastAPI(title="Doctor Appointment Portal API", version="1.0.0")
+def hashing_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)}
+    )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
 
 # Root route
-@app.get("/")
+@router.get("/")
 def root():
     return {
         "message": "Doctor Appointment Portal API",
@@ -43,9 +101,25 @@ def root():
         "api": "/api"
     }
 
+@router.get("/health/live", include_in_schema=False)
+def liveness():
+    """The process is up; never touches the database"""
+    return {"status": "ok"}
+
+@router.get("/health/ready", include_in_schema=False)
+async def readiness(response: Response):
+    """Ready when the database answers; warm-up progress is reported but not waited for"""
+    try:
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "unavailable", "error": f"{type(e).__name__}: {e}"[:300], "warmup": warmup.status()}
+    return {"status": "ready", "warmup": warmup.status(), "replica": replica_monitor.status()}
+
 # ==================== AUTHENTICATION ====================
 
-@app.post("/api/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/api/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 def register(user_data: UserCreate, db: Session = Depends(get_db)):
     try:
         # Check if username exists
@@ -74,8 +148,9 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
+        stats_cache.user_created()
         return new_user
-    except HTTPException:
+    except (HTTPException, HashingBusyError):
         db.rollback()
         raise
     except ValueError as e:
@@ -85,29 +160,35 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.post("/api/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+@router.post("/api/auth/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == form_data.username))).scalar_one_or_none()
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    access_token = create_access_token(data={"sub": user.id})
+    # Upgrade hashes made with an older bcrypt cost while we have the plain password
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(form_data.password)
+        await db.commit()
+    
+    # JWT "sub" must be a string (python-jose rejects other types on decode)
+    access_token = create_access_token(data={"sub": str(user.id)})
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "user": user
     }
 
-@app.get("/api/auth/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+@router.get("/api/auth/me", response_model=UserResponse)
+def get_current_user_info(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 # ==================== DOCTOR ENDPOINTS ====================
 
-@app.post("/api/doctors", response_model=DoctorResponse, status_code=status.HTTP_201_CREATED)
-def create_doctor(doctor_data: DoctorCreate, admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+@router.post("/api/doctors", response_model=DoctorResponse, status_code=status.HTTP_201_CREATED)
+def create_doctor(doctor_data: DoctorCreate, admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     # Verify user exists and is a doctor
     user = db.query(User).filter(User.id == doctor_data.user_id).first()
     if not user:
@@ -124,43 +205,152 @@ def create_doctor(doctor_data: DoctorCreate, admin: User = Depends(get_current_a
     db.add(new_doctor)
     db.commit()
     db.refresh(new_doctor)
+    doctor_index.upsert(new_doctor, user.is_active)
+    availability_calendar.refresh_doctor(db, new_doctor.id)
+    doctor_cache.invalidate()
+    recent_writes.mark(DOCTOR_LISTINGS)
+    invalidate_principal(new_doctor.user_id)
+    stats_cache.doctor_created()
     return new_doctor
 
-@app.get("/api/doctors", response_model=List[DoctorResponse])
-def get_doctors(
+def fast_json(content, response: Response) -> FastJSONResponse:
+    """Encode a large body directly, keeping the pagination cursor set on response"""
+    cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    with serialization():
+        body = fastjson.dumps(content)
+    return FastJSONResponse(body, headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+
+async def load_doctors(db: AsyncSession, doctor_ids: List[int]) -> List[dict]:
+    """DoctorResponse dicts by id, preserving the given order"""
+    if not doctor_ids:
+        return []
+    result = await db.execute(doctor_rows_select().where(Doctor.id.in_(doctor_ids)))
+    doctors = {d["id"]: d for d in DOCTOR_ROWS.dicts(result.all())}
+    return [doctors[i] for i in doctor_ids if i in doctors]
+
+DOCTOR_JSON = TypeAdapter(DoctorResponse)
+
+def _filter_key(value: Optional[str]) -> Optional[str]:
+    # Search is case-insensitive, so "Delhi " and "delhi" share a cache entry
+    return value.strip().lower() or None if value else None
+
+@router.get("/api/doctors", response_model=List[DoctorResponse])
+async def get_doctors(
+    request: Request,
     specialization: Optional[str] = None,
     location: Optional[str] = None,
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_listing_db)
 ):
-    query = db.query(Doctor).join(User).filter(User.is_active == True, Doctor.is_available == True)
+    specialization, location = _filter_key(specialization), _filter_key(location)
     
-    if specialization:
-        query = query.filter(Doctor.specialization.like(f"%{specialization}%"))
-    if location:
-        query = query.filter(Doctor.location.like(f"%{location}%"))
+    async def build():
+        response = Response()
+        if specialization or location:
+            # Text filters go through the search index instead of LIKE '%...%' scans
+            doctor_ids, _ = await db.run_sync(
+                lambda sync_db: doctor_index.search(sync_db, specialization=specialization, location=location)
+            )
+            doctors = await load_doctors(db, paginate_list(doctor_ids, page, response))
+        else:
+            result = await db.execute(keyset_page(active_doctor_rows_select(), [Doctor.id], page))
+            doctors = DOCTOR_ROWS.dicts(page_rows(result.all(), [Doctor.id], page, response))
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        with serialization():
+            body = fastjson.dumps(doctors)
+        return body, {NEXT_CURSOR_HEADER: cursor} if cursor else {}
     
-    doctors = query.all()
-    return doctors
+    params = {"list": True, "specialization": specialization, "location": location,
+              "limit": page.limit, "cursor": page.cursor}
+    return await doctor_cache.respond(request, params, build)
 
-@app.get("/api/doctors/{doctor_id}", response_model=DoctorResponse)
-def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+@router.get("/api/doctors/search", response_model=DoctorSearchResponse)
+async def search_doctors(
+    response: Response,
+    q: Optional[str] = None,
+    specialization: Optional[str] = None,
+    location: Optional[str] = None,
+    sort: str = Query("id", pattern="^-?(" + "|".join(SORT_KEYS) + ")$"),
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_listing_db)
+):
+    doctor_ids, facets = await db.run_sync(
+        lambda sync_db: doctor_index.search(sync_db, q=q, specialization=specialization, location=location, sort=sort)
+    )
+    return fast_json({
+        "total": len(doctor_ids),
+        "facets": facets,
+        "results": await load_doctors(db, paginate_list(doctor_ids, page, response))
+    }, response)
+
+@router.get("/api/doctors/available", response_model=List[DoctorResponse])
+async def get_available_doctors(
+    response: Response,
+    at: datetime,
+    until: Optional[datetime] = None,
+    specialization: Optional[str] = None,
+    location: Optional[str] = None,
+    any_slot: bool = False,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Doctors free for the whole of [at, until) (one slot if until is omitted),
+    or with any_slot=true, free in at least one slot of it
+    """
+    try:
+        doctor_ids = await db.run_sync(lambda sync_db: availability_calendar.free_doctors(
+            sync_db, at, until, specialization=specialization, location=location, any_slot=any_slot
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fast_json(await load_doctors(db, paginate_list(doctor_ids, page, response)), response)
+
+@router.get("/api/doctors/{doctor_id}", response_model=DoctorResponse)
+async def get_doctor(doctor_id: int, request: Request, db: AsyncSession = Depends(get_async_listing_db)):
+    async def build():
+        doctor = (await db.execute(doctor_select().where(Doctor.id == doctor_id))).scalar_one_or_none()
+        if not doctor:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        with serialization():
+            return DOCTOR_JSON.dump_json(doctor), {}
+    
+    return await doctor_cache.respond(request, {"doctor_id": doctor_id}, build)
+
+@router.get("/api/doctors/{doctor_id}/slots", response_model=DoctorSlotsResponse)
+async def get_doctor_slots(
+    doctor_id: int,
+    day: date = Query(..., alias="date"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    doctor = await db.get(Doctor, doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return doctor
+    
+    slots = await db.run_sync(lambda sync_db: availability_calendar.day_slots(sync_db, doctor.id, day))
+    return {
+        "doctor_id": doctor.id,
+        "day": day,
+        "slot_minutes": availability_calendar.slot_minutes,
+        "is_available": doctor.is_available,
+        "slots": [
+            {"start": start, "end": end, "available": free and doctor.is_available}
+            for start, end, free in slots
+        ]
+    }
 
-@app.get("/api/doctors/me/profile", response_model=DoctorResponse)
-def get_my_doctor_profile(current_user: User = Depends(get_current_doctor), db: Session = Depends(get_db)):
-    doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
+@router.get("/api/doctors/me/profile", response_model=DoctorResponse)
+def get_my_doctor_profile(current_user: Principal = Depends(get_current_doctor), db: Session = Depends(get_db)):
+    doctor = doctor_query(db).filter(Doctor.id == current_user.doctor_id).first()
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor profile not found")
     return doctor
 
-@app.put("/api/doctors/{doctor_id}", response_model=DoctorResponse)
+@router.put("/api/doctors/{doctor_id}", response_model=DoctorResponse)
 def update_doctor(
     doctor_id: int,
     doctor_data: DoctorCreate,
-    admin: User = Depends(get_current_admin),
+    admin: Principal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
@@ -172,14 +362,18 @@ def update_doctor(
     
     db.commit()
     db.refresh(doctor)
+    doctor_index.upsert(doctor, doctor.user.is_active)
+    availability_calendar.refresh_doctor(db, doctor.id)
+    doctor_cache.invalidate()
+    recent_writes.mark(DOCTOR_LISTINGS)
     return doctor
 
-@app.put("/api/doctors/me/availability")
+@router.put("/api/doctors/me/availability")
 def update_availability(
     is_available: bool,
     available_from: Optional[time] = None,
     available_to: Optional[time] = None,
-    current_user: User = Depends(get_current_doctor),
+    current_user: Principal = Depends(get_current_doctor),
     db: Session = Depends(get_db)
 ):
     try:
@@ -194,6 +388,11 @@ def update_availability(
             doctor.available_to = available_to
         
         db.commit()
+        doctor_index.set_availability(doctor.id, is_available)
+        availability_calendar.refresh_doctor(db, doctor.id)
+        doctor_cache.invalidate()
+        recent_writes.mark(DOCTOR_LISTINGS)
+        invalidate_principal(current_user.id)
         return {"message": "Availability updated successfully"}
     except HTTPException:
         db.rollback()
@@ -202,10 +401,76 @@ def update_availability(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
-@app.delete("/api/doctors/{doctor_id}")
+def _my_doctor_id(current_user: Principal) -> int:
+    if current_user.doctor_id is None:
+        raise HTTPException(status_code=404, detail="Doctor profile not found")
+    return current_user.doctor_id
+
+@router.get("/api/doctors/me/availability", response_model=DoctorAvailabilityResponse)
+def get_my_availability(current_user: Principal = Depends(get_current_doctor), db: Session = Depends(get_db)):
+    """Weekly hours and the exceptions that have not ended yet"""
+    doctor_id = _my_doctor_id(current_user)
+    weekly_hours = db.query(WeeklyHours).filter(WeeklyHours.doctor_id == doctor_id).order_by(
+        WeeklyHours.weekday, WeeklyHours.start_time
+    ).all()
+    exceptions = db.query(AvailabilityException).filter(
+        AvailabilityException.doctor_id == doctor_id,
+        AvailabilityException.end_date >= date.today()
+    ).order_by(AvailabilityException.start_date, AvailabilityException.id).all()
+    return {"weekly_hours": weekly_hours, "exceptions": exceptions}
+
+@router.put("/api/doctors/me/availability/weekly", response_model=DoctorAvailabilityResponse)
+def set_weekly_hours(
+    weekly_hours: List[WeeklyHoursBase],
+    current_user: Principal = Depends(get_current_doctor),
+    db: Session = Depends(get_db)
+):
+    """Replace the weekly template; an empty list goes back to available_from/available_to every day"""
+    doctor_id = _my_doctor_id(current_user)
+    db.query(WeeklyHours).filter(WeeklyHours.doctor_id == doctor_id).delete(synchronize_session=False)
+    db.add_all([WeeklyHours(doctor_id=doctor_id, **hours.model_dump()) for hours in weekly_hours])
+    db.commit()
+    availability_calendar.refresh_doctor(db, doctor_id)
+    return get_my_availability(current_user, db)
+
+@router.post("/api/doctors/me/availability/exceptions", response_model=AvailabilityExceptionResponse,
+             status_code=status.HTTP_201_CREATED)
+def create_availability_exception(
+    exception_data: AvailabilityExceptionCreate,
+    current_user: Principal = Depends(get_current_doctor),
+    db: Session = Depends(get_db)
+):
+    """Leave or blocked hours (kind=unavailable), or extra hours (kind=available)"""
+    doctor_id = _my_doctor_id(current_user)
+    exception = AvailabilityException(doctor_id=doctor_id, **exception_data.model_dump())
+    db.add(exception)
+    db.commit()
+    db.refresh(exception)
+    availability_calendar.refresh_doctor(db, doctor_id)
+    return exception
+
+@router.delete("/api/doctors/me/availability/exceptions/{exception_id}")
+def delete_availability_exception(
+    exception_id: int,
+    current_user: Principal = Depends(get_current_doctor),
+    db: Session = Depends(get_db)
+):
+    doctor_id = _my_doctor_id(current_user)
+    exception = db.query(AvailabilityException).filter(
+        AvailabilityException.id == exception_id,
+        AvailabilityException.doctor_id == doctor_id
+    ).first()
+    if not exception:
+        raise HTTPException(status_code=404, detail="Availability exception not found")
+    db.delete(exception)
+    db.commit()
+    availability_calendar.refresh_doctor(db, doctor_id)
+    return {"message": "Availability exception deleted successfully"}
+
+@router.delete("/api/doctors/{doctor_id}")
 def delete_doctor(
     doctor_id: int,
-    admin: User = Depends(get_current_admin),
+    admin: Principal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     try:
@@ -213,8 +478,15 @@ def delete_doctor(
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         
+        doctor_user_id = doctor.user_id
         db.delete(doctor)
         db.commit()
+        doctor_index.remove(doctor_id)
+        availability_calendar.refresh_doctor(db, doctor_id)
+        doctor_cache.invalidate()
+        recent_writes.mark(DOCTOR_LISTINGS)
+        invalidate_principal(doctor_user_id)
+        stats_cache.doctor_deleted()
         return {"message": "Doctor deleted successfully"}
     except HTTPException:
         db.rollback()
@@ -225,33 +497,50 @@ def delete_doctor(
 
 # ==================== APPOINTMENT ENDPOINTS ====================
 
-@app.post("/api/appointments", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
-def create_appointment(
+SLOT_TAKEN = "Time slot already booked"
+
+@router.post("/api/appointments", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
+async def create_appointment(
     appointment_data: AppointmentCreate,
-    current_user: User = Depends(get_current_patient),
-    db: Session = Depends(get_db)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    current_user: Principal = Depends(get_current_patient),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    if idempotency_key:
+        fingerprint = idempotency.request_fingerprint("POST /api/appointments", appointment_data.model_dump(mode="json"))
+        record = await idempotency.claim(db, current_user.id, idempotency_key, fingerprint)
+        if record is not None:
+            if record.resource_id is None:
+                raise idempotency.replay_error(record)
+            response.headers[REPLAYED_HEADER] = "true"
+            result = await db.execute(appointment_select().where(Appointment.id == record.resource_id))
+            return result.scalar_one()
+
     try:
-        # Verify doctor exists
-        doctor = db.query(Doctor).filter(Doctor.id == appointment_data.doctor_id).first()
+        if db.bind.dialect.name == "sqlite":
+            # SQLite ignores FOR UPDATE; a no-op write takes its database write lock until commit instead
+            await db.execute(update(Doctor).where(Doctor.id == appointment_data.doctor_id).values(id=Doctor.id))
+        # Lock the doctor row so bookings for one doctor are checked and inserted one at a time
+        doctor = (await db.execute(
+            select(Doctor).where(Doctor.id == appointment_data.doctor_id).with_for_update()
+        )).scalar_one_or_none()
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         if not doctor.is_available:
             raise HTTPException(status_code=400, detail="Doctor is not available")
         
-        # Check if doctor is available at requested time
-        appointment_time = appointment_data.appointment_date.time()
-        if appointment_time < doctor.available_from or appointment_time > doctor.available_to:
+        # Check the requested time against the doctor's weekly hours, leave and extra hours
+        within_hours = await db.run_sync(
+            lambda sync_db: availability_calendar.is_open(sync_db, doctor, appointment_data.appointment_date)
+        )
+        if not within_hours:
             raise HTTPException(status_code=400, detail="Doctor is not available at this time")
         
-        # Check for conflicting appointments
-        conflicting = db.query(Appointment).filter(
-            Appointment.doctor_id == appointment_data.doctor_id,
-            Appointment.appointment_date == appointment_data.appointment_date,
-            Appointment.status.in_([AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED])
-        ).first()
-        if conflicting:
-            raise HTTPException(status_code=400, detail="Time slot already booked")
+        # Check for overlapping appointments; the doctor row lock serializes this with other bookings
+        taken = await db.run_sync(lambda sync_db: slot_taken(sync_db, doctor.id, appointment_data.appointment_date))
+        if taken:
+            raise HTTPException(status_code=409, detail=SLOT_TAKEN)
         
         new_appointment = Appointment(
             patient_id=current_user.id,
@@ -261,37 +550,70 @@ def create_appointment(
             status=AppointmentStatus.PENDING
         )
         db.add(new_appointment)
-        db.commit()
-        db.refresh(new_appointment)
-        return new_appointment
-    except HTTPException:
-        db.rollback()
-        raise
+        await db.flush()
+        schedule_reminder(db, new_appointment)
+        if idempotency_key:
+            await idempotency.complete(db, current_user.id, idempotency_key, 201, resource_id=new_appointment.id)
+        await db.commit()
+        availability_calendar.book(new_appointment.doctor_id, new_appointment.appointment_date)
+        stats_cache.appointment_created(new_appointment.doctor_id, new_appointment.appointment_date, new_appointment.status)
+        publish_appointment("appointment.created", new_appointment)
+        
+        # Reload with the relationships AppointmentResponse serializes (no lazy loads in async)
+        result = await db.execute(
+            appointment_select()
+            .where(Appointment.id == new_appointment.id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+    except (HTTPException, IntegrityError) as e:
+        await db.rollback()
+        # The unique active-slot constraint caught a booking that raced past the check
+        error = e if isinstance(e, HTTPException) else HTTPException(status_code=409, detail=SLOT_TAKEN)
+        if idempotency_key:
+            await idempotency.complete(db, current_user.id, idempotency_key, error.status_code, detail=error.detail)
+            await db.commit()
+        raise error
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        if idempotency_key:
+            await idempotency.release(db, current_user.id, idempotency_key)
         raise HTTPException(status_code=500, detail=f"Appointment creation failed: {str(e)}")
 
-@app.get("/api/appointments", response_model=List[AppointmentResponse])
-def get_appointments(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/api/appointments", response_model=List[AppointmentResponse])
+async def get_appointments(
+    response: Response,
+    status_filter: Optional[AppointmentStatus] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    query = appointment_rows_select()
     if current_user.role == UserRole.PATIENT:
-        appointments = db.query(Appointment).filter(Appointment.patient_id == current_user.id).all()
+        query = query.where(Appointment.patient_id == current_user.id)
     elif current_user.role == UserRole.DOCTOR:
-        doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if doctor:
-            appointments = db.query(Appointment).filter(Appointment.doctor_id == doctor.id).all()
-        else:
-            appointments = []
-    else:  # ADMIN
-        appointments = db.query(Appointment).all()
+        if not current_user.doctor_id:
+            return []
+        query = query.where(Appointment.doctor_id == current_user.doctor_id)
+    # ADMIN sees every appointment
     
-    return appointments
+    if status_filter:
+        query = query.where(Appointment.status == status_filter)
+    if date_from:
+        query = query.where(Appointment.appointment_date >= date_from)
+    if date_to:
+        query = query.where(Appointment.appointment_date < date_to)
+    
+    columns = [Appointment.appointment_date, Appointment.id]
+    result = await db.execute(keyset_page(query, columns, page, descending=True))
+    appointments = page_rows(result.all(), columns, page, response)
+    return fast_json(APPOINTMENT_ROWS.dicts(appointments), response)
 
-@app.get("/api/appointments/{appointment_id}", response_model=AppointmentResponse)
-def get_appointment(appointment_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+@router.get("/api/appointments/{appointment_id}", response_model=AppointmentResponse)
+async def get_appointment(appointment_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_read_db)):
+    appointment = (await db.execute(appointment_select().where(Appointment.id == appointment_id))).scalar_one_or_none()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
@@ -299,21 +621,20 @@ def get_appointment(appointment_id: int, current_user: User = Depends(get_curren
     if current_user.role == UserRole.PATIENT and appointment.patient_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     if current_user.role == UserRole.DOCTOR:
-        doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if not doctor or appointment.doctor_id != doctor.id:
+        if appointment.doctor_id != current_user.doctor_id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     return appointment
 
-@app.put("/api/appointments/{appointment_id}/status")
-def update_appointment_status(
+@router.put("/api/appointments/{appointment_id}/status")
+async def update_appointment_status(
     appointment_id: int,
     new_status: AppointmentStatus,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+        appointment = await db.get(Appointment, appointment_id)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
@@ -324,30 +645,45 @@ def update_appointment_status(
             if new_status not in [AppointmentStatus.CANCELLED]:
                 raise HTTPException(status_code=403, detail="Patients can only cancel appointments")
         elif current_user.role == UserRole.DOCTOR:
-            doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-            if not doctor or appointment.doctor_id != doctor.id:
+            if appointment.doctor_id != current_user.doctor_id:
                 raise HTTPException(status_code=403, detail="Not authorized")
             if new_status not in [AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED, AppointmentStatus.CANCELLED]:
                 raise HTTPException(status_code=400, detail="Invalid status for doctor")
         
+        old_status = appointment.status
+        was_active = old_status in ACTIVE_STATUSES
         appointment.status = new_status
-        db.commit()
+        if was_active and new_status not in ACTIVE_STATUSES:
+            await db.execute(cancel_reminder(appointment.id))
+        elif not was_active and new_status in ACTIVE_STATUSES:
+            schedule_reminder(db, appointment)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Reactivating an appointment whose slot has been booked again since
+            raise HTTPException(status_code=409, detail=SLOT_TAKEN)
+        stats_cache.appointment_status_changed(appointment.doctor_id, appointment.appointment_date, old_status, new_status)
+        if was_active and new_status not in ACTIVE_STATUSES:
+            availability_calendar.release(appointment.doctor_id, appointment.appointment_date)
+        elif not was_active and new_status in ACTIVE_STATUSES:
+            availability_calendar.book(appointment.doctor_id, appointment.appointment_date)
+        publish_appointment("appointment.status_changed", appointment, old_status)
         return {"message": "Appointment status updated successfully"}
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
-@app.delete("/api/appointments/{appointment_id}")
-def cancel_appointment(
+@router.delete("/api/appointments/{appointment_id}")
+async def cancel_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+        appointment = await db.get(Appointment, appointment_id)
         if not appointment:
             raise HTTPException(status_code=404, detail="Appointment not found")
         
@@ -355,26 +691,152 @@ def cancel_appointment(
         if current_user.role == UserRole.PATIENT and appointment.patient_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized")
         if current_user.role == UserRole.DOCTOR:
-            doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-            if not doctor or appointment.doctor_id != doctor.id:
+            if appointment.doctor_id != current_user.doctor_id:
                 raise HTTPException(status_code=403, detail="Not authorized")
         
+        old_status = appointment.status
+        was_active = old_status in ACTIVE_STATUSES
         appointment.status = AppointmentStatus.CANCELLED
-        db.commit()
+        if was_active:
+            await db.execute(cancel_reminder(appointment.id))
+        await db.commit()
+        stats_cache.appointment_status_changed(
+            appointment.doctor_id, appointment.appointment_date, old_status, AppointmentStatus.CANCELLED
+        )
+        if was_active:
+            availability_calendar.release(appointment.doctor_id, appointment.appointment_date)
+        publish_appointment("appointment.cancelled", appointment, old_status)
         return {"message": "Appointment cancelled successfully"}
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Cancel failed: {str(e)}")
 
+BULK_STATUS_MAX = 1000  # appointments one bulk request may select
+BULK_STATUS_CHUNK = 500  # ids per UPDATE ... WHERE id IN
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@router.post("/api/appointments/bulk-status", response_model=AppointmentBulkStatusResponse)
+async def bulk_update_appointment_status(
+    data: AppointmentBulkStatus,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Move many appointments to one status in a single transaction, e.g. cancel a
+    doctor's appointments while they are on leave. The same role rules as
+    PUT /api/appointments/{id}/status apply; only pending and confirmed
+    appointments change.
+    """
+    new_status = data.status
+    if current_user.role == UserRole.PATIENT and new_status != AppointmentStatus.CANCELLED:
+        raise HTTPException(status_code=403, detail="Patients can only cancel appointments")
+    if current_user.role == UserRole.DOCTOR:
+        if new_status not in [AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED, AppointmentStatus.CANCELLED]:
+            raise HTTPException(status_code=400, detail="Invalid status for doctor")
+        if not current_user.doctor_id:
+            raise HTTPException(status_code=404, detail="Doctor profile not found")
+    
+    query = select(
+        Appointment.id, Appointment.patient_id, Appointment.doctor_id, Appointment.appointment_date, Appointment.status
+    )
+    if data.appointment_ids is not None:
+        query = query.where(Appointment.id.in_(set(data.appointment_ids)))
+    else:
+        query = query.where(
+            Appointment.status.in_(ACTIVE_STATUSES),
+            Appointment.appointment_date >= data.date_from,
+            Appointment.appointment_date < data.date_to
+        )
+        if data.doctor_id is not None:
+            query = query.where(Appointment.doctor_id == data.doctor_id)
+        # A filter only selects the caller's own appointments
+        if current_user.role == UserRole.PATIENT:
+            query = query.where(Appointment.patient_id == current_user.id)
+        elif current_user.role == UserRole.DOCTOR:
+            query = query.where(Appointment.doctor_id == current_user.doctor_id)
+        query = query.order_by(Appointment.appointment_date, Appointment.id).limit(BULK_STATUS_MAX + 1)
+    
+    results, changed = {}, []
+    try:
+        # One query locks every selected row and brings back what the permission checks need
+        rows = (await db.execute(query.with_for_update())).all()
+        if len(rows) > BULK_STATUS_MAX:
+            raise HTTPException(status_code=400, detail=f"More than {BULK_STATUS_MAX} appointments match; narrow the range")
+        for row in rows:
+            if (current_user.role == UserRole.PATIENT and row.patient_id != current_user.id) or \
+                    (current_user.role == UserRole.DOCTOR and row.doctor_id != current_user.doctor_id):
+                results[row.id] = {"result": "forbidden", "detail": "Not authorized"}
+            elif row.status not in ACTIVE_STATUSES:
+                results[row.id] = {"result": "skipped", "detail": f"Appointment is {row.status.value}"}
+            elif row.status == new_status:
+                results[row.id] = {"result": "unchanged"}
+            else:
+                results[row.id] = {"result": "updated"}
+                changed.append(row)
+        
+        released = new_status not in ACTIVE_STATUSES
+        for chunk in _chunks([row.id for row in changed], BULK_STATUS_CHUNK):
+            await db.execute(
+                update(Appointment).where(Appointment.id.in_(chunk)).values(status=new_status)
+                .execution_options(synchronize_session=False)
+            )
+            if released:
+                await db.execute(cancel_reminder(*chunk))
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Bulk update failed: {str(e)}")
+    
+    stats_cache.appointments_status_changed(
+        [(row.doctor_id, row.appointment_date, row.status, new_status) for row in changed]
+    )
+    if released:
+        for row in changed:
+            availability_calendar.release(row.doctor_id, row.appointment_date)
+    bus.publish_many(
+        appointment_event("appointment.status_changed", SimpleNamespace(**{**row._asdict(), "status": new_status}), row.status)
+        for row in changed
+    )
+    
+    ids = list(dict.fromkeys(data.appointment_ids)) if data.appointment_ids is not None else [row.id for row in rows]
+    return {
+        "updated": len(changed),
+        "results": [
+            {"id": i, **results.get(i, {"result": "not_found", "detail": "Appointment not found"})} for i in ids
+        ]
+    }
+
+# ==================== NOTIFICATIONS ====================
+
+@router.get("/api/notifications/stream")
+async def notification_stream(current_user: Principal = Depends(get_stream_user)):
+    """Server-Sent Events: appointment.created / appointment.status_changed / appointment.cancelled"""
+    try:
+        subscription = bus.subscribe(channels_for(current_user))
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open notification streams", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        event_stream(subscription),
+        media_type="text/event-stream",
+        # Tell nginx-style proxies not to buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== CONSULTATION ENDPOINTS ====================
 
-@app.post("/api/consultations", response_model=ConsultationResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/api/consultations", response_model=ConsultationResponse, status_code=status.HTTP_201_CREATED)
 def create_consultation(
     consultation_data: ConsultationCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Verify appointment exists
@@ -386,8 +848,7 @@ def create_consultation(
     if current_user.role == UserRole.PATIENT and appointment.patient_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     if current_user.role == UserRole.DOCTOR:
-        doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if not doctor or appointment.doctor_id != doctor.id:
+        if appointment.doctor_id != current_user.doctor_id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     # Check if consultation already exists
@@ -406,8 +867,8 @@ def create_consultation(
     db.refresh(new_consultation)
     return new_consultation
 
-@app.get("/api/consultations/{consultation_id}", response_model=ConsultationResponse)
-def get_consultation(consultation_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/api/consultations/{consultation_id}", response_model=ConsultationResponse)
+def get_consultation(consultation_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     consultation = db.query(Consultation).filter(Consultation.id == consultation_id).first()
     if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
@@ -417,14 +878,13 @@ def get_consultation(consultation_id: int, current_user: User = Depends(get_curr
     if current_user.role == UserRole.PATIENT and appointment.patient_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     if current_user.role == UserRole.DOCTOR:
-        doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if not doctor or appointment.doctor_id != doctor.id:
+        if appointment.doctor_id != current_user.doctor_id:
             raise HTTPException(status_code=403, detail="Not authorized")
     
     return consultation
 
-@app.post("/api/consultations/{consultation_id}/start")
-def start_consultation(consultation_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/api/consultations/{consultation_id}/start")
+def start_consultation(consultation_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     consultation = db.query(Consultation).filter(Consultation.id == consultation_id).first()
     if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
@@ -434,8 +894,8 @@ def start_consultation(consultation_id: int, current_user: User = Depends(get_cu
     db.commit()
     return {"message": "Consultation started", "start_time": consultation.start_time}
 
-@app.post("/api/consultations/{consultation_id}/end")
-def end_consultation(consultation_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/api/consultations/{consultation_id}/end")
+def end_consultation(consultation_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     consultation = db.query(Consultation).filter(Consultation.id == consultation_id).first()
     if not consultation:
         raise HTTPException(status_code=404, detail="Consultation not found")
@@ -447,14 +907,14 @@ def end_consultation(consultation_id: int, current_user: User = Depends(get_curr
 
 # ==================== MEDICAL RECORDS ====================
 
-@app.post("/api/medical-records", response_model=MedicalRecordResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/api/medical-records", response_model=MedicalRecordResponse, status_code=status.HTTP_201_CREATED)
 def create_medical_record(
     record_data: MedicalRecordCreate,
-    current_user: User = Depends(get_current_doctor),
+    current_user: Principal = Depends(get_current_doctor),
     db: Session = Depends(get_db)
 ):
     try:
-        new_record = MedicalRecord(**record_data.dict())
+        new_record = MedicalRecord(**record_data.dict(), summary=summarize(record_data.diagnosis))
         db.add(new_record)
         db.commit()
         db.refresh(new_record)
@@ -463,11 +923,11 @@ def create_medical_record(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Medical record creation failed: {str(e)}")
 
-@app.put("/api/medical-records/{record_id}", response_model=MedicalRecordResponse)
+@router.put("/api/medical-records/{record_id}", response_model=MedicalRecordResponse)
 def update_medical_record(
     record_id: int,
     record_data: MedicalRecordCreate,
-    current_user: User = Depends(get_current_doctor),
+    current_user: Principal = Depends(get_current_doctor),
     db: Session = Depends(get_db)
 ):
     try:
@@ -477,6 +937,7 @@ def update_medical_record(
         
         for key, value in record_data.dict().items():
             setattr(record, key, value)
+        record.summary = summarize(record.diagnosis)
         
         db.commit()
         db.refresh(record)
@@ -488,10 +949,10 @@ def update_medical_record(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
-@app.delete("/api/medical-records/{record_id}")
+@router.delete("/api/medical-records/{record_id}")
 def delete_medical_record(
     record_id: int,
-    current_user: User = Depends(get_current_doctor),
+    current_user: Principal = Depends(get_current_doctor),
     db: Session = Depends(get_db)
 ):
     try:
@@ -509,61 +970,247 @@ def delete_medical_record(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
-@app.get("/api/medical-records", response_model=List[MedicalRecordResponse])
+@router.get("/api/medical-records", response_model=List[MedicalRecordResponse])
 def get_medical_records(
+    response: Response,
     patient_id: Optional[int] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
+    query = db.query(*MEDICAL_RECORD_ROWS.columns)
     if current_user.role == UserRole.PATIENT:
-        records = db.query(MedicalRecord).filter(MedicalRecord.patient_id == current_user.id).all()
+        query = query.filter(MedicalRecord.patient_id == current_user.id)
     elif current_user.role == UserRole.DOCTOR:
-        doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if doctor and patient_id:
-            records = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient_id).all()
-        else:
-            records = []
+        if not current_user.doctor_id or not patient_id:
+            return []
+        query = query.filter(MedicalRecord.patient_id == patient_id)
     else:  # ADMIN
         if patient_id:
-            records = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient_id).all()
-        else:
-            records = db.query(MedicalRecord).all()
+            query = query.filter(MedicalRecord.patient_id == patient_id)
+    
+    if date_from:
+        query = query.filter(MedicalRecord.record_date >= date_from)
+    if date_to:
+        query = query.filter(MedicalRecord.record_date < date_to)
+    
+    records = paginate(query, [MedicalRecord.record_date, MedicalRecord.id], page, response, descending=True)
+    return fast_json(MEDICAL_RECORD_ROWS.dicts(records), response)
+
+@router.get("/api/medical-records/timeline", response_model=List[MedicalRecordSummary])
+def get_medical_timeline(
+    response: Response,
+    patient_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """A patient's records newest first, as summaries; scroll back with the X-Next-Cursor header"""
+    query = db.query(*TIMELINE_ROWS.columns).filter(
+        MedicalRecord.patient_id == timeline_patient(current_user, patient_id)
+    )
+    if date_from:
+        query = query.filter(MedicalRecord.record_date >= date_from)
+    if date_to:
+        query = query.filter(MedicalRecord.record_date < date_to)
     
-    return records
+    records = paginate(query, TIMELINE_ORDER, page, response, descending=True)
+    return fast_json(TIMELINE_ROWS.dicts(records), response)
+
+@router.get("/api/medical-records/{record_id}", response_model=MedicalRecordResponse)
+def get_medical_record(record_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    record = db.get(MedicalRecord, record_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Medical record not found")
+    if not can_read(current_user, record):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return record
 
 # ==================== ADMIN ENDPOINTS ====================
 
-@app.get("/api/admin/users", response_model=List[UserResponse])
-def get_all_users(admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return users
+@router.get("/api/admin/users", response_model=List[UserResponse])
+def get_all_users(
+    response: Response,
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: PageParams = Depends(page_params),
+    admin: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    query = db.query(*USER_ROWS.columns)
+    if role:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if date_from:
+        query = query.filter(User.created_at >= date_from)
+    if date_to:
+        query = query.filter(User.created_at < date_to)
+    
+    users = paginate(query, [User.id], page, response)
+    return fast_json(USER_ROWS.dicts(users), response)
 
-@app.put("/api/admin/users/{user_id}/toggle-active")
-def toggle_user_active(user_id: int, admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+@router.put("/api/admin/users/{user_id}/toggle-active")
+def toggle_user_active(user_id: int, admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = not user.is_active
     db.commit()
+    doctor_index.set_user_active(user.id, user.is_active)
+    availability_calendar.set_user_active(user.id, user.is_active)
+    doctor_cache.invalidate()
+    recent_writes.mark(DOCTOR_LISTINGS)
+    invalidate_principal(user.id)
     return {"message": "User status updated", "is_active": user.is_active}
 
-@app.get("/api/admin/stats")
-def get_admin_stats(admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    total_users = db.query(User).count()
-    total_doctors = db.query(Doctor).count()
-    total_appointments = db.query(Appointment).count()
-    pending_appointments = db.query(Appointment).filter(Appointment.status == AppointmentStatus.PENDING).count()
-    completed_appointments = db.query(Appointment).filter(Appointment.status == AppointmentStatus.COMPLETED).count()
+@router.get("/api/admin/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    admin: Principal = Depends(get_current_admin)
+):
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {dataset}")
     
+    columns, order_by = EXPORT_DATASETS[dataset]
+    media_type, lines = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        lines(columns, stream_batches(columns, order_by, sessions=read_sessions(user_key(admin.id)))),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{export_format}"'}
+    )
+
+@router.post("/api/admin/import/{dataset}")
+def import_dataset(
+    dataset: str,
+    file: UploadFile = File(...),
+    import_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$"),
+    dry_run: bool = False,
+    admin: Principal = Depends(get_current_admin)
+):
+    if dataset not in IMPORT_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown import: {dataset}")
+    
+    if import_format is None:
+        import_format = "ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv"
+    # The upload is spooled to disk by the server, so rows are read without loading the whole file
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        report = import_stream(dataset, stream, import_format, dry_run=dry_run)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Import file must be UTF-8")
+    return report.as_dict()
+
+@router.get("/api/admin/pool-stats")
+def get_pool_stats(admin: Principal = Depends(get_current_admin)):
     return {
-        "total_users": total_users,
-        "total_doctors": total_doctors,
-        "total_appointments": total_appointments,
-        "pending_appointments": pending_appointments,
-        "completed_appointments": completed_appointments
+        "sync": pool_stats(get_engine()),
+        "async": pool_stats(get_async_engine().sync_engine),
+        **({
+            "replica": pool_stats(get_replica_engine()),
+            "async_replica": pool_stats(get_async_replica_engine().sync_engine),
+            "replica_status": replica_monitor.status()
+        } if get_replica_engine() is not None else {})
     }
 
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: per-route latency, SQL and serialization figures"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/api/admin/slow-queries")
+def get_slow_queries(admin: Principal = Depends(get_current_admin)):
+    return slow_statements.top()
+
+@router.get("/api/admin/profiles")
+def get_profiles(admin: Principal = Depends(get_current_admin)):
+    return profile_store.list()
+
+@router.get("/api/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: int, admin: Principal = Depends(get_current_admin)):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile[1]
+
+@router.get("/api/admin/notification-stats")
+def get_notification_stats(admin: Principal = Depends(get_current_admin)):
+    return bus.stats()
+
+@router.get("/api/admin/jobs", response_model=List[JobResponse])
+def get_jobs(
+    response: Response,
+    status_filter: JobStatus = Query(JobStatus.DEAD, alias="status"),
+    kind: Optional[str] = None,
+    page: PageParams = Depends(page_params),
+    admin: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Jobs in one state, newest first; defaults to the dead-letter list"""
+    query = db.query(Job).filter(Job.status == status_filter)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return paginate(query, [Job.id], page, response, descending=True)
+
+@router.get("/api/admin/jobs/stats")
+def get_job_stats(admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return {**job_counts(db), "worker": job_worker.stats()}
+
+@router.post("/api/admin/jobs/{job_id}/retry", response_model=JobResponse)
+def retry_dead_job(job_id: int, admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    job = retry_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.QUEUED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status.value}; only dead or cancelled jobs can be retried")
+    return job
+
+@router.get("/api/admin/stats")
+def get_admin_stats(admin: Principal = Depends(get_current_admin), db: Session = Depends(get_read_db)):
+    return stats_cache.summary(db)
+
+@router.get("/api/admin/stats/doctors")
+def get_admin_stats_by_doctor(admin: Principal = Depends(get_current_admin), db: Session = Depends(get_read_db)):
+    return stats_cache.per_doctor(db)
+
+@router.get("/api/admin/stats/daily")
+def get_admin_stats_by_day(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    admin: Principal = Depends(get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    return stats_cache.per_day(db, date_from, date_to)
+
+def create_app() -> FastAPI:
+    """Build the application; `uvicorn main:app` uses the instance below, `uvicorn --factory main:create_app` a fresh one"""
+    app = FastAPI(title="Doctor Appointment Portal API", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, REPLAYED_HEADER, "ETag", QUERY_COUNT_HEADER, PROFILE_ID_HEADER, "Server-Timing"],
+    )
+    app.add_middleware(ReadYourWritesMiddleware)
+    # Outermost, so its timings include CORS handling
+    app.add_middleware(ProfilingMiddleware)
+    app.add_exception_handler(HashingBusyError, hashing_busy_handler)
+    app.include_router(router)
+    return app
+
+install_serialization_timer()
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
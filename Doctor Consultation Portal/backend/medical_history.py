@@ -0,0 +1,61 @@
+"""
+Patient medical-history timeline
+The timeline lists a patient's records newest first as summaries: dates,
+ids, the start of the diagnosis and whether the other sections are filled
+in. The full text (diagnosis, prescription, test results, notes) is loaded
+per record when it is opened. Summaries are stored in medical_records.summary
+when a record is written, so a timeline page reads the
+(patient_id, record_date) index and short columns only. Its size and cost
+depend on the page size, not on how long the history is.
+"""
+import re
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import Boolean, type_coerce
+from auth import Principal
+from models import MedicalRecord, UserRole
+from queries import RowShape
+from schemas import MedicalRecordSummary
+
+SUMMARY_LENGTH = MedicalRecord.summary.type.length
+
+_WHITESPACE = re.compile(r"\s+")
+
+def summarize(diagnosis: Optional[str]) -> Optional[str]:
+    """The stored summary for a diagnosis: whitespace collapsed, cut to SUMMARY_LENGTH"""
+    if diagnosis is None:
+        return None
+    text = _WHITESPACE.sub(" ", diagnosis).strip()
+    if len(text) > SUMMARY_LENGTH:
+        text = text[:SUMMARY_LENGTH - 1].rstrip() + "…"
+    return text or None
+
+def _present(column):
+    # IS NOT NULL is answered from the row's null bitmap, without reading the TEXT value
+    return type_coerce(column.isnot(None), Boolean)
+
+TIMELINE_ROWS = RowShape(MedicalRecord, MedicalRecordSummary, computed={
+    "has_prescription": _present(MedicalRecord.prescription),
+    "has_test_results": _present(MedicalRecord.test_results),
+    "has_notes": _present(MedicalRecord.notes),
+})
+TIMELINE_ORDER = [MedicalRecord.record_date, MedicalRecord.id]
+
+def timeline_patient(principal: Principal, patient_id: Optional[int]) -> int:
+    """The patient whose timeline principal may read: their own, or patient_id for staff"""
+    if principal.role == UserRole.PATIENT:
+        if patient_id is not None and patient_id != principal.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return principal.id
+    if principal.role == UserRole.DOCTOR and not principal.doctor_id:
+        raise HTTPException(status_code=403, detail="Doctor profile not found")
+    if patient_id is None:
+        raise HTTPException(status_code=400, detail="patient_id is required")
+    return patient_id
+
+def can_read(principal: Principal, record) -> bool:
+    if principal.role == UserRole.PATIENT:
+        return record.patient_id == principal.id
+    if principal.role == UserRole.DOCTOR:
+        return bool(principal.doctor_id)
+    return True
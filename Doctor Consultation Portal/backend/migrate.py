@@ -0,0 +1,235 @@
+"""
+Versioned schema migrations
+Migrations live in migrations/ as NNNN_<name>.py modules with an
+upgrade(op) function (and optionally downgrade(op)); the module docstring is
+the description. Applied versions are recorded in the schema_migrations table.
+
+    python migrate.py              # apply everything pending
+    python migrate.py status
+    python migrate.py upgrade --to 2
+    python migrate.py downgrade --to 1
+
+Operations skip work that is already done (an index that exists, a column
+that is there), because a fresh database gets the current models from the
+baseline migration and later ones then only fill in what older databases
+lack. On MySQL, index and column changes run as online DDL
+(ALGORITHM=INPLACE/INSTANT, LOCK=NONE), so the tables stay writable while
+they build. MySQL commits DDL implicitly, so a migration that fails halfway
+is not rolled back; fix the cause and run it again.
+"""
+import argparse
+import importlib
+import os
+import re
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+# Apply pending migrations when the API starts (development); in production run
+# init_db.py / migrate.py once per deploy instead of in every worker
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Concurrent runs (several app workers starting at once) wait on this MySQL lock
+MIGRATION_LOCK = "schema_migrations"
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+    Column("duration_ms", Integer, nullable=False),
+)
+
+class Migration:
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.description = (module.__doc__ or "").strip().split("\n")[0]
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.name}"
+
+def discover() -> list:
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _FILENAME.match(filename)
+        if match:
+            module = importlib.import_module(f"migrations.{filename[:-3]}")
+            migrations.append(Migration(int(match.group(1)), match.group(2), module))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+class Operations:
+    """Schema changes for migrations, idempotent and online where the database allows"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+
+    @property
+    def mysql(self) -> bool:
+        return self.dialect == "mysql"
+
+    def execute(self, statement: str, **params):
+        return self.conn.execute(text(statement), params)
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.conn).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(c["name"] == column for c in inspect(self.conn).get_columns(table))
+
+    def has_index(self, table: str, name: str) -> bool:
+        inspector = inspect(self.conn)
+        names = {i["name"] for i in inspector.get_indexes(table)}
+        names.update(c["name"] for c in inspector.get_unique_constraints(table))
+        return name in names
+
+    def create_all(self, metadata):
+        """Create the tables (with their indexes) that don't exist yet"""
+        metadata.create_all(bind=self.conn, checkfirst=True)
+
+    def create_table(self, table):
+        """Create a model's table (with its indexes) unless it exists"""
+        table.create(bind=self.conn, checkfirst=True)
+
+    def create_index(self, name: str, table: str, columns: list, unique: bool = False):
+        if self.has_index(table, name):
+            return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cols = ", ".join(columns)
+        if self.mysql:
+            self.execute(f"ALTER TABLE {table} ADD {kind} {name} ({cols}), ALGORITHM=INPLACE, LOCK=NONE")
+        else:
+            self.execute(f"CREATE {kind} {name} ON {table} ({cols})")
+
+    def drop_index(self, name: str, table: str):
+        if not self.has_index(table, name):
+            return
+        if self.mysql:
+            self.execute(f"ALTER TABLE {table} DROP INDEX {name}, ALGORITHM=INPLACE, LOCK=NONE")
+        else:
+            self.execute(f"DROP INDEX {name}")
+
+    def add_column(self, table: str, column: str, definition: str, online: bool = True):
+        """
+        Add `column definition`. online=False for changes MySQL can only make by
+        copying the table (e.g. stored generated columns); those block writes
+        while they run.
+        """
+        if self.has_column(table, column):
+            return
+        statement = f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+        if self.mysql and online:
+            try:
+                self.execute(statement + ", ALGORITHM=INSTANT")
+                return
+            except Exception:
+                # INSTANT needs MySQL 8.0.12+ and a trailing column; fall back to an in-place rebuild
+                statement += ", ALGORITHM=INPLACE, LOCK=NONE"
+        self.execute(statement)
+
+    def drop_column(self, table: str, column: str):
+        if self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+def _lock(conn):
+    if conn.dialect.name == "mysql":
+        acquired = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": MIGRATION_LOCK, "timeout": MIGRATION_LOCK_TIMEOUT}
+        ).scalar()
+        if acquired != 1:
+            raise RuntimeError("Timed out waiting for another migration run to finish")
+
+def _unlock(conn):
+    if conn.dialect.name == "mysql":
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+def applied_versions(conn) -> dict:
+    schema_migrations.create(bind=conn, checkfirst=True)
+    rows = conn.execute(schema_migrations.select()).mappings().all()
+    return {row["version"]: row for row in rows}
+
+def upgrade(engine, to: int = None, log=print) -> list:
+    """Apply pending migrations up to version `to` (default: all); returns the ones applied"""
+    applied = []
+    with engine.connect() as conn:
+        _lock(conn)
+        try:
+            done = applied_versions(conn)
+            conn.commit()
+            for migration in discover():
+                if migration.version in done or (to is not None and migration.version > to):
+                    continue
+                started = time.perf_counter()
+                migration.module.upgrade(Operations(conn))
+                conn.execute(schema_migrations.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+                    duration_ms=int((time.perf_counter() - started) * 1000)
+                ))
+                conn.commit()
+                applied.append(migration)
+                log(f"Applied {migration!r} ({time.perf_counter() - started:.2f}s) {migration.description}")
+        finally:
+            conn.rollback()
+            _unlock(conn)
+            conn.commit()
+    return applied
+
+def downgrade(engine, to: int, log=print) -> list:
+    """Revert applied migrations above version `to`, newest first"""
+    reverted = []
+    with engine.connect() as conn:
+        _lock(conn)
+        try:
+            done = applied_versions(conn)
+            conn.commit()
+            for migration in reversed(discover()):
+                if migration.version not in done or migration.version <= to:
+                    continue
+                if not hasattr(migration.module, "downgrade"):
+                    raise RuntimeError(f"{migration!r} cannot be reverted")
+                migration.module.downgrade(Operations(conn))
+                conn.execute(schema_migrations.delete().where(schema_migrations.c.version == migration.version))
+                conn.commit()
+                reverted.append(migration)
+                log(f"Reverted {migration!r}")
+        finally:
+            conn.rollback()
+            _unlock(conn)
+            conn.commit()
+    return reverted
+
+def status(engine) -> list:
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    return [(migration, done.get(migration.version)) for migration in discover()]
+
+def main():
+    from database import engine
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "downgrade", "status"])
+    parser.add_argument("--to", type=int, help="target version (required for downgrade)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for migration, row in status(engine):
+            applied = f"applied {row['applied_at']:%Y-%m-%d %H:%M:%S}" if row else "pending"
+            print(f"{migration!r:<32} {applied:<28} {migration.description}")
+    elif args.command == "downgrade":
+        if args.to is None:
+            parser.error("downgrade needs --to")
+        downgrade(engine, args.to)
+    else:
+        if not upgrade(engine, args.to):
+            print("Schema is up to date")
+
+if __name__ == "__main__":
+    main()
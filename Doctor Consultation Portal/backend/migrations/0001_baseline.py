@@ -0,0 +1,128 @@
+"""
+Baseline: the schema as it was when migrations were introduced
+Databases created before migrations existed (by create_all) already have the
+tables; for them this only adds tables introduced since, such as jobs.
+
+The tables are pinned here rather than taken from models.py, so editing a
+model never changes what this migration does: a model change needs its own
+migration (tests/test_schema.py checks that the migrations add up to the
+models).
+"""
+from sqlalchemy import (
+    Boolean, Column, Computed, DateTime, Enum, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, Time,
+    UniqueConstraint, func
+)
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(100), unique=True, index=True, nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("email", String(100), index=True, nullable=False),
+    Column("phone", String(10), nullable=False),
+    Column("role", Enum("PATIENT", "DOCTOR", "ADMIN", name="userrole"), nullable=False),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+Table(
+    "doctors", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), unique=True, nullable=False),
+    Column("specialization", String(100), nullable=False),
+    Column("experience_years", Integer, nullable=False),
+    Column("qualification", String(255), nullable=False),
+    Column("bio", Text, nullable=True),
+    Column("consultation_fee", Float, nullable=False),
+    Column("location", String(200), nullable=False),
+    Column("available_from", Time, nullable=False),
+    Column("available_to", Time, nullable=False),
+    Column("is_available", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_doctors_specialization_location", "specialization", "location"),
+)
+
+Table(
+    "appointments", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("patient_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("doctor_id", Integer, ForeignKey("doctors.id"), nullable=False),
+    Column("appointment_date", DateTime(timezone=True), nullable=False),
+    Column("status", Enum("PENDING", "CONFIRMED", "COMPLETED", "CANCELLED", name="appointmentstatus")),
+    Column("reason", Text, nullable=True),
+    Column("notes", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("active_slot", Integer, Computed("CASE WHEN status IN ('PENDING', 'CONFIRMED') THEN 1 END", persisted=True)),
+    Index("ix_appointments_doctor_date_status", "doctor_id", "appointment_date", "status"),
+    Index("ix_appointments_patient_date", "patient_id", "appointment_date"),
+    Index("ix_appointments_date", "appointment_date"),
+    Index("ix_appointments_status_date", "status", "appointment_date"),
+    UniqueConstraint("doctor_id", "appointment_date", "active_slot", name="uq_appointments_active_slot"),
+)
+
+Table(
+    "consultations", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("appointment_id", Integer, ForeignKey("appointments.id"), unique=True, nullable=False),
+    Column("consultation_type", Enum("TEXT", "VIDEO", name="consultationtype"), nullable=False),
+    Column("start_time", DateTime(timezone=True), nullable=True),
+    Column("end_time", DateTime(timezone=True), nullable=True),
+    Column("status", String(50)),
+    Column("notes", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "medical_records", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("patient_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("doctor_id", Integer, ForeignKey("doctors.id"), nullable=True),
+    Column("appointment_id", Integer, ForeignKey("appointments.id"), nullable=True),
+    Column("diagnosis", Text, nullable=True),
+    Column("prescription", Text, nullable=True),
+    Column("test_results", Text, nullable=True),
+    Column("notes", Text, nullable=True),
+    Column("record_date", DateTime(timezone=True), server_default=func.now()),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_medical_records_patient_date", "patient_id", "record_date"),
+    Index("ix_medical_records_date", "record_date"),
+)
+
+Table(
+    "idempotency_keys", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("key", String(255), nullable=False),
+    Column("request_hash", String(64), nullable=False),
+    Column("status_code", Integer, nullable=True),
+    Column("resource_id", Integer, nullable=True),
+    Column("response_body", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+)
+
+Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(100), nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("status", Enum("QUEUED", "RUNNING", "SUCCEEDED", "DEAD", "CANCELLED", name="jobstatus"), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("max_attempts", Integer, nullable=False),
+    Column("run_at", DateTime, nullable=False),
+    Column("dedupe_key", String(255), nullable=True),
+    Column("locked_at", DateTime, nullable=True),
+    Column("locked_by", String(100), nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("finished_at", DateTime, nullable=True),
+    Index("ix_jobs_status_run_at", "status", "run_at"),
+    Index("ix_jobs_dedupe_key", "dedupe_key"),
+)
+
+def upgrade(op):
+    op.create_all(metadata)
@@ -0,0 +1,25 @@
+"""
+Slot constraint and list indexes on tables created before they were modelled
+create_all never alters an existing table, so databases created before the
+active_slot constraint and the keyset pagination indexes have none of them.
+Adding the stored generated column copies the appointments table on MySQL
+(writes block while it runs); resolve duplicate active bookings for the same
+doctor and time first or the unique index will fail.
+"""
+from models import AppointmentStatus
+
+ACTIVE = f"'{AppointmentStatus.PENDING.name}', '{AppointmentStatus.CONFIRMED.name}'"
+
+def upgrade(op):
+    expression = f"CASE WHEN status IN ({ACTIVE}) THEN 1 END"
+    if op.mysql:
+        op.add_column("appointments", "active_slot", f"INT GENERATED ALWAYS AS ({expression}) STORED", online=False)
+    else:
+        # SQLite can only add virtual generated columns, which it can index just the same
+        op.add_column("appointments", "active_slot", f"INTEGER GENERATED ALWAYS AS ({expression}) VIRTUAL")
+    op.create_index("uq_appointments_active_slot", "appointments", ["doctor_id", "appointment_date", "active_slot"], unique=True)
+    op.create_index("ix_appointments_doctor_date_status", "appointments", ["doctor_id", "appointment_date", "status"])
+    op.create_index("ix_appointments_patient_date", "appointments", ["patient_id", "appointment_date"])
+    op.create_index("ix_appointments_date", "appointments", ["appointment_date"])
+    op.create_index("ix_medical_records_patient_date", "medical_records", ["patient_id", "record_date"])
+    op.create_index("ix_medical_records_date", "medical_records", ["record_date"])
@@ -0,0 +1,21 @@
+"""
+Indexes for the remaining unindexed hot lookups
+users.email is checked on every registration, doctors are filtered by
+specialization and location, and the admin appointment list and stats filter
+by status. appointments.doctor_id/patient_id and medical_records.patient_id
+are already the leading columns of the 0002 indexes.
+"""
+
+INDEXES = [
+    ("ix_users_email", "users", ["email"]),
+    ("ix_doctors_specialization_location", "doctors", ["specialization", "location"]),
+    ("ix_appointments_status_date", "appointments", ["status", "appointment_date"]),
+]
+
+def upgrade(op):
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+def downgrade(op):
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table)
@@ -0,0 +1,45 @@
+"""
+Weekly working hours and availability exceptions per doctor
+Doctors without weekly hours keep using their available_from/available_to
+window on every day, so existing data needs no backfill. The tables are
+pinned here, like the baseline's, rather than taken from models.py.
+"""
+from sqlalchemy import Column, Date, DateTime, Enum, ForeignKey, Index, Integer, MetaData, String, Table, Time, func
+
+metadata = MetaData()
+
+# Referenced by the foreign keys; already created by the baseline
+Table("doctors", metadata, Column("id", Integer, primary_key=True))
+
+weekly_hours = Table(
+    "doctor_weekly_hours", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("doctor_id", Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False),
+    Column("weekday", Integer, nullable=False),
+    Column("start_time", Time, nullable=False),
+    Column("end_time", Time, nullable=False),
+    Index("ix_doctor_weekly_hours_doctor", "doctor_id", "weekday"),
+)
+
+availability_exceptions = Table(
+    "doctor_availability_exceptions", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("doctor_id", Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False),
+    Column("kind", Enum("UNAVAILABLE", "AVAILABLE", name="availabilitykind"), nullable=False),
+    Column("start_date", Date, nullable=False),
+    Column("end_date", Date, nullable=False),
+    Column("start_time", Time, nullable=True),
+    Column("end_time", Time, nullable=True),
+    Column("reason", String(255), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("ix_doctor_availability_exceptions_doctor", "doctor_id", "end_date"),
+    Index("ix_doctor_availability_exceptions_dates", "end_date", "start_date"),
+)
+
+def upgrade(op):
+    op.create_table(weekly_hours)
+    op.create_table(availability_exceptions)
+
+def downgrade(op):
+    op.execute("DROP TABLE doctor_availability_exceptions")
+    op.execute("DROP TABLE doctor_weekly_hours")
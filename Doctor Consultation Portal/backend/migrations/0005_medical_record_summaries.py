@@ -0,0 +1,33 @@
+"""
+Stored diagnosis summaries for the medical-history timeline
+Adds medical_records.summary and fills it for existing records in batches of
+BATCH rows by id, committing each batch so no long transaction holds the
+rows. An interrupted run picks up where it stopped, since filled rows are
+skipped.
+"""
+from sqlalchemy import bindparam, column, select, table, update
+from medical_history import summarize
+
+BATCH = 1000
+
+# Only the columns the backfill touches, pinned rather than taken from models.py
+records = table("medical_records", column("id"), column("diagnosis"), column("summary"))
+
+def upgrade(op):
+    op.add_column("medical_records", "summary", "VARCHAR(200) NULL")
+    fill = update(records).where(records.c.id == bindparam("record_id")).values(summary=bindparam("text"))
+    last = 0
+    while True:
+        rows = op.conn.execute(
+            select(records.c.id, records.c.diagnosis)
+            .where(records.c.id > last, records.c.summary.is_(None), records.c.diagnosis.isnot(None))
+            .order_by(records.c.id).limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        op.conn.execute(fill, [{"record_id": row.id, "text": summarize(row.diagnosis)} for row in rows])
+        op.conn.commit()
+        last = rows[-1].id
+
+def downgrade(op):
+    op.drop_column("medical_records", "summary")
@@ -0,0 +1 @@
+"""Schema migrations, applied in version order by migrate.py"""
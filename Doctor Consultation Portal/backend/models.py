@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Float, Time
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, Enum, Float, Time, Index, Computed, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -15,17 +15,28 @@ class AppointmentStatus(str, enum.Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    DEAD = "dead"
+    CANCELLED = "cancelled"
+
 class ConsultationType(str, enum.Enum):
     TEXT = "text"
     VIDEO = "video"
 
+class AvailabilityKind(str, enum.Enum):
+    UNAVAILABLE = "unavailable"  # leave, holidays, blocked hours
+    AVAILABLE = "available"      # extra hours outside the weekly template
+
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), index=True, nullable=False)
     phone = Column(String(10), nullable=False)
     role = Column(Enum(UserRole), nullable=False, default=UserRole.PATIENT)
     is_active = Column(Boolean, default=True)
@@ -55,6 +66,44 @@ class Doctor(Base):
     # Relationships
     user = relationship("User", back_populates="doctor_profile")
     appointments = relationship("Appointment", foreign_keys="Appointment.doctor_id", back_populates="doctor")
+    
+    __table_args__ = (
+        Index("ix_doctors_specialization_location", "specialization", "location"),
+    )
+
+class WeeklyHours(Base):
+    """One working interval of a doctor's weekly template; see availability.py"""
+    __tablename__ = "doctor_weekly_hours"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_doctor_weekly_hours_doctor", "doctor_id", "weekday"),
+    )
+
+class AvailabilityException(Base):
+    """Leave or extra hours overriding the weekly template on a range of days"""
+    __tablename__ = "doctor_availability_exceptions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(Enum(AvailabilityKind), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # inclusive
+    # Both NULL = the whole day
+    start_time = Column(Time, nullable=True)
+    end_time = Column(Time, nullable=True)
+    reason = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_doctor_availability_exceptions_doctor", "doctor_id", "end_date"),
+        Index("ix_doctor_availability_exceptions_dates", "end_date", "start_date"),
+    )
 
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -68,11 +117,28 @@ class Appointment(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # 1 while the appointment holds its slot (pending/confirmed), NULL otherwise; the
+    # unique constraint below then allows one active booking per doctor and start time
+    active_slot = Column(Integer, Computed(
+        f"CASE WHEN status IN ('{AppointmentStatus.PENDING.name}', '{AppointmentStatus.CONFIRMED.name}') THEN 1 END",
+        persisted=True
+    ))
     
     # Relationships
     patient = relationship("User", foreign_keys=[patient_id], back_populates="patient_appointments")
     doctor = relationship("Doctor", foreign_keys=[doctor_id], back_populates="appointments")
     consultation = relationship("Consultation", back_populates="appointment", uselist=False)
+    
+    __table_args__ = (
+        # Slot lookups: a doctor's active appointments within a day
+        Index("ix_appointments_doctor_date_status", "doctor_id", "appointment_date", "status"),
+        # Keyset pagination of a patient's and of all appointments by date
+        Index("ix_appointments_patient_date", "patient_id", "appointment_date"),
+        Index("ix_appointments_date", "appointment_date"),
+        # Admin list and stats filtered by status
+        Index("ix_appointments_status_date", "status", "appointment_date"),
+        UniqueConstraint("doctor_id", "appointment_date", "active_slot", name="uq_appointments_active_slot"),
+    )
 
 class Consultation(Base):
     __tablename__ = "consultations"
@@ -100,9 +166,59 @@ class MedicalRecord(Base):
     prescription = Column(Text, nullable=True)
     test_results = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
+    # Start of the diagnosis for timeline lists (medical_history.summarize), so they never read the TEXT columns
+    summary = Column(String(200), nullable=True)
     record_date = Column(DateTime(timezone=True), server_default=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     patient = relationship("User", foreign_keys=[patient_id])
+    
+    __table_args__ = (
+        # Keyset pagination of a patient's records by date
+        Index("ix_medical_records_patient_date", "patient_id", "record_date"),
+        Index("ix_medical_records_date", "record_date"),
+    )
 
+
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an Idempotency-Key header, replayed on retries"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the request is in progress
+    resource_id = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+class Job(Base):
+    """Background job; see jobs.py"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    # Pending jobs with the same key can be cancelled together (e.g. an appointment's reminder)
+    dedupe_key = Column(String(255), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # The worker's poll: due queued jobs in run_at order
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index("ix_jobs_dedupe_key", "dedupe_key"),
+    )
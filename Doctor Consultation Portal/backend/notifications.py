@@ -0,0 +1,176 @@
+"""
+Real-time appointment notifications
+An in-process pub/sub bus feeds Server-Sent Events streams, so dashboards
+learn about bookings, status changes and cancellations as they happen
+instead of re-fetching their appointment lists.
+
+Each subscriber has a small bounded queue. A consumer too slow to keep up
+never holds up publishers or grows memory: when its queue is full, the queued
+events are replaced by a single "resync" event, which tells the client to
+re-fetch its list once. An idle stream costs one queue and one suspended
+coroutine, plus a comment line every NOTIFY_HEARTBEAT seconds to keep proxies
+from closing it.
+
+The bus is per process: a stream only receives events published by the
+worker that serves it.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Iterable, Optional
+from auth import Principal
+from models import UserRole
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "64"))  # pending events per subscriber
+NOTIFY_HEARTBEAT = float(os.getenv("NOTIFY_HEARTBEAT", "20"))  # seconds between keep-alive comments
+NOTIFY_MAX_SUBSCRIBERS = int(os.getenv("NOTIFY_MAX_SUBSCRIBERS", "10000"))  # per worker
+RETRY_MS = 3000  # EventSource reconnect delay sent to clients
+
+class TooManySubscribers(Exception):
+    """Raised when the worker already holds NOTIFY_MAX_SUBSCRIBERS streams"""
+
+def channels_for(principal: Principal) -> tuple:
+    """Channels a user listens on: their own, their doctor profile's, and the admin feed"""
+    channels = [("user", principal.id)]
+    if principal.doctor_id:
+        channels.append(("doctor", principal.doctor_id))
+    if principal.role == UserRole.ADMIN:
+        channels.append(("admin",))
+    return tuple(channels)
+
+class Subscription:
+    __slots__ = ("channels", "queue", "loop", "dropped")
+
+    def __init__(self, channels: tuple, loop: asyncio.AbstractEventLoop):
+        self.channels = channels
+        self.queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+        self.loop = loop
+        self.dropped = 0
+
+    def deliver(self, event: dict):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    def deliver_many(self, events: list):
+        for event in events:
+            self.deliver(event)
+
+class NotificationBus:
+    def __init__(self, max_subscribers: int = NOTIFY_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, channels: tuple) -> Subscription:
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._count += 1
+            for channel in channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._count -= 1
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channels: Iterable[tuple], event: dict):
+        """Queue event for every subscriber of any of channels; safe to call from any thread"""
+        self.publish_many([(channels, event)])
+
+    def publish_many(self, items: Iterable[tuple]):
+        """Publish (channels, event) pairs, waking each subscriber's loop once for all of its events"""
+        batches = {}
+        with self._lock:
+            for channels, event in items:
+                event = {**event, "id": next(self._ids)}
+                targets = set()
+                for channel in channels:
+                    targets |= self._channels.get(channel, set())
+                if targets:
+                    self.published += 1
+                for subscription in targets:
+                    batches.setdefault(subscription, []).append(event)
+        if not batches:
+            return
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for subscription, events in batches.items():
+            if subscription.loop is current:
+                subscription.deliver_many(events)
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.deliver_many, events)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": self._count,
+                "channels": len(self._channels),
+                "published": self.published,
+                "resyncs": self.resyncs,
+            }
+
+bus = NotificationBus()
+
+def appointment_event(event_type: str, appointment, old_status=None) -> tuple:
+    """(channels, event) telling the patient, the doctor and admins about an appointment change"""
+    event = {
+        "type": event_type,
+        "appointment_id": appointment.id,
+        "patient_id": appointment.patient_id,
+        "doctor_id": appointment.doctor_id,
+        "appointment_date": appointment.appointment_date.isoformat(),
+        "status": appointment.status.value,
+        "at": datetime.utcnow().isoformat(),
+    }
+    if old_status is not None:
+        event["old_status"] = old_status.value
+    return (("user", appointment.patient_id), ("doctor", appointment.doctor_id), ("admin",)), event
+
+def publish_appointment(event_type: str, appointment, old_status=None):
+    """Notify the patient, the doctor and admins about an appointment change"""
+    bus.publish(*appointment_event(event_type, appointment, old_status))
+
+def _sse(event: dict) -> str:
+    event_id = event.get("id")
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+async def event_stream(subscription: Subscription, heartbeat: Optional[float] = None):
+    """SSE lines for one subscriber until the client disconnects"""
+    heartbeat = heartbeat or NOTIFY_HEARTBEAT
+    try:
+        yield f"retry: {RETRY_MS}\n" + _sse({"type": "connected", "channels": [":".join(map(str, c)) for c in subscription.channels]})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event["type"] == "resync":
+                bus.resyncs += 1
+            yield _sse(event)
+    finally:
+        bus.unsubscribe(subscription)
@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination
+Pages are fetched with WHERE (sort columns) < (last seen values) on indexed
+columns instead of OFFSET, so every page costs the same regardless of depth.
+List bodies stay plain JSON arrays; the next page's cursor is returned in the
+X-Next-Cursor response header and is absent on the last page.
+"""
+import base64
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: Optional[str] = None
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor)
+
+def encode_cursor(values: list) -> str:
+    encoded = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(encoded, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("cursor shape mismatch")
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in values]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def _after(columns, values, descending: bool):
+    # (c1, c2, ...) > (v1, v2, ...) expanded so MySQL can use the index range
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        step = column < value if descending else column > value
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+def keyset_page(query, columns, params: PageParams, descending: bool = False):
+    """
+    Apply the cursor filter, ordering and limit + 1 to a Query or Select ordered by
+    columns. The last column must be unique (normally the primary key) so the
+    ordering is total.
+    """
+    if params.cursor:
+        values = decode_cursor(params.cursor, len(columns))
+        query = query.filter(_after(columns, values, descending))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(params.limit + 1)
+
+def page_rows(rows: list, columns, params: PageParams, response: Response) -> list:
+    """Trim the extra row fetched by keyset_page and set the next cursor header"""
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows
+
+def paginate(query, columns, params: PageParams, response: Response, descending: bool = False):
+    rows = keyset_page(query, columns, params, descending).all()
+    return page_rows(rows, columns, params, response)
+
+def paginate_list(items: list, params: PageParams, response: Response) -> list:
+    """
+    Page an already ordered in-memory list (e.g. search results). The cursor
+    holds the offset, which is cheap here because nothing is read from the database.
+    """
+    offset = decode_cursor(params.cursor, 1)[0] if params.cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    page = items[offset:offset + params.limit]
+    if offset + params.limit < len(items):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([offset + params.limit])
+    return page
@@ -0,0 +1,167 @@
+"""
+Connection pool settings and telemetry
+Pool sizing, recycling and pre-ping policy come from DB_POOL_* environment
+variables. Each engine's pool records how long checkouts wait, connections in
+use and overflow (with peaks), timeouts, pings and invalidations, so pool
+sizing can be read off /api/admin/pool-stats instead of guessed.
+"""
+import os
+import threading
+import time as _time
+from collections import deque
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # seconds, -1 disables
+# Ping connections idle for longer than this on checkout; 0 pings every checkout, -1 never
+POOL_PRE_PING_AFTER = float(os.getenv("DB_POOL_PRE_PING_AFTER", "30"))
+WAIT_SAMPLES = 1000  # recent checkout waits kept for percentiles
+
+def engine_options(async_engine: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments for the configured pool"""
+    return {
+        "poolclass": TimedAsyncQueuePool if async_engine else TimedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING_AFTER == 0,
+    }
+
+class PoolTelemetry:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.peak_in_use = 0
+        self.peak_overflow = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def count(self, attr: str):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def record_usage(self, pool):
+        with self._lock:
+            self.peak_in_use = max(self.peak_in_use, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, max(pool.overflow(), 0))
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+
+            def pct(p):
+                return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000, 2) if waits else 0.0
+
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": getattr(pool, "_max_overflow", POOL_MAX_OVERFLOW),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "peak_in_use": self.peak_in_use,
+                "peak_overflow": self.peak_overflow,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "wait_ms_p50": pct(50),
+                "wait_ms_p99": pct(99),
+                "wait_ms_max": round(self.wait_max * 1000, 2),
+                "connects": self.connects,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+            }
+
+class _TimedPoolMixin:
+    """Times _do_get, i.e. waiting for a free connection or opening an overflow one"""
+    telemetry = None
+
+    def _do_get(self):
+        start = _time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.telemetry is not None:
+                self.telemetry.record_wait(_time.perf_counter() - start, timed_out=True)
+            raise
+        if self.telemetry is not None:
+            self.telemetry.record_wait(_time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting into the same telemetry
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def instrument(engine, name: str) -> PoolTelemetry:
+    """Attach telemetry and the idle pre-ping policy to a sync Engine (use .sync_engine for async)"""
+    telemetry = PoolTelemetry(name)
+    engine.pool.telemetry = telemetry
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        telemetry.count("connects")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = _time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if POOL_PRE_PING_AFTER > 0:
+            checked_in_at = connection_record.info.get("checked_in_at")
+            if checked_in_at is not None and _time.monotonic() - checked_in_at > POOL_PRE_PING_AFTER:
+                telemetry.count("pings")
+                try:
+                    engine.dialect.do_ping(dbapi_connection)
+                except Exception:
+                    telemetry.count("ping_failures")
+                    # The pool invalidates this connection and retries with a fresh one
+                    raise exc.DisconnectionError()
+        telemetry.record_usage(engine.pool)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        telemetry.count("invalidations")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        telemetry.count("soft_invalidations")
+
+    return telemetry
+
+def pool_stats(engine) -> dict:
+    telemetry = getattr(engine.pool, "telemetry", None)
+    if telemetry is None:
+        return {"status": engine.pool.status()}
+    return telemetry.snapshot(engine.pool)
@@ -0,0 +1,379 @@
+"""
+Per-request profiling and query instrumentation
+Every request records its wall time, SQL statement count and SQL time (from
+the engines' before/after_cursor_execute events), and time spent serializing
+the response. The figures are aggregated per route and served in Prometheus
+text format at /metrics. The slowest distinct statements are kept for
+/api/admin/slow-queries.
+
+With PROFILE_REQUESTS=true, a request sent with an X-Profile header runs
+under cProfile, or pyinstrument if it is installed and the header says
+"pyinstrument". PROFILE_SAMPLE_RATE profiles that fraction of all requests.
+The dump is kept in memory under the X-Profile-Id returned with the response,
+and Server-Timing breaks the request into db and serialize time. Only one
+request is profiled at a time. The profiler sees the event loop thread, so
+for sync endpoints the handler's own Python shows up as a wait on the
+threadpool; the SQL and serialization figures still cover it.
+"""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import threading
+import time as _time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+import fastapi.routing
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0..1, needs PROFILE_REQUESTS
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # profile dumps kept in memory
+PROFILE_SLOW_STATEMENTS = int(os.getenv("PROFILE_SLOW_STATEMENTS", "20"))
+DB_QUERY_HEADER = os.getenv("DB_QUERY_HEADER", "false").lower() == "true"
+QUERY_COUNT_HEADER = "X-DB-Queries"
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_LINES = 60  # functions listed in a cProfile dump
+
+class RequestStats:
+    """Figures for the request being served; shared with threadpool copies of its context"""
+    __slots__ = ("path", "queries", "sql_seconds", "serialize_seconds")
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+_current = ContextVar("request_stats", default=None)
+
+def current_stats():
+    return _current.get()
+
+@contextmanager
+def serialization():
+    """Count the enclosed block as response serialization (for bodies built outside response_model)"""
+    started = _time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += _time.perf_counter() - started
+
+# ---------- SQL ----------
+
+_PLACEHOLDER_RUN = re.compile(r"(%s|\?|%\(\w+\)s)(\s*,\s*(%s|\?|%\(\w+\)s))+")
+
+def _normalize(statement: str) -> str:
+    # Expanded IN lists differ only in length
+    return _PLACEHOLDER_RUN.sub(r"\1, ...", " ".join(statement.split()))[:500]
+
+class SlowStatements:
+    """The slowest distinct statements seen, by worst single execution"""
+
+    def __init__(self, size: int = PROFILE_SLOW_STATEMENTS):
+        self.size = size
+        self._entries = {}
+        self._floor = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, path: str):
+        # Unlocked pre-check: almost every statement is faster than the current top list
+        if seconds <= self._floor:
+            return
+        key = _normalize(statement)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["seconds"] >= seconds:
+                return
+            self._entries[key] = {"seconds": seconds, "path": path, "at": datetime.utcnow().isoformat(timespec="seconds")}
+            if len(self._entries) > self.size:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k]["seconds"])]
+            if len(self._entries) >= self.size:
+                self._floor = min(e["seconds"] for e in self._entries.values())
+
+    def top(self) -> list:
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        return [{"statement": statement, **entry, "seconds": round(entry["seconds"], 6)} for statement, entry in entries]
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._floor = 0.0
+
+slow_statements = SlowStatements()
+
+def instrument_queries(engine):
+    """Time every statement on a sync Engine (use .sync_engine for async) into the current request's stats"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(_time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed = _time.perf_counter() - started
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+        slow_statements.record(statement, elapsed, stats.path if stats is not None else "")
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        # A failed statement never reaches after_cursor_execute
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+# ---------- per-route metrics ----------
+
+class _RouteSeries:
+    __slots__ = ("count", "seconds", "buckets", "statuses", "queries", "sql_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.statuses = {}
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+class RouteMetrics:
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            series = self._series.get((method, route))
+            if series is None:
+                series = self._series[(method, route)] = _RouteSeries()
+            series.count += 1
+            series.seconds += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series.buckets[i] += 1
+                    break
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+            series.queries += stats.queries
+            series.sql_seconds += stats.sql_seconds
+            series.serialize_seconds += stats.serialize_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: (s.count, s.seconds, list(s.buckets), dict(s.statuses), s.queries, s.sql_seconds, s.serialize_seconds)
+                    for key, s in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+route_metrics = RouteMetrics()
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus(metrics: RouteMetrics = route_metrics) -> str:
+    """Prometheus text exposition (version 0.0.4) of the route metrics and slowest statements"""
+    snapshot = sorted(metrics.snapshot().items())
+    lines = [
+        "# HELP http_request_duration_seconds Request wall time by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), (count, seconds, buckets, _, _, _, _) in snapshot:
+        labels = f'method="{_label(method)}",route="{_label(route)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {seconds:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+    lines += ["# HELP http_requests_total Requests by route and status.", "# TYPE http_requests_total counter"]
+    for (method, route), (_, _, _, statuses, _, _, _) in snapshot:
+        for code, n in sorted(statuses.items()):
+            lines.append(f'http_requests_total{{method="{_label(method)}",route="{_label(route)}",status="{code}"}} {n}')
+
+    per_route = (
+        ("http_request_db_queries_total", "counter", "SQL statements executed by route.", 4, "{}"),
+        ("http_request_db_seconds_total", "counter", "Time spent in SQL statements by route.", 5, "{:.6f}"),
+        ("http_request_serialization_seconds_total", "counter", "Time spent serializing responses by route.", 6, "{:.6f}"),
+    )
+    for name, kind, help_text, index, fmt in per_route:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for (method, route), values in snapshot:
+            lines.append(f'{name}{{method="{_label(method)}",route="{_label(route)}"}} ' + fmt.format(values[index]))
+
+    lines += ["# HELP db_slow_statement_seconds Worst execution time of the slowest statements.",
+              "# TYPE db_slow_statement_seconds gauge"]
+    for entry in slow_statements.top():
+        lines.append(f'db_slow_statement_seconds{{statement="{_label(entry["statement"][:200])}"}} {entry["seconds"]}')
+    return "\n".join(lines) + "\n"
+
+# ---------- request profiles ----------
+
+class ProfileStore:
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile_id: int, summary: dict, dump: str):
+        with self._lock:
+            self._profiles[profile_id] = (summary, dump)
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def list(self) -> list:
+        with self._lock:
+            return [summary for summary, _ in reversed(self._profiles.values())]
+
+    def get(self, profile_id: int):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+profile_store = ProfileStore()
+
+class _CProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self) -> str:
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        return out.getvalue()
+
+class _Pyinstrument:
+    def __init__(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(async_mode="enabled")
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self) -> str:
+        self._profiler.stop()
+        return self._profiler.output_text(unicode=False, color=False)
+
+def _make_profiler(kind: str):
+    if kind == "pyinstrument":
+        try:
+            return _Pyinstrument()
+        except ImportError:
+            pass
+    return _CProfiler()
+
+# ---------- middleware ----------
+
+class ProfilingMiddleware:
+    """ASGI middleware recording RequestStats for every HTTP request"""
+
+    def __init__(self, app, metrics: RouteMetrics = route_metrics, store: ProfileStore = profile_store):
+        self.app = app
+        self.metrics = metrics
+        self.store = store
+        self._profiling = False
+
+    def _wants_profile(self, scope) -> str:
+        if not PROFILE_REQUESTS or self._profiling:
+            return None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value.decode("latin-1").strip().lower() or "cprofile"
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            return "cprofile"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["path"])
+        token = _current.set(stats)
+        status = 500
+        profile_kind = self._wants_profile(scope)
+        profiler, profile_id = None, None
+        if profile_kind:
+            self._profiling = True
+            profiler, profile_id = _make_profiler(profile_kind), self.store.next_id()
+        started = _time.perf_counter()
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = []
+                if DB_QUERY_HEADER:
+                    extra.append((b"x-db-queries", str(stats.queries).encode()))
+                if profile_id is not None:
+                    elapsed = _time.perf_counter() - started
+                    timing = (f"app;dur={elapsed * 1000:.1f}, db;dur={stats.sql_seconds * 1000:.1f};desc=\"{stats.queries} queries\", "
+                              f"serialize;dur={stats.serialize_seconds * 1000:.1f}")
+                    extra += [(b"x-profile-id", str(profile_id).encode()), (b"server-timing", timing.encode())]
+                if extra:
+                    message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        try:
+            if profiler:
+                profiler.start()
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            elapsed = _time.perf_counter() - started
+            route = scope.get("route")
+            # Route templates keep the label set bounded; unmatched paths share one series
+            template = getattr(route, "path", None) or "unmatched"
+            self.metrics.observe(scope["method"], template, status, elapsed, stats)
+            if profiler:
+                try:
+                    dump = profiler.stop()
+                finally:
+                    self._profiling = False
+                self.store.add(profile_id, {
+                    "id": profile_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": template,
+                    "status": status,
+                    "profiler": profile_kind if isinstance(profiler, _Pyinstrument) else "cprofile",
+                    "at": datetime.utcnow().isoformat(timespec="seconds"),
+                    "wall_ms": round(elapsed * 1000, 2),
+                    "db_queries": stats.queries,
+                    "db_ms": round(stats.sql_seconds * 1000, 2),
+                    "serialize_ms": round(stats.serialize_seconds * 1000, 2),
+                }, dump)
+            _current.reset(token)
+
+def install_serialization_timer():
+    """Count FastAPI's response_model serialization as serialization time"""
+    original = fastapi.routing.serialize_response
+    if getattr(original, "_profiled", False):
+        return
+
+    async def serialize_response(*args, **kwargs):
+        with serialization():
+            return await original(*args, **kwargs)
+
+    serialize_response._profiled = True
+    fastapi.routing.serialize_response = serialize_response
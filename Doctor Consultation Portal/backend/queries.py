@@ -0,0 +1,84 @@
+"""
+Eager-loading query builders
+Each builder loads exactly the relationships its response schema serializes,
+so a list costs a fixed number of SELECTs no matter how many rows it returns.
+The *_query builders are for sync Sessions, the *_select ones for AsyncSession.
+
+The *_rows_select builders are for the large lists: they select just the
+columns of the response schema, joined in one statement, and the matching
+RowShape turns each result row into the schema's (nested) dict without
+building ORM objects. Top-level columns keep their names, so keyset
+pagination reads them off the rows as it does off ORM objects.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased, joinedload
+from models import User, Doctor, Appointment, MedicalRecord
+from schemas import UserResponse, DoctorResponse, AppointmentResponse, MedicalRecordResponse
+
+# DoctorResponse nests user
+DOCTOR_LOAD = (joinedload(Doctor.user),)
+# AppointmentResponse nests patient and doctor (which nests user)
+APPOINTMENT_LOAD = (
+    joinedload(Appointment.patient),
+    joinedload(Appointment.doctor).joinedload(Doctor.user),
+)
+
+def doctor_query(db: Session):
+    return db.query(Doctor).options(*DOCTOR_LOAD)
+
+def appointment_query(db: Session):
+    return db.query(Appointment).options(*APPOINTMENT_LOAD)
+
+def doctor_select():
+    return select(Doctor).options(*DOCTOR_LOAD)
+
+def appointment_select():
+    return select(Appointment).options(*APPOINTMENT_LOAD)
+
+class RowShape:
+    """The columns a response schema needs, and how to rebuild its dict from a result row"""
+
+    def __init__(self, model, schema, nested: dict = None, prefix: str = "", computed: dict = None):
+        self.nested = nested or {}
+        computed = computed or {}
+        self.names = [name for name in schema.model_fields if name not in self.nested]
+        self.columns = [(computed[name] if name in computed else getattr(model, name)).label(prefix + name) for name in self.names]
+        for shape in self.nested.values():
+            self.columns += shape.columns
+
+    def build(self, row, start: int = 0):
+        end = start + len(self.names)
+        item = dict(zip(self.names, row[start:end]))
+        for field, shape in self.nested.items():
+            item[field], end = shape.build(row, end)
+        return item, end
+
+    def dicts(self, rows) -> list:
+        return [self.build(row)[0] for row in rows]
+
+PatientUser = aliased(User, name="patient_user")
+DoctorUser = aliased(User, name="doctor_user")
+
+USER_ROWS = RowShape(User, UserResponse)
+DOCTOR_ROWS = RowShape(Doctor, DoctorResponse, {"user": RowShape(DoctorUser, UserResponse, prefix="user__")})
+APPOINTMENT_ROWS = RowShape(Appointment, AppointmentResponse, {
+    "patient": RowShape(PatientUser, UserResponse, prefix="patient__"),
+    "doctor": RowShape(Doctor, DoctorResponse, {"user": RowShape(DoctorUser, UserResponse, prefix="doctor__user__")},
+                       prefix="doctor__"),
+})
+MEDICAL_RECORD_ROWS = RowShape(MedicalRecord, MedicalRecordResponse)
+
+def doctor_rows_select():
+    return select(*DOCTOR_ROWS.columns).join(DoctorUser, Doctor.user_id == DoctorUser.id)
+
+def active_doctor_rows_select():
+    return doctor_rows_select().where(DoctorUser.is_active == True, Doctor.is_available == True)
+
+def appointment_rows_select():
+    return (
+        select(*APPOINTMENT_ROWS.columns)
+        .select_from(Appointment)
+        .join(PatientUser, Appointment.patient_id == PatientUser.id)
+        .join(Doctor, Appointment.doctor_id == Doctor.id)
+        .join(DoctorUser, Doctor.user_id == DoctorUser.id)
+    )
@@ -0,0 +1,53 @@
+"""
+SQL statement counter
+Counts statements executed on an engine inside a block, e.g. to check that a
+list endpoint's query count does not grow with the number of rows:
+
+    with count_queries(engine) as counter:
+        client.get("/api/appointments", headers=headers)
+    assert counter.count <= 3
+
+Pass several engines to count them together, e.g. the sync engine and the
+async engine's sync_engine for an app that uses both. tests/test_query_counts.py
+uses assert_constant_queries on the list endpoints.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(*engines):
+    counter = QueryCounter()
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", counter._record)
+
+def assert_constant_queries(engines, run, sizes, prepare=None):
+    """
+    Call run(size) for each size and fail if the statement count differs,
+    i.e. if the endpoint fires extra queries per returned row (N+1).
+    prepare(size), if given, runs first and is not counted (e.g. to insert the rows).
+    """
+    engines = engines if isinstance(engines, (list, tuple)) else [engines]
+    counts = {}
+    for size in sizes:
+        if prepare is not None:
+            prepare(size)
+        with count_queries(*engines) as counter:
+            run(size)
+        counts[size] = counter.count
+    if len(set(counts.values())) > 1:
+        raise AssertionError(f"Query count grows with result size: {counts}")
+    return counts
@@ -0,0 +1,218 @@
+"""
+Read-replica routing
+GET endpoints that only read take their session from get_read_db /
+get_async_read_db (or get_async_listing_db for the public doctor listings).
+Those sessions go to REPLICA_DATABASE_URL when it is configured and healthy,
+and to the primary otherwise. Everything else stays on the primary.
+
+Read-your-writes: after a user's successful POST/PUT/PATCH/DELETE, their reads
+go to the primary for READ_YOUR_WRITES_SECONDS, so a patient sees the booking
+they just made. Doctor changes do the same for the public listings.
+The window is kept per process, like the response cache's lru backend.
+
+The replica is checked every REPLICA_CHECK_INTERVAL seconds. It is used only
+while its last check succeeded, is recent, and showed at most
+REPLICA_MAX_LAG seconds of lag. Lag comes from REPLICA_LAG_QUERY if set
+(e.g. a pt-heartbeat table), else SHOW REPLICA STATUS on MySQL. A server
+that is not replicating at all (a second local database in development)
+counts as 0 lag. A connection error on the replica routes reads back to the
+primary until the next good check.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time as _time
+from typing import Optional
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from auth import Principal, get_current_user
+from database import SessionLocal, ReplicaSessionLocal, async_session, get_replica_engine, get_async_replica_engine
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_LAG_QUERY = os.getenv("REPLICA_LAG_QUERY")
+# Scope key for the public doctor listings
+DOCTOR_LISTINGS = "doctors"
+
+logger = logging.getLogger(__name__)
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+class RecentWrites:
+    """Keys (users, scopes) that wrote recently, each until its window closes"""
+
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS):
+        self.window = window
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def mark(self, key: str):
+        now = _time.monotonic()
+        with self._lock:
+            if len(self._until) > 10000:
+                self._until = {k: t for k, t in self._until.items() if t > now}
+            self._until[key] = now + self.window
+
+    def active(self, key: str) -> bool:
+        until = self._until.get(key)
+        return until is not None and until > _time.monotonic()
+
+class ReplicaMonitor:
+    def __init__(self, max_lag: float = REPLICA_MAX_LAG, interval: float = REPLICA_CHECK_INTERVAL,
+                 lag_query: Optional[str] = REPLICA_LAG_QUERY):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag_query = lag_query
+        self.state = "unknown"
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.checks = 0
+        self.failures = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._task = None
+        self._instrumented = set()
+
+    @property
+    def configured(self) -> bool:
+        return get_replica_engine() is not None
+
+    @property
+    def usable(self) -> bool:
+        return (
+            self.state == "healthy"
+            and self.checked_at is not None
+            and _time.monotonic() - self.checked_at < 3 * self.interval
+        )
+
+    def _measure(self) -> float:
+        with get_replica_engine().connect() as conn:
+            if self.lag_query:
+                lag = conn.execute(text(self.lag_query)).scalar()
+            elif conn.dialect.name == "mysql":
+                try:
+                    row = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+                except Exception:
+                    # MySQL before 8.0.22
+                    row = conn.execute(text("SHOW SLAVE STATUS")).mappings().first()
+                if row is None:
+                    return 0.0  # not a replica at all
+                lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+                if lag is None:
+                    raise RuntimeError("replication is not running")
+            else:
+                conn.execute(text("SELECT 1"))
+                lag = 0
+            return float(lag or 0)
+
+    def check(self):
+        """Measure the replica's lag now and update the routing state"""
+        self.checks += 1
+        try:
+            self.lag = self._measure()
+        except Exception as e:
+            self.failures += 1
+            if self.state != "down":
+                logger.warning("Read replica unavailable, reading from the primary: %s", e)
+            self.state, self.error = "down", f"{type(e).__name__}: {e}"[:300]
+        else:
+            self.state = "healthy" if self.lag <= self.max_lag else "lagging"
+            self.error = None
+        self.checked_at = _time.monotonic()
+
+    def connection_failed(self, context):
+        # handle_error hook on the replica engines
+        if context.is_disconnect or context.connection is None:
+            self.state, self.error = "down", f"{type(context.original_exception).__name__}: {context.original_exception}"[:300]
+
+    def _instrument(self, engine):
+        if engine is not None and id(engine) not in self._instrumented:
+            event.listen(engine, "handle_error", self.connection_failed)
+            self._instrumented.add(id(engine))
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.configured:
+            self._instrument(get_replica_engine())
+            async_engine = get_async_replica_engine()
+            self._instrument(async_engine.sync_engine if async_engine is not None else None)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        if not self.configured:
+            return {"state": "disabled"}
+        return {
+            "state": self.state, "usable": self.usable, "lag_seconds": self.lag, "max_lag_seconds": self.max_lag,
+            "error": self.error, "checks": self.checks, "failures": self.failures,
+            "replica_reads": self.replica_reads, "primary_reads": self.primary_reads,
+        }
+
+recent_writes = RecentWrites()
+replica_monitor = ReplicaMonitor()
+
+def use_replica(*keys: str) -> bool:
+    """Whether a read for these users/scopes may go to the replica, counting the decision"""
+    replica = replica_monitor.usable and not any(recent_writes.active(k) for k in keys)
+    if replica:
+        replica_monitor.replica_reads += 1
+    else:
+        replica_monitor.primary_reads += 1
+    return replica
+
+def read_sessions(*keys: str):
+    """Sync session factory for a read on behalf of these users/scopes"""
+    return ReplicaSessionLocal if use_replica(*keys) else SessionLocal
+
+def get_read_db(current_user: Principal = Depends(get_current_user)):
+    db: Session = read_sessions(user_key(current_user.id))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(current_user: Principal = Depends(get_current_user)):
+    async with async_session(replica=use_replica(user_key(current_user.id))) as db:
+        yield db
+
+async def get_async_listing_db():
+    async with async_session(replica=use_replica(DOCTOR_LISTINGS)) as db:
+        yield db
+
+class ReadYourWritesMiddleware:
+    """Opens the read-your-writes window for the user behind each successful write"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # Set by auth.get_current_user
+                user_id = scope.get("state", {}).get("user_id")
+                if user_id is not None:
+                    recent_writes.mark(user_key(user_id))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,205 @@
+"""
+Response cache with ETags
+Caches the serialized JSON body of read-heavy public endpoints, keyed by their
+normalized query parameters. Every body gets a strong ETag (a hash of the
+bytes). A request whose If-None-Match matches that ETag gets 304 Not Modified
+with no body.
+
+Invalidation is by generation: each namespace has a counter that is part of
+every cache key. A doctor write bumps the counter, so all cached listings miss
+at once and old entries age out of the backend. The LRU backend is
+per-process. In that case RESPONSE_CACHE_TTL bounds how stale another worker's
+entries can get. The Redis backend shares both the entries and the counter
+across workers. It speaks the plain GET/SET/INCR protocol, so any
+Redis-compatible server works. Its calls run in a worker thread so a slow
+server does not hold up the event loop. If the backend fails, the request is
+answered uncached.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time as _time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "lru")  # lru | redis | none
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # entries (lru)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+# Clients may keep the body but must revalidate with If-None-Match before reuse
+CACHE_CONTROL = "no-cache"
+
+logger = logging.getLogger(__name__)
+
+# ---------- backends ----------
+
+class LRUBackend:
+    """In-process LRU with per-entry expiry"""
+
+    blocking = False  # called directly on the event loop
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if _time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, _time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+class RedisBackend:
+    """Shared cache on a Redis-compatible server (requires the redis package)"""
+
+    blocking = True  # network round trips; called from a worker thread
+
+    def __init__(self, url: str = RESPONSE_CACHE_URL, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(key, value, ex=ttl)
+
+    def counter(self, key: str) -> int:
+        value = self.client.get(key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+def make_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == "none":
+        return None
+    if name == "redis":
+        return RedisBackend()
+    if name == "lru":
+        return LRUBackend()
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {name}")
+
+# ---------- ETags ----------
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+def _pack(body: bytes, headers: dict) -> bytes:
+    return json.dumps(headers, separators=(",", ":")).encode("utf-8") + b"\n" + body
+
+def _unpack(value: bytes) -> Tuple[bytes, dict]:
+    meta, body = value.split(b"\n", 1)
+    return body, json.loads(meta)
+
+# ---------- cache ----------
+
+class ResponseCache:
+    def __init__(self, namespace: str, backend=None, ttl: int = RESPONSE_CACHE_TTL):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def _call(self, method: str, *args):
+        fn = getattr(self.backend, method)
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _key(self, params: dict) -> str:
+        generation = await self._call("counter", f"{self.namespace}:generation")
+        normalized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return f"{self.namespace}:{generation}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+    def invalidate(self):
+        if self.backend is None:
+            return
+        try:
+            self.backend.incr(f"{self.namespace}:generation")
+        except Exception as e:
+            # Entries cached before this write may be served until RESPONSE_CACHE_TTL
+            logger.warning("Response cache unavailable, could not invalidate %s: %s", self.namespace, e)
+
+    async def respond(self, request: Request, params: dict,
+                      build: Callable[[], Awaitable[Tuple[bytes, dict]]]) -> Response:
+        """
+        Answer from the cache, or await build() for (JSON body, extra headers) and cache
+        the result. Either way the response carries a strong ETag and becomes a 304 when
+        the client already holds that version.
+        """
+        key = cached = None
+        if self.backend is not None:
+            try:
+                key = await self._key(params)
+                cached = await self._call("get", key)
+            except Exception as e:
+                logger.warning("Response cache unavailable, answering uncached: %s", e)
+                key = None
+        if cached is not None:
+            self.hits += 1
+            body, headers = _unpack(cached)
+        else:
+            self.misses += 1
+            body, headers = await build()
+            headers = {**headers, "ETag": strong_etag(body), "Cache-Control": CACHE_CONTROL}
+            if key:
+                try:
+                    await self._call("set", key, _pack(body, headers), self.ttl)
+                except Exception as e:
+                    logger.warning("Response cache unavailable, could not store %s: %s", key, e)
+
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+_backend = make_backend()
+doctor_cache = ResponseCache("doctors", _backend)
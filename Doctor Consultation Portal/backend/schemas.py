@@ -1,7 +1,8 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
-from typing import Optional, List
-from datetime import datetime, time
-from models import UserRole, AppointmentStatus, ConsultationType
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
+from typing import Optional, List, Dict
+from datetime import date, datetime, time
+from models import UserRole, AppointmentStatus, ConsultationType, JobStatus, AvailabilityKind
+import json
 import re
 
 # User Schemas
@@ -62,6 +63,11 @@ class DoctorResponse(DoctorBase):
     created_at: datetime
     user: UserResponse
 
+class DoctorSearchResponse(BaseModel):
+    total: int
+    facets: Dict[str, Dict[str, int]]
+    results: List[DoctorResponse]
+
 # Appointment Schemas
 class AppointmentBase(BaseModel):
     appointment_date: datetime
@@ -82,6 +88,95 @@ class AppointmentResponse(AppointmentBase):
     patient: UserResponse
     doctor: DoctorResponse
 
+class AppointmentBulkStatus(BaseModel):
+    """New status for the listed appointments, or for those in [date_from, date_to)"""
+    status: AppointmentStatus
+    appointment_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    doctor_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    
+    @model_validator(mode="after")
+    def check_selection(self):
+        by_filter = self.date_from is not None or self.date_to is not None or self.doctor_id is not None
+        if self.appointment_ids is not None and by_filter:
+            raise ValueError("Give appointment_ids or a doctor_id/date range, not both")
+        if self.appointment_ids is None and (self.date_from is None or self.date_to is None):
+            raise ValueError("Give appointment_ids, or date_from and date_to")
+        if self.date_from is not None and self.date_to <= self.date_from:
+            raise ValueError("date_to must be after date_from")
+        return self
+
+class AppointmentBulkResult(BaseModel):
+    id: int
+    result: str  # updated, unchanged, skipped, forbidden, not_found
+    detail: Optional[str] = None
+
+class AppointmentBulkStatusResponse(BaseModel):
+    updated: int
+    results: List[AppointmentBulkResult]
+
+# Slot Schemas
+class SlotResponse(BaseModel):
+    start: datetime
+    end: datetime
+    available: bool
+
+class DoctorSlotsResponse(BaseModel):
+    doctor_id: int
+    day: date
+    slot_minutes: int
+    is_available: bool
+    slots: List[SlotResponse]
+
+# Availability Schemas
+class WeeklyHoursBase(BaseModel):
+    weekday: int = Field(..., ge=0, le=6)  # 0 = Monday
+    start_time: time
+    end_time: time
+    
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class WeeklyHoursResponse(WeeklyHoursBase):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+
+class AvailabilityExceptionCreate(BaseModel):
+    kind: AvailabilityKind = AvailabilityKind.UNAVAILABLE
+    start_date: date
+    end_date: Optional[date] = None  # defaults to start_date
+    start_time: Optional[time] = None  # both omitted = the whole day
+    end_time: Optional[time] = None
+    reason: Optional[str] = Field(None, max_length=255)
+    
+    @model_validator(mode="after")
+    def check_ranges(self):
+        if self.end_date is None:
+            self.end_date = self.start_date
+        if self.end_date < self.start_date:
+            raise ValueError("end_date must not be before start_date")
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValueError("Give both start_time and end_time, or neither for whole days")
+        if self.start_time is not None and self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class AvailabilityExceptionResponse(AvailabilityExceptionCreate):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    doctor_id: int
+    created_at: datetime
+
+class DoctorAvailabilityResponse(BaseModel):
+    weekly_hours: List[WeeklyHoursResponse]
+    exceptions: List[AvailabilityExceptionResponse]
+
 # Consultation Schemas
 class ConsultationBase(BaseModel):
     consultation_type: ConsultationType
@@ -122,6 +217,18 @@ class MedicalRecordResponse(MedicalRecordBase):
     record_date: datetime
     created_at: datetime
 
+class MedicalRecordSummary(BaseModel):
+    """A timeline entry; the full record is GET /api/medical-records/{id}"""
+    id: int
+    patient_id: int
+    doctor_id: Optional[int] = None
+    appointment_id: Optional[int] = None
+    record_date: datetime
+    summary: Optional[str] = None
+    has_prescription: bool
+    has_test_results: bool
+    has_notes: bool
+
 # Search Schemas
 class DoctorSearch(BaseModel):
     specialization: Optional[str] = None
@@ -129,3 +236,22 @@ class DoctorSearch(BaseModel):
     available_from: Optional[datetime] = None
     available_to: Optional[datetime] = None
 
+# Job Schemas
+class JobResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    kind: str
+    payload: dict
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    @field_validator("payload", mode="before")
+    @classmethod
+    def parse_payload(cls, v):
+        return json.loads(v) if isinstance(v, str) else v
@@ -0,0 +1,299 @@
+"""
+In-process doctor search index
+Inverted index over specialization, location, qualification and bio with
+prefix and one-typo fuzzy matching, facet counts and fee/experience sorting.
+Doctor writes update the index incrementally; after SEARCH_INDEX_TTL seconds
+the next search rebuilds it from the database, which bounds staleness from
+writes made by other workers.
+"""
+import bisect
+import os
+import re
+import threading
+import time as _time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy.orm import Session
+from models import User, Doctor
+
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))  # seconds
+SEARCH_FIELDS = ("specialization", "location", "qualification", "bio")
+FACET_FIELDS = ("specialization", "location")
+FUZZY_MIN_LENGTH = 4  # shorter terms only match exactly or by prefix
+SORT_KEYS = {
+    "id": None,
+    "fee": "consultation_fee",
+    "experience": "experience_years",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> list:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+def _deletes(token: str) -> set:
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Levenshtein distance <= 1, also allowing one adjacent transposition"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diffs = [i for i in range(la) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return len(diffs) == 2 and diffs[1] == diffs[0] + 1 \
+            and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+    if la > lb:
+        a, b = b, a
+    # b is one character longer than a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+@dataclass
+class DoctorDoc:
+    id: int
+    user_id: int
+    specialization: str
+    location: str
+    qualification: str
+    bio: Optional[str]
+    consultation_fee: float
+    experience_years: int
+    is_available: bool
+    user_active: bool
+
+    @property
+    def visible(self) -> bool:
+        return self.is_available and self.user_active
+
+class FieldIndex:
+    """Token -> doctor ids for one field, with a sorted vocabulary for prefix lookups"""
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self._vocab = None
+        self._fuzzy = None
+
+    def add(self, doc_id: int, text: Optional[str]):
+        for token in set(tokenize(text)):
+            if token not in self.postings:
+                self._vocab = self._fuzzy = None
+            self.postings[token].add(doc_id)
+
+    def remove(self, doc_id: int, text: Optional[str]):
+        for token in set(tokenize(text)):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(doc_id)
+            if not ids:
+                del self.postings[token]
+                self._vocab = self._fuzzy = None
+
+    def _vocabulary(self) -> list:
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        return self._vocab
+
+    def _fuzzy_map(self) -> dict:
+        # Deletion neighbourhood: every token under itself and each one-char deletion
+        if self._fuzzy is None:
+            fuzzy = defaultdict(set)
+            for token in self.postings:
+                fuzzy[token].add(token)
+                for variant in _deletes(token):
+                    fuzzy[variant].add(token)
+            self._fuzzy = fuzzy
+        return self._fuzzy
+
+    def match(self, term: str) -> set:
+        """Ids of docs with a token that starts with term, or is one typo away from it"""
+        vocab = self._vocabulary()
+        ids = set()
+        i = bisect.bisect_left(vocab, term)
+        while i < len(vocab) and vocab[i].startswith(term):
+            ids |= self.postings[vocab[i]]
+            i += 1
+        if not ids and len(term) >= FUZZY_MIN_LENGTH:
+            fuzzy = self._fuzzy_map()
+            candidates = set(fuzzy.get(term, ()))
+            for variant in _deletes(term):
+                candidates |= fuzzy.get(variant, set())
+            for token in candidates:
+                if _within_one_edit(term, token):
+                    ids |= self.postings[token]
+        return ids
+
+class DoctorSearchIndex:
+    def __init__(self, ttl: float = SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_at = None
+
+    def _reset(self):
+        self._docs = {}
+        self._fields = {field: FieldIndex() for field in SEARCH_FIELDS}
+        # facet field -> value -> ids, so facet counts are set intersections
+        self._facets = {field: defaultdict(set) for field in FACET_FIELDS}
+        # unavailable doctors and doctors whose account is disabled
+        self._hidden = set()
+        self._orders = {}
+
+    # ---------- loading ----------
+
+    def _ensure_loaded(self, db: Session):
+        with self._lock:
+            if self._loaded_at is not None and _time.monotonic() - self._loaded_at < self.ttl:
+                return
+        self.rebuild(db)
+
+    def rebuild(self, db: Session):
+        rows = db.query(
+            Doctor.id, Doctor.user_id, Doctor.specialization, Doctor.location,
+            Doctor.qualification, Doctor.bio, Doctor.consultation_fee,
+            Doctor.experience_years, Doctor.is_available, User.is_active
+        ).join(User, Doctor.user_id == User.id).all()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(DoctorDoc(*row))
+            self._loaded_at = _time.monotonic()
+
+    def invalidate(self):
+        """Rebuild from the database on the next search, e.g. after a bulk import"""
+        with self._lock:
+            self._loaded_at = None
+
+    # ---------- incremental updates ----------
+
+    def _add(self, doc: DoctorDoc):
+        self._docs[doc.id] = doc
+        for field in SEARCH_FIELDS:
+            self._fields[field].add(doc.id, getattr(doc, field))
+        for field in FACET_FIELDS:
+            self._facets[field][getattr(doc, field)].add(doc.id)
+        if not doc.visible:
+            self._hidden.add(doc.id)
+
+    def _remove(self, doctor_id: int):
+        doc = self._docs.pop(doctor_id, None)
+        if doc is not None:
+            for field in SEARCH_FIELDS:
+                self._fields[field].remove(doc.id, getattr(doc, field))
+            for field in FACET_FIELDS:
+                values = self._facets[field]
+                ids = values[getattr(doc, field)]
+                ids.discard(doc.id)
+                if not ids:
+                    del values[getattr(doc, field)]
+            self._hidden.discard(doc.id)
+
+    def upsert(self, doctor: Doctor, user_active: bool = True):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # built on first search
+            self._remove(doctor.id)
+            self._add(DoctorDoc(
+                id=doctor.id, user_id=doctor.user_id, specialization=doctor.specialization,
+                location=doctor.location, qualification=doctor.qualification, bio=doctor.bio,
+                consultation_fee=doctor.consultation_fee, experience_years=doctor.experience_years,
+                is_available=bool(doctor.is_available), user_active=user_active
+            ))
+            self._orders = {}
+
+    def remove(self, doctor_id: int):
+        with self._lock:
+            self._remove(doctor_id)
+            self._orders = {}
+
+    def set_availability(self, doctor_id: int, is_available: bool):
+        with self._lock:
+            doc = self._docs.get(doctor_id)
+            if doc is not None:
+                doc.is_available = is_available
+                self._update_visibility(doc)
+
+    def set_user_active(self, user_id: int, is_active: bool):
+        with self._lock:
+            for doc in self._docs.values():
+                if doc.user_id == user_id:
+                    doc.user_active = is_active
+                    self._update_visibility(doc)
+
+    def _update_visibility(self, doc: DoctorDoc):
+        if doc.visible:
+            self._hidden.discard(doc.id)
+        else:
+            self._hidden.add(doc.id)
+
+    # ---------- queries ----------
+
+    def _order(self, sort: str) -> list:
+        """Doctor ids ordered by the sort key (prefix '-' for descending), id breaking ties"""
+        order = self._orders.get(sort)
+        if order is None:
+            attr = SORT_KEYS[sort.lstrip("-")]
+            descending = sort.startswith("-")
+            if attr is None:
+                order = sorted(self._docs, reverse=descending)
+            else:
+                sign = -1 if descending else 1
+                order = sorted(self._docs, key=lambda i: (sign * getattr(self._docs[i], attr), i))
+            self._orders[sort] = order
+        return order
+
+    def _match_terms(self, text: Optional[str], fields) -> Optional[set]:
+        """Docs matching every term of text in any of fields; None when text has no terms"""
+        matched = None
+        for term in tokenize(text):
+            ids = set()
+            for field in fields:
+                ids |= self._fields[field].match(term)
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                break
+        return matched
+
+    def search(self, db: Session, q: Optional[str] = None, specialization: Optional[str] = None,
+               location: Optional[str] = None, sort: str = "id", include_unavailable: bool = False):
+        """Return (ordered doctor ids, facet counts) for the matching doctors"""
+        self._ensure_loaded(db)
+        with self._lock:
+            matched = None
+            for text, fields in ((q, SEARCH_FIELDS), (specialization, ("specialization",)), (location, ("location",))):
+                ids = self._match_terms(text, fields)
+                if ids is not None:
+                    matched = ids if matched is None else matched & ids
+
+            if matched is None:
+                matched = set(self._docs)
+            if not include_unavailable:
+                matched = matched - self._hidden
+
+            order = self._order(sort)
+            if len(matched) < len(order) // 8:
+                # Small result: sorting it directly beats scanning the full order
+                key_attr = SORT_KEYS[sort.lstrip("-")]
+                sign = -1 if sort.startswith("-") else 1
+                if key_attr is None:
+                    ids = sorted(matched, reverse=sign < 0)
+                else:
+                    ids = sorted(matched, key=lambda i: (sign * getattr(self._docs[i], key_attr), i))
+            else:
+                ids = [i for i in order if i in matched]
+
+            facets = {}
+            for field in FACET_FIELDS:
+                counts = Counter({value: len(value_ids & matched) for value, value_ids in self._facets[field].items()})
+                facets[field] = {value: count for value, count in counts.most_common() if count}
+        return ids, facets
+
+doctor_index = DoctorSearchIndex()
@@ -0,0 +1,47 @@
+"""
+Appointment slots
+Appointments are SLOT_MINUTES long. Booking checks for an overlapping active
+appointment with slot_taken, an indexed query run under the doctor row
+lock, so it always sees the committed state. The cached view of free slots
+for listings is availability.py.
+
+This replaces the original per-doctor in-memory interval engine. Its cache
+was per worker, so booking could not trust it and re-checked the database
+anyway. The overlap check is a range seek on the (doctor_id,
+appointment_date, status) index, which is logarithmic in the number of
+appointments. Free slots for a doctor's day come from the availability
+calendar's bitmaps.
+"""
+import os
+from datetime import datetime, time, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import Appointment, AppointmentStatus
+
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "30"))
+
+# Statuses that occupy a slot
+ACTIVE_STATUSES = (AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED)
+
+def _naive(dt: datetime) -> datetime:
+    # MySQL stores wall-clock time, so compare without tzinfo
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+def _minutes(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+def overlap_select(doctor_id: int, when: datetime):
+    """Active appointments of the doctor that overlap the slot starting at `when`"""
+    when = _naive(when)
+    length = timedelta(minutes=SLOT_MINUTES)
+    # Served by the (doctor_id, appointment_date, status) index
+    return select(Appointment.id).where(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_date > when - length,
+        Appointment.appointment_date < when + length,
+        Appointment.status.in_(ACTIVE_STATUSES)
+    )
+
+def slot_taken(db: Session, doctor_id: int, when: datetime) -> bool:
+    """Whether an active appointment of the doctor overlaps the slot starting at `when`"""
+    return db.execute(overlap_select(doctor_id, when).limit(1)).first() is not None
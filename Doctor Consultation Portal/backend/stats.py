@@ -0,0 +1,149 @@
+"""
+Admin statistics counter cache
+Counts are loaded with a few grouped aggregate queries, then kept current by
+the write paths (register, doctor create/delete, appointment create/status
+change). After STATS_TTL seconds the next read does a full recount, which
+bounds drift from writes made by other workers.
+"""
+import os
+import threading
+import time as _time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models import User, Doctor, Appointment, AppointmentStatus
+
+STATS_TTL = float(os.getenv("STATS_TTL", "300"))  # seconds
+
+def _day(when: datetime) -> date:
+    return when.date() if isinstance(when, datetime) else when
+
+class StatsCache:
+    def __init__(self, ttl: float = STATS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._users = 0
+        self._doctors = 0
+        self._by_status = Counter()
+        self._by_doctor = defaultdict(Counter)
+        self._by_day = defaultdict(Counter)
+
+    # ---------- reads ----------
+
+    def _ensure_fresh(self, db: Session):
+        with self._lock:
+            if self._loaded_at is not None and _time.monotonic() - self._loaded_at < self.ttl:
+                return
+        self.recount(db)
+
+    def recount(self, db: Session):
+        """Full recount: one query for the table totals, two grouped queries for appointments"""
+        users, doctors = db.execute(select(
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(Doctor.id)).scalar_subquery()
+        )).one()
+        by_doctor_rows = db.query(
+            Appointment.doctor_id, Appointment.status, func.count(Appointment.id)
+        ).group_by(Appointment.doctor_id, Appointment.status).all()
+        day = func.date(Appointment.appointment_date)
+        by_day_rows = db.query(day, Appointment.status, func.count(Appointment.id)).group_by(day, Appointment.status).all()
+
+        by_status = Counter()
+        by_doctor = defaultdict(Counter)
+        for doctor_id, appointment_status, count in by_doctor_rows:
+            by_status[appointment_status] += count
+            by_doctor[doctor_id][appointment_status] += count
+        by_day = defaultdict(Counter)
+        for appointment_day, appointment_status, count in by_day_rows:
+            # SQLite returns DATE() as a string
+            if isinstance(appointment_day, str):
+                appointment_day = date.fromisoformat(appointment_day)
+            by_day[appointment_day][appointment_status] += count
+
+        with self._lock:
+            self._users, self._doctors = users, doctors
+            self._by_status, self._by_doctor, self._by_day = by_status, by_doctor, by_day
+            self._loaded_at = _time.monotonic()
+
+    def summary(self, db: Session) -> dict:
+        self._ensure_fresh(db)
+        with self._lock:
+            return {
+                "total_users": self._users,
+                "total_doctors": self._doctors,
+                "total_appointments": sum(self._by_status.values()),
+                "pending_appointments": self._by_status[AppointmentStatus.PENDING],
+                "completed_appointments": self._by_status[AppointmentStatus.COMPLETED],
+                "appointments_by_status": self._status_dict(self._by_status)
+            }
+
+    def per_doctor(self, db: Session) -> list:
+        self._ensure_fresh(db)
+        with self._lock:
+            return [
+                {"doctor_id": doctor_id, "total": sum(counts.values()), **self._status_dict(counts)}
+                for doctor_id, counts in sorted(self._by_doctor.items())
+                if sum(counts.values())
+            ]
+
+    def per_day(self, db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None) -> list:
+        self._ensure_fresh(db)
+        with self._lock:
+            return [
+                {"day": day, "total": sum(counts.values()), **self._status_dict(counts)}
+                for day, counts in sorted(self._by_day.items())
+                if (date_from is None or day >= date_from) and (date_to is None or day <= date_to)
+                and sum(counts.values())
+            ]
+
+    @staticmethod
+    def _status_dict(counts: Counter) -> dict:
+        return {s.value: counts[s] for s in AppointmentStatus}
+
+    # ---------- incremental updates ----------
+
+    def user_created(self):
+        with self._lock:
+            self._users += 1
+
+    def doctor_created(self):
+        with self._lock:
+            self._doctors += 1
+
+    def doctor_deleted(self):
+        with self._lock:
+            self._doctors -= 1
+
+    def appointment_created(self, doctor_id: int, when: datetime, new_status: AppointmentStatus):
+        with self._lock:
+            self._by_status[new_status] += 1
+            self._by_doctor[doctor_id][new_status] += 1
+            self._by_day[_day(when)][new_status] += 1
+
+    def appointment_status_changed(self, doctor_id: int, when: datetime,
+                                   old_status: AppointmentStatus, new_status: AppointmentStatus):
+        if old_status == new_status:
+            return
+        with self._lock:
+            for counts in (self._by_status, self._by_doctor[doctor_id], self._by_day[_day(when)]):
+                counts[old_status] -= 1
+                counts[new_status] += 1
+
+    def appointments_status_changed(self, changes):
+        """Batch of (doctor_id, when, old_status, new_status), applied under one lock"""
+        with self._lock:
+            for doctor_id, when, old_status, new_status in changes:
+                if old_status == new_status:
+                    continue
+                for counts in (self._by_status, self._by_doctor[doctor_id], self._by_day[_day(when)]):
+                    counts[old_status] -= 1
+                    counts[new_status] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+stats_cache = StatsCache()
@@ -0,0 +1,49 @@
+"""
+Appointment jobs
+Handlers for the job queue (jobs.py), and the helpers that request handlers
+call to schedule or cancel them in the same transaction as the appointment
+change.
+
+Reminders go out REMINDER_LEAD_HOURS before the appointment as an
+"appointment.reminder" notification. The handler re-reads the appointment, so
+one that was cancelled or completed in the meantime gets no reminder even if
+its job was not cancelled. Like every notification it goes out on the
+in-process bus (notifications.py) of the worker that runs the job, so with
+several API workers only the streams connected to that worker receive it.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from database import SessionLocal
+from jobs import enqueue, cancel_pending, job_handler
+from models import Appointment, Job
+from notifications import publish_appointment
+from slots import ACTIVE_STATUSES, _naive
+
+REMINDER_LEAD = timedelta(hours=float(os.getenv("REMINDER_LEAD_HOURS", "24")))
+
+def reminder_key(appointment_id: int) -> str:
+    return f"appointment.reminder:{appointment_id}"
+
+def schedule_reminder(db, appointment: Appointment) -> Optional[Job]:
+    """Enqueue the reminder for appointment; nothing when its reminder time has already passed"""
+    # Compared as wall-clock time, like the slot checks; a tz-aware date would not compare with now()
+    run_at = _naive(appointment.appointment_date) - REMINDER_LEAD
+    if run_at <= datetime.now():
+        return None
+    return enqueue(
+        db, "appointment.reminder", {"appointment_id": appointment.id},
+        run_at=run_at, dedupe_key=reminder_key(appointment.id)
+    )
+
+def cancel_reminder(*appointment_ids: int):
+    """Statement cancelling the appointments' pending reminders; execute it in the caller's transaction"""
+    return cancel_pending(*(reminder_key(i) for i in appointment_ids))
+
+@job_handler("appointment.reminder")
+def send_reminder(payload: dict):
+    with SessionLocal() as db:
+        appointment = db.get(Appointment, payload["appointment_id"])
+        if appointment is None or appointment.status not in ACTIVE_STATUSES:
+            return
+        publish_appointment("appointment.reminder", appointment)
@@ -0,0 +1,94 @@
+"""
+Test fixtures
+The suite runs the app in-process on a throwaway SQLite database (the same
+stand-in the benchmarks use), so it needs no MySQL:
+
+    cd backend && python -m pytest tests
+
+Each test starts from empty tables and empty in-process caches.
+"""
+import os
+import sys
+import tempfile
+from datetime import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Read at import time by database.py, hashing.py and jobs.py
+_db_file = os.path.join(tempfile.mkdtemp(prefix="dcp-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("HASH_WORKERS", "0")
+os.environ.setdefault("JOB_WORKER_ENABLED", "false")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "lru")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+from auth import create_access_token, get_password_hash, principal_cache
+from availability import availability_calendar
+from models import User, UserRole, Doctor
+from replicas import recent_writes
+from response_cache import doctor_cache
+from search_index import doctor_index
+from stats import stats_cache
+
+def reset_caches():
+    availability_calendar.invalidate()
+    doctor_index.invalidate()
+    doctor_cache.invalidate()
+    stats_cache.invalidate()
+    principal_cache.clear()
+    recent_writes._until.clear()
+
+@pytest.fixture
+def db():
+    engine = database.get_engine()
+    database.Base.metadata.drop_all(bind=engine)
+    database.Base.metadata.create_all(bind=engine)
+    reset_caches()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client(db):
+    # Not entered as a context manager: the lifespan (warm-up, job worker) stays off
+    return TestClient(main.app)
+
+def make_user(db, username: str, role: UserRole) -> User:
+    user = User(username=username, email=f"{username}@example.com", phone="9999999999",
+                password_hash=get_password_hash("password"), role=role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def make_doctor(db, username: str, specialization: str = "Cardiology", location: str = "Delhi") -> Doctor:
+    user = make_user(db, username, UserRole.DOCTOR)
+    doctor = Doctor(user_id=user.id, specialization=specialization, experience_years=5, qualification="MBBS",
+                    consultation_fee=500, location=location, available_from=time(9), available_to=time(17))
+    db.add(doctor)
+    db.commit()
+    db.refresh(doctor)
+    return doctor
+
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(user_id)})}
+
+@pytest.fixture
+def admin(db):
+    return make_user(db, "admin", UserRole.ADMIN)
+
+@pytest.fixture
+def patient(db):
+    return make_user(db, "patient", UserRole.PATIENT)
+
+@pytest.fixture
+def doctor(db):
+    return make_doctor(db, "doctor")
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+from models import Appointment, UserRole
+
+DAY = date.today() + timedelta(days=7)
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(DAY, datetime.min.time()).replace(hour=hour, minute=minute)
+
+@pytest.mark.parametrize("suffix", ["Z", "+05:30"])
+def test_booking_with_a_utc_offset(client, doctor, patient, suffix):
+    response = client.post("/api/appointments", headers=auth_headers(patient.id),
+                           json={"doctor_id": doctor.id, "appointment_date": at(11).isoformat() + suffix})
+    assert response.status_code == 201, response.text
+
+def book_at_once(client, doctor, patients, starts) -> list:
+    """Each patient books one of the starts; all requests are released together from their own threads"""
+    barrier = threading.Barrier(len(patients))
+
+    def book(args):
+        patient, start = args
+        barrier.wait()
+        return client.post("/api/appointments", headers=auth_headers(patient.id),
+                           json={"doctor_id": doctor.id, "appointment_date": start.isoformat()}).status_code
+
+    with ThreadPoolExecutor(max_workers=len(patients)) as pool:
+        return list(pool.map(book, zip(patients, starts)))
+
+def test_concurrent_bookings_of_one_slot(client, db, doctor):
+    patients = [make_user(db, f"racer{i}", UserRole.PATIENT) for i in range(12)]
+    statuses = book_at_once(client, doctor, patients, [at(10)] * len(patients))
+    assert sorted(statuses) == [201] + [409] * (len(patients) - 1)
+
+def test_concurrent_overlapping_bookings(client, db, doctor):
+    # Different start times, all within one slot length of each other: only one may win
+    patients = [make_user(db, f"racer{i}", UserRole.PATIENT) for i in range(6)]
+    statuses = book_at_once(client, doctor, patients, [at(10, 5 * i) for i in range(len(patients))])
+    assert sorted(statuses) == [201] + [409] * (len(patients) - 1)
+    assert db.query(Appointment).filter(Appointment.doctor_id == doctor.id).count() == 1
@@ -0,0 +1,50 @@
+from concurrent.futures import Future
+
+import pytest
+
+from hashing import HASH_RETRY_AFTER, HashingExecutor, hasher
+
+@pytest.fixture
+def stalled_hasher(monkeypatch):
+    # A pool that accepts jobs but never finishes them; returns the jobs submitted
+    jobs = []
+
+    def submit(fn, *args):
+        jobs.append(Future())
+        return jobs[-1]
+    monkeypatch.setattr(hasher, "workers", 1)
+    monkeypatch.setattr(hasher, "timeout", 0.05)
+    monkeypatch.setattr(hasher, "submit", submit)
+    return jobs
+
+def assert_retry_later(response):
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"] == str(HASH_RETRY_AFTER)
+
+def test_login_answers_503_when_hashing_times_out(client, patient, stalled_hasher):
+    response = client.post("/api/auth/login", data={"username": "patient", "password": "password"})
+    assert_retry_later(response)
+    assert stalled_hasher and all(job.cancelled() for job in stalled_hasher)
+
+def test_register_answers_503_when_hashing_times_out(client, stalled_hasher):
+    response = client.post("/api/auth/register", json={
+        "username": "newpatient", "email": "newpatient@example.com", "phone": "9999999999", "password": "secret",
+    })
+    assert_retry_later(response)
+    assert stalled_hasher and all(job.cancelled() for job in stalled_hasher)
+
+def test_pool_workers_hash_and_verify():
+    executor = HashingExecutor(workers=1, rounds=4)
+    try:
+        hashed = executor.hash("secret")
+        assert executor.verify("secret", hashed)
+        assert not executor.verify("wrong", hashed)
+    finally:
+        executor.shutdown()
+
+def test_login_token_authenticates(client, patient):
+    login = client.post("/api/auth/login", data={"username": "patient", "password": "password"})
+    assert login.status_code == 200, login.text
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {login.json()['access_token']}"})
+    assert me.status_code == 200, me.text
+    assert me.json()["id"] == patient.id
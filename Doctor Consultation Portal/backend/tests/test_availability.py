@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from datetime import date, datetime, timedelta
+
+import httpx
+
+import main
+from availability import availability_calendar
+from conftest import auth_headers, make_doctor
+
+DAY = date.today() + timedelta(days=7)
+
+def run_concurrently(*paths, timeout: float = 20) -> list:
+    """
+    GET the paths at once on one event loop, as uvicorn would. Runs in its own
+    thread, because a deadlock blocks that loop for good and the test must
+    still be able to fail.
+    """
+    results = []
+
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.get(path) for path in paths))
+        results.extend(r.status_code for r in responses)
+
+    thread = threading.Thread(target=asyncio.run, args=(fetch_all(),), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "concurrent requests on a cold calendar deadlocked the event loop"
+    return results
+
+def test_cold_cache_concurrent_reads_do_not_deadlock(db, doctor):
+    make_doctor(db, "doctor2", location="Mumbai")
+    at = datetime.combine(DAY, datetime.min.time()).replace(hour=10)
+    for _ in range(3):
+        availability_calendar.invalidate()
+        statuses = run_concurrently(
+            f"/api/doctors/available?at={at.isoformat()}",
+            f"/api/doctors/{doctor.id}/slots?date={DAY.isoformat()}",
+            f"/api/doctors/available?at={at.isoformat()}&specialization=cardiology",
+            f"/api/doctors/{doctor.id}/slots?date={(DAY + timedelta(days=1)).isoformat()}",
+        )
+        assert statuses == [200, 200, 200, 200]
+
+def test_available_doctors_follow_bookings_and_weekly_hours(client, db, doctor, patient):
+    at = datetime.combine(DAY, datetime.min.time()).replace(hour=10)
+    available = client.get("/api/doctors/available", params={"at": at.isoformat()})
+    assert [d["id"] for d in available.json()] == [doctor.id]
+
+    booked = client.post("/api/appointments", headers=auth_headers(patient.id),
+                         json={"doctor_id": doctor.id, "appointment_date": at.isoformat()})
+    assert booked.status_code == 201, booked.text
+    assert client.get("/api/doctors/available", params={"at": at.isoformat()}).json() == []
+
+    # Working only mornings on that weekday closes 14:00 (refresh_doctor patches the cached day)
+    afternoon = at.replace(hour=14)
+    assert client.get("/api/doctors/available", params={"at": afternoon.isoformat()}).json() != []
+    weekly = [{"weekday": DAY.weekday(), "start_time": "09:00:00", "end_time": "12:00:00"}]
+    updated = client.put("/api/doctors/me/availability/weekly", headers=auth_headers(doctor.user_id), json=weekly)
+    assert updated.status_code == 200, updated.text
+    assert client.get("/api/doctors/available", params={"at": afternoon.isoformat()}).json() == []
@@ -0,0 +1,34 @@
+from datetime import date, datetime, timedelta
+
+from conftest import auth_headers, make_doctor, make_user
+from models import Appointment, UserRole
+
+def all_pages(client, path: str, headers: dict = None, **params) -> list:
+    """Follow X-Next-Cursor the way services/api.js getAllPages does"""
+    rows, cursor = [], None
+    while True:
+        query = {**params, "limit": 20, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, headers=headers, params=query)
+        assert response.status_code == 200, response.text
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows
+
+def test_following_the_cursor_returns_every_row(client, db, admin, patient):
+    doctors = [make_doctor(db, f"doctor{i}", location="Delhi" if i % 2 else "Pune") for i in range(55)]
+    for i in range(70):
+        make_user(db, f"patient{i}", UserRole.PATIENT)
+    start = datetime.combine(date.today() + timedelta(days=3), datetime.min.time()).replace(hour=9)
+    db.add_all([Appointment(patient_id=patient.id, doctor_id=doctors[i % 55].id,
+                            appointment_date=start + timedelta(days=i // 16, minutes=30 * (i % 16)))
+                for i in range(90)])
+    db.commit()
+
+    assert client.get("/api/doctors").headers.get("X-Next-Cursor")  # paged by default
+    assert len({d["id"] for d in all_pages(client, "/api/doctors")}) == 55
+    assert len({d["id"] for d in all_pages(client, "/api/doctors", location="Delhi")}) == 27
+    assert len({u["id"] for u in all_pages(client, "/api/admin/users", auth_headers(admin.id))}) == 127
+    assert len({a["id"] for a in all_pages(client, "/api/appointments", auth_headers(admin.id))}) == 90
+    assert len({a["id"] for a in all_pages(client, "/api/appointments", auth_headers(patient.id))}) == 90
+    assert len({a["id"] for a in all_pages(client, "/api/appointments", auth_headers(doctors[0].user_id))}) == 2
@@ -0,0 +1,76 @@
+"""List endpoints must run the same number of statements whatever the number of rows (no N+1)"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from conftest import auth_headers, make_doctor, make_user, reset_caches
+from models import Appointment, MedicalRecord, UserRole
+from query_counter import assert_constant_queries
+
+SIZES = (1, 5, 25)
+
+@pytest.fixture
+def engines(db):
+    return [database.get_engine(), database.get_async_engine().sync_engine]
+
+def check(client, engines, grow, path: str, headers: dict = None, rows=lambda body: body, **params):
+    """grow(n) makes n rows exist; the endpoint is then called with cold caches"""
+    def prepare(size):
+        grow(size)
+        reset_caches()
+
+    def run(size):
+        response = client.get(path, headers=headers, params={**params, "limit": 200})
+        assert response.status_code == 200, response.text
+        assert len(rows(response.json())) == size
+    return assert_constant_queries(engines, run, SIZES, prepare)
+
+AT = datetime.combine(date.today() + timedelta(days=7), datetime.min.time()).replace(hour=10)
+
+@pytest.mark.parametrize("path, params, rows", [
+    ("/api/doctors", {}, None),
+    ("/api/doctors", {"specialization": "Cardiology"}, None),
+    ("/api/doctors/search", {"q": "mbbs"}, lambda body: body["results"]),
+    ("/api/doctors/available", {"at": AT.isoformat()}, None),
+])
+def test_doctor_lists(client, db, engines, path, params, rows):
+    made = []
+    def grow(n):
+        while len(made) < n:
+            made.append(make_doctor(db, f"doctor{len(made)}"))
+    check(client, engines, grow, path, rows=rows or (lambda body: body), **params)
+
+def test_appointment_lists(client, db, engines, admin, patient, doctor):
+    start = datetime.combine(date.today() + timedelta(days=7), datetime.min.time()).replace(hour=9)
+    made = []
+    def grow(n):
+        while len(made) < n:
+            i = len(made)
+            made.append(Appointment(patient_id=patient.id, doctor_id=doctor.id,
+                                    appointment_date=start + timedelta(days=i // 16, minutes=30 * (i % 16))))
+            db.add(made[-1])
+        db.commit()
+    for user_id in (patient.id, doctor.user_id, admin.id):
+        made.clear()
+        db.query(Appointment).delete()
+        db.commit()
+        check(client, engines, grow, "/api/appointments", auth_headers(user_id))
+
+def test_admin_users(client, db, engines, admin):
+    made = [admin]
+    def grow(n):
+        while len(made) < n:
+            made.append(make_user(db, f"user{len(made)}", UserRole.PATIENT))
+    check(client, engines, grow, "/api/admin/users", auth_headers(admin.id))
+
+@pytest.mark.parametrize("path", ["/api/medical-records", "/api/medical-records/timeline"])
+def test_medical_records(client, db, engines, patient, doctor, path):
+    made = []
+    def grow(n):
+        while len(made) < n:
+            made.append(MedicalRecord(patient_id=patient.id, doctor_id=doctor.id, diagnosis="flu",
+                                      record_date=datetime(2026, 1, 1) + timedelta(days=len(made))))
+            db.add(made[-1])
+        db.commit()
+    check(client, engines, grow, path, auth_headers(patient.id))
@@ -0,0 +1,53 @@
+import asyncio
+
+from response_cache import LRUBackend, doctor_cache
+
+class DownBackend:
+    """A Redis-like backend whose server is unreachable"""
+    blocking = True
+
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("Connection refused")
+        return fail
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+class RecordingBackend(LRUBackend):
+    """An LRU that reports as blocking and records whether it was called on the event loop"""
+    blocking = True
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(on_event_loop())
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        self.calls.append(on_event_loop())
+        super().set(key, value, ttl)
+
+def test_listing_is_served_uncached_when_the_backend_is_down(client, doctor, monkeypatch):
+    monkeypatch.setattr(doctor_cache, "backend", DownBackend())
+    for _ in range(2):
+        response = client.get("/api/doctors")
+        assert response.status_code == 200, response.text
+        assert [d["id"] for d in response.json()] == [doctor.id]
+    detail = client.get(f"/api/doctors/{doctor.id}")
+    assert detail.status_code == 200, detail.text
+
+def test_blocking_backend_runs_off_the_event_loop(client, doctor, monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(doctor_cache, "backend", backend)
+    first = client.get("/api/doctors")
+    second = client.get("/api/doctors")
+    assert first.status_code == second.status_code == 200
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert backend.calls and not any(backend.calls)
@@ -0,0 +1,55 @@
+"""The migrations build the models' schema, and the hot-path queries use its indexes"""
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+import database
+import migrate
+import models  # noqa: F401  (registers the tables on Base.metadata)
+from conftest import BACKEND_DIR
+
+spec = importlib.util.spec_from_file_location("explain_check", os.path.join(BACKEND_DIR, "benchmarks", "explain_check.py"))
+explain_check = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(explain_check)
+
+def schema(engine) -> dict:
+    inspector = inspect(engine)
+    tables = {}
+    for table in inspector.get_table_names():
+        if table == migrate.schema_migrations.name:
+            continue
+        tables[table] = {
+            "columns": {c["name"]: (str(c["type"]), c["nullable"]) for c in inspector.get_columns(table)},
+            "indexes": {(i["name"], tuple(i["column_names"]), bool(i["unique"])) for i in inspector.get_indexes(table)},
+            "unique": {tuple(u["column_names"]) for u in inspector.get_unique_constraints(table)},
+            "foreign_keys": {(tuple(f["constrained_columns"]), f["referred_table"]) for f in inspector.get_foreign_keys(table)},
+        }
+    return tables
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('migrated') / 'schema.db'}")
+    migrate.upgrade(engine, log=lambda message: None)
+    yield engine
+    engine.dispose()
+
+def test_migrations_match_the_models(migrated, tmp_path):
+    from_models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    database.Base.metadata.create_all(bind=from_models)
+    expected, actual = schema(from_models), schema(migrated)
+    assert sorted(actual) == sorted(expected)
+    for table in expected:
+        assert actual[table] == expected[table], table
+    from_models.dispose()
+
+def test_migrations_are_recorded(migrated):
+    assert not migrate.upgrade(migrated, log=lambda message: None)
+    assert all(row is not None for _, row in migrate.status(migrated))
+
+@pytest.mark.parametrize("name", sorted(explain_check.hot_queries()))
+def test_hot_query_uses_an_index(migrated, name):
+    with migrated.connect() as conn:
+        plan, scans = explain_check.explain(conn, explain_check.hot_queries()[name])
+    assert not scans, f"{name} scans {scans}: {plan}"
@@ -0,0 +1,108 @@
+"""
+Connection warm-up
+Opens DB_WARMUP_CONNECTIONS connections on the sync and the async pool in the
+background when a worker starts, so the first requests don't each pay for a
+MySQL handshake. The worker serves requests while this runs. If the database
+is unreachable, warm-up retries with backoff and then gives up; requests
+connect on demand as usual. The worker keeps running either way, instead of
+crash-looping.
+"""
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import text
+from database import get_engine, get_async_engine
+
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", "2"))
+DB_WARMUP_ATTEMPTS = int(os.getenv("DB_WARMUP_ATTEMPTS", "5"))
+DB_WARMUP_BACKOFF = float(os.getenv("DB_WARMUP_BACKOFF", "1"))
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    def __init__(self, connections: int = DB_WARMUP_CONNECTIONS, attempts: int = DB_WARMUP_ATTEMPTS,
+                 backoff: float = DB_WARMUP_BACKOFF):
+        self.connections = connections
+        self.attempts = attempts
+        self.backoff = backoff
+        self.state = "pending"
+        self.attempt = 0
+        self.seconds = None
+        self.error = None
+        self._task = None
+
+    def _open_sync(self):
+        conn = get_engine().connect()
+        try:
+            conn.execute(text("SELECT 1"))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    async def _open_async(self):
+        conn = await get_async_engine().connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except Exception:
+            await conn.close()
+            raise
+        return conn
+
+    async def _fill(self):
+        # Hold every connection until all are open, so each checkout adds a new one to the pool
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._open_sync) for _ in range(self.connections)),
+            *(self._open_async() for _ in range(self.connections)),
+            return_exceptions=True
+        )
+        for conn in results[:self.connections]:
+            if not isinstance(conn, BaseException):
+                conn.close()
+        for conn in results[self.connections:]:
+            if not isinstance(conn, BaseException):
+                await conn.close()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def run(self):
+        self.state = "running"
+        started = time.perf_counter()
+        for attempt in range(1, self.attempts + 1):
+            self.attempt = attempt
+            try:
+                await self._fill()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                if attempt < self.attempts:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            self.state, self.error = "done", None
+            break
+        else:
+            self.state = "failed"
+            logger.warning("Database warm-up gave up after %d attempts: %s", self.attempts, self.error)
+        self.seconds = round(time.perf_counter() - started, 3)
+
+    def start(self):
+        if self.connections <= 0:
+            self.state = "disabled"
+        elif self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {"state": self.state, "connections": self.connections, "attempt": self.attempt,
+                "seconds": self.seconds, "error": self.error}
+
+warmup = Warmup()
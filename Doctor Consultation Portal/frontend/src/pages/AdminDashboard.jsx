@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { useAuth } from '../contexts/AuthContext'
 import { toast } from 'react-toastify'
-import api from '../services/api'
+import api, { getAllPages } from '../services/api'
 import {
   Users,
   Stethoscope,
@@ -54,8 +54,7 @@ const AdminDashboard = () => {
 
   const fetchUsers = async () => {
     try {
-      const response = await api.get('/admin/users')
-      setUsers(response.data)
+      setUsers(await getAllPages('/admin/users'))
     } catch (error) {
       toast.error('Error fetching users')
     }
@@ -63,8 +62,7 @@ const AdminDashboard = () => {
 
   const fetchDoctors = async () => {
     try {
-      const response = await api.get('/doctors')
-      setDoctors(response.data)
+      setDoctors(await getAllPages('/doctors'))
     } catch (error) {
       toast.error('Error fetching doctors')
     }
@@ -72,8 +70,7 @@ const AdminDashboard = () => {
 
   const fetchAppointments = async () => {
     try {
-      const response = await api.get('/appointments')
-      setAppointments(response.data)
+      setAppointments(await getAllPages('/appointments'))
     } catch (error) {
       toast.error('Error fetching appointments')
     }
@@ -1,7 +1,8 @@
 import { useState, useEffect } from 'react'
 import { useAuth } from '../contexts/AuthContext'
 import { toast } from 'react-toastify'
-import api from '../services/api'
+import api, { getAllPages } from '../services/api'
+import { subscribeToAppointments } from '../services/notifications'
 import {
   Calendar,
   Clock,
@@ -31,6 +32,16 @@ const DoctorDashboard = () => {
     fetchAppointments()
   }, [])
 
+  // Refresh the list when a booking arrives or changes instead of polling
+  useEffect(() => {
+    return subscribeToAppointments((type) => {
+      if (type === 'appointment.created') {
+        toast.info('New appointment booked')
+      }
+      fetchAppointments()
+    })
+  }, [])
+
   const fetchProfile = async () => {
     try {
       const response = await api.get('/doctors/me/profile')
@@ -53,8 +64,7 @@ const DoctorDashboard = () => {
 
   const fetchAppointments = async () => {
     try {
-      const response = await api.get('/appointments')
-      setAppointments(response.data)
+      setAppointments(await getAllPages('/appointments'))
     } catch (error) {
       toast.error('Error fetching appointments')
     }
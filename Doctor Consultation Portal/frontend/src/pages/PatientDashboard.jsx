@@ -1,7 +1,8 @@
 import { useState, useEffect } from 'react'
 import { useAuth } from '../contexts/AuthContext'
 import { toast } from 'react-toastify'
-import api from '../services/api'
+import api, { getAllPages } from '../services/api'
+import { subscribeToAppointments } from '../services/notifications'
 import {
   Calendar,
   Search,
@@ -21,6 +22,8 @@ const PatientDashboard = () => {
   const [doctors, setDoctors] = useState([])
   const [appointments, setAppointments] = useState([])
   const [medicalRecords, setMedicalRecords] = useState([])
+  const [recordsCursor, setRecordsCursor] = useState(null)
+  const [openRecords, setOpenRecords] = useState({})
   const [searchFilters, setSearchFilters] = useState({
     specialization: '',
     location: '',
@@ -38,15 +41,23 @@ const PatientDashboard = () => {
     fetchMedicalRecords()
   }, [])
 
+  // Doctors confirming or cancelling show up without a refresh
+  useEffect(() => {
+    return subscribeToAppointments((type, event) => {
+      if (type === 'appointment.status_changed') {
+        toast.info(`Appointment ${event.status}`)
+      }
+      fetchAppointments()
+    })
+  }, [])
+
   const fetchDoctors = async () => {
     try {
-      const params = new URLSearchParams()
-      if (searchFilters.specialization)
-        params.append('specialization', searchFilters.specialization)
-      if (searchFilters.location) params.append('location', searchFilters.location)
+      const params = {}
+      if (searchFilters.specialization) params.specialization = searchFilters.specialization
+      if (searchFilters.location) params.location = searchFilters.location
 
-      const response = await api.get(`/doctors?${params.toString()}`)
-      setDoctors(response.data)
+      setDoctors(await getAllPages('/doctors', params))
     } catch (error) {
       toast.error('Error fetching doctors')
     }
@@ -54,22 +65,38 @@ const PatientDashboard = () => {
 
   const fetchAppointments = async () => {
     try {
-      const response = await api.get('/appointments')
-      setAppointments(response.data)
+      setAppointments(await getAllPages('/appointments'))
     } catch (error) {
       toast.error('Error fetching appointments')
     }
   }
 
-  const fetchMedicalRecords = async () => {
+  // Timeline summaries, a page at a time; the full record loads when opened
+  const fetchMedicalRecords = async (cursor = null) => {
     try {
-      const response = await api.get('/medical-records')
-      setMedicalRecords(response.data)
+      const response = await api.get('/medical-records/timeline', {
+        params: cursor ? { cursor } : {},
+      })
+      setMedicalRecords((records) => (cursor ? [...records, ...response.data] : response.data))
+      setRecordsCursor(response.headers['x-next-cursor'] || null)
     } catch (error) {
 // Silently fail - records might not exist
     }
   }
 
+  const toggleMedicalRecord = async (id) => {
+    if (openRecords[id]) {
+      setOpenRecords(({ [id]: _, ...rest }) => rest)
+      return
+    }
+    try {
+      const response = await api.get(`/medical-records/${id}`)
+      setOpenRecords((open) => ({ ...open, [id]: response.data }))
+    } catch (error) {
+      toast.error('Error loading medical record')
+    }
+  }
+
   const handleSearch = (e) => {
     e.preventDefault()
     fetchDoctors()
@@ -384,40 +411,63 @@ const PatientDashboard = () => {
                 <p className="text-gray-500 text-center py-8">No medical records found</p>
               ) : (
                 <div className="space-y-4">
-                  {medicalRecords.map((record) => (
-                    <div
-                      key={record.id}
-                      className="border border-gray-200 rounded-lg p-4 hover:bg-gray-50 transition"
-                    >
-                      <div className="flex justify-between items-start mb-2">
-                        <h3 className="font-semibold text-gray-900">
-                          {format(new Date(record.record_date), 'PPP')}
-                        </h3>
-                      </div>
-                      {record.diagnosis && (
-                        <div className="mb-2">
-                          <span className="text-sm font-medium text-gray-700">
-                            Diagnosis:
-                          </span>
-                          <p className="text-gray-600">{record.diagnosis}</p>
-                        </div>
-                      )}
-                      {record.prescription && (
-                        <div className="mb-2">
-                          <span className="text-sm font-medium text-gray-700">
-                            Prescription:
-                          </span>
-                          <p className="text-gray-600">{record.prescription}</p>
-                        </div>
-                      )}
-                      {record.notes && (
-                        <div>
-                          <span className="text-sm font-medium text-gray-700">Notes:</span>
-                          <p className="text-gray-600">{record.notes}</p>
+                  {medicalRecords.map((record) => {
+                    const full = openRecords[record.id]
+                    return (
+                      <div
+                        key={record.id}
+                        onClick={() => toggleMedicalRecord(record.id)}
+                        className="border border-gray-200 rounded-lg p-4 hover:bg-gray-50 transition cursor-pointer"
+                      >
+                        <div className="flex justify-between items-start mb-2">
+                          <h3 className="font-semibold text-gray-900">
+                            {format(new Date(record.record_date), 'PPP')}
+                          </h3>
                         </div>
-                      )}
-                    </div>
-                  ))}
+                        {!full && record.summary && (
+                          <p className="text-gray-600">{record.summary}</p>
+                        )}
+                        {full?.diagnosis && (
+                          <div className="mb-2">
+                            <span className="text-sm font-medium text-gray-700">
+                              Diagnosis:
+                            </span>
+                            <p className="text-gray-600">{full.diagnosis}</p>
+                          </div>
+                        )}
+                        {full?.prescription && (
+                          <div className="mb-2">
+                            <span className="text-sm font-medium text-gray-700">
+                              Prescription:
+                            </span>
+                            <p className="text-gray-600">{full.prescription}</p>
+                          </div>
+                        )}
+                        {full?.test_results && (
+                          <div className="mb-2">
+                            <span className="text-sm font-medium text-gray-700">
+                              Test Results:
+                            </span>
+                            <p className="text-gray-600">{full.test_results}</p>
+                          </div>
+                        )}
+                        {full?.notes && (
+                          <div>
+                            <span className="text-sm font-medium text-gray-700">Notes:</span>
+                            <p className="text-gray-600">{full.notes}</p>
+                          </div>
+                        )}
+                      </div>
+                    )
+                  })}
+                  {recordsCursor && (
+                    <button
+                      onClick={() => fetchMedicalRecords(recordsCursor)}
+                      className="w-full py-2 text-primary-600 hover:bg-primary-50 rounded-lg transition"
+                    >
+                      Load older records
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -39,5 +39,22 @@ api.interceptors.response.use(
   }
 )
 
+// List endpoints return a page at a time and put the next page's cursor in
+// X-Next-Cursor; this follows it and returns every row
+const MAX_PAGE_SIZE = 200
+
+export const getAllPages = async (url, params = {}) => {
+  const rows = []
+  let cursor = null
+  do {
+    const response = await api.get(url, {
+      params: { ...params, limit: MAX_PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+    })
+    rows.push(...response.data)
+    cursor = response.headers['x-next-cursor']
+  } while (cursor)
+  return rows
+}
+
 export default api
 
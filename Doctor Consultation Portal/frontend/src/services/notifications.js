@@ -0,0 +1,27 @@
+// Appointment notifications pushed by the backend over Server-Sent Events.
+// EventSource can't send headers, so the token goes in the query string.
+const EVENTS = [
+  'appointment.created',
+  'appointment.status_changed',
+  'appointment.cancelled',
+  'resync',
+]
+
+export const subscribeToAppointments = (onEvent) => {
+  const token = localStorage.getItem('token')
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {}
+  }
+
+  const source = new EventSource(
+    `/api/notifications/stream?access_token=${encodeURIComponent(token)}`
+  )
+  EVENTS.forEach((type) => {
+    source.addEventListener(type, (event) => {
+      onEvent(type, JSON.parse(event.data))
+    })
+  })
+
+  // EventSource reconnects by itself; just stop when the component unmounts
+  return () => source.close()
+}